@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Optional
+
+import click
+
+
+@click.group("db", short_help="Manage the blockchain database")
+def db_cmd() -> None:
+    pass
+
+
+@db_cmd.command("migrate", short_help="Convert the coin records of the full node database to the binary schema")
+@click.option(
+    "--db-path",
+    help="Path of the database to migrate. Defaults to the database_path of the full node in config.yaml",
+    type=click.Path(),
+    default=None,
+)
+@click.option("-b", "--batch-size", help="Number of coin records converted per transaction", type=int, default=10000)
+@click.option("--vacuum/--no-vacuum", help="Rebuild the database file afterwards to reclaim the space", default=True)
+@click.pass_context
+def db_migrate_cmd(ctx: click.Context, db_path: Optional[str], batch_size: int, vacuum: bool) -> None:
+    """
+    Converts the coin_record table of a full node database created by an older version, in batches. The migration
+    can be interrupted and continued later. The full node also migrates the records in the background while it
+    runs, this command does it offline and reclaims the space afterwards. Stop the full node before running this.
+    """
+    import asyncio
+    from .db_funcs import migrate_db
+
+    root_path: Path = ctx.obj["root_path"]
+    asyncio.run(migrate_db(root_path, None if db_path is None else Path(db_path), batch_size, vacuum))
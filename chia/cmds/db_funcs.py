@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Optional
+
+import aiosqlite
+
+from chia.full_node.coin_store import migrate_coin_records
+from chia.util.config import load_config
+from chia.util.path import path_from_root
+
+
+async def migrate_db(root_path: Path, db_path: Optional[Path], batch_size: int, vacuum: bool) -> None:
+    if db_path is None:
+        config = load_config(root_path, "config.yaml", "full_node")
+        db_path_replaced: str = config["database_path"].replace("CHALLENGE", config["selected_network"])
+        db_path = path_from_root(root_path, db_path_replaced)
+    if not db_path.exists():
+        print(f"Database {db_path} does not exist")
+        return None
+
+    print(f"Migrating {db_path}")
+    connection = await aiosqlite.connect(db_path)
+    try:
+        migrated = await migrate_coin_records(connection, batch_size)
+        if migrated == 0:
+            print("The coin records already use the binary schema")
+            return None
+        print(f"Converted {migrated} coin records")
+        if vacuum:
+            print("Reclaiming space")
+            await connection.execute("VACUUM")
+    finally:
+        await connection.close()
@@ -2,7 +2,7 @@ import collections
 import logging
 from typing import Dict, List, Optional, Set, Tuple, Union, Callable
 
-from blspy import AugSchemeMPL, G1Element
+from blspy import G1Element
 from chiabip158 import PyBIP158
 from clvm.casts import int_from_bytes
 
@@ -27,6 +27,7 @@ from chia.types.full_block import FullBlock
 from chia.types.generator_types import BlockGenerator
 from chia.types.name_puzzle_condition import NPC
 from chia.types.unfinished_block import UnfinishedBlock
+from chia.util import cached_bls
 from chia.util.condition_tools import (
     pkm_pairs_for_conditions_dict,
     coin_announcements_names_for_npc,
@@ -359,6 +360,10 @@ async def validate_block_body(
                 assert curr is not None
 
         removal_coin_records: Dict[bytes32, CoinRecord] = {}
+        removal_records_in_db: Dict[bytes32, CoinRecord] = {
+            record.name: record
+            for record in await coin_store.get_coin_records([rem for rem in removals if rem not in additions_dic])
+        }
         for rem in removals:
             if rem in additions_dic:
                 # Ephemeral coin
@@ -373,7 +378,7 @@ async def validate_block_body(
                 )
                 removal_coin_records[new_unspent.name] = new_unspent
             else:
-                unspent = await coin_store.get_coin_record(rem)
+                unspent = removal_records_in_db.get(rem)
                 if unspent is not None and unspent.confirmed_block_index <= fork_h:
                     # Spending something in the current chain, confirmed before fork
                     # (We ignore all coins confirmed after fork)
@@ -474,7 +479,8 @@ async def validate_block_body(
             return Err.BAD_AGGREGATE_SIGNATURE, None
 
         # noinspection PyTypeChecker
-        if not AugSchemeMPL.aggregate_verify(pairs_pks, pairs_msgs, block.transactions_info.aggregated_signature):
+        # The pairings of the spends which were verified in the mempool are cached
+        if not cached_bls.aggregate_verify(pairs_pks, pairs_msgs, block.transactions_info.aggregated_signature):
             return Err.BAD_AGGREGATE_SIGNATURE, None
 
         return None, npc_result
@@ -54,6 +54,9 @@ class BlockRecord(Streamable):
     # Sub-epoch (present iff this is the first SB after sub-epoch)
     sub_epoch_summary_included: Optional[SubEpochSummary]
 
+    # Block records are read from the DB in bulk, and written back to it when adding blocks
+    CACHE_SERIALIZATION = True
+
     @property
     def is_transaction_block(self) -> bool:
         return self.timestamp is not None
@@ -15,11 +15,18 @@ from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
 from chia.consensus.find_fork_point import find_fork_point_in_chain
 from chia.consensus.full_block_to_block_record import block_to_block_record
-from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_blocks_multiprocessing
+from chia.consensus.multiprocess_validation import (
+    BatchSizer,
+    PreValidationResult,
+    WorkerBlockRecords,
+    init_validation_worker,
+    pre_validate_blocks_multiprocessing,
+)
 from chia.full_node.block_store import BlockStore
 from chia.full_node.coin_store import CoinStore
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions
 from chia.types.blockchain_format.coin import Coin
+from chia.types.blockchain_format.program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.types.blockchain_format.vdf import VDFInfo
@@ -31,8 +38,10 @@ from chia.types.header_block import HeaderBlock
 from chia.types.unfinished_block import UnfinishedBlock
 from chia.types.unfinished_header_block import UnfinishedHeaderBlock
 from chia.types.weight_proof import SubEpochChallengeSegment
+from chia.util.block_cache import OverlayBlockCache
 from chia.util.errors import Err
 from chia.util.generator_tools import get_block_header, tx_removals_and_additions
+from chia.util.height_map import HeightToHash
 from chia.util.ints import uint16, uint32, uint64, uint128
 from chia.util.streamable import recurse_jsonify
 
@@ -64,7 +73,7 @@ class Blockchain(BlockchainInterface):
     # all hashes of blocks in block_record by height, used for garbage collection
     __heights_in_cache: Dict[uint32, Set[bytes32]]
     # Defines the path from genesis to the peak, no orphan blocks
-    __height_to_hash: Dict[uint32, bytes32]
+    __height_to_hash: HeightToHash
     # All sub-epoch summaries that have been included in the blockchain from the beginning until and including the peak
     # (height_included, SubEpochSummary). Note: ONLY for the blocks in the path to the peak
     __sub_epoch_summaries: Dict[uint32, SubEpochSummary] = {}
@@ -74,6 +83,8 @@ class Blockchain(BlockchainInterface):
     block_store: BlockStore
     # Used to verify blocks in parallel
     pool: ProcessPoolExecutor
+    batch_sizer: BatchSizer
+    worker_records: WorkerBlockRecords
     # Set holding seen compact proofs, in order to avoid duplicates.
     _seen_compact_proofs: Set[Tuple[VDFInfo, uint32]]
 
@@ -102,13 +113,17 @@ class Blockchain(BlockchainInterface):
         if cpu_count > 61:
             cpu_count = 61  # Windows Server 2016 has an issue https://bugs.python.org/issue26903
         num_workers = max(cpu_count - 2, 1)
-        self.pool = ProcessPoolExecutor(max_workers=num_workers)
+        self.constants = consensus_constants
+        self.constants_json = recurse_jsonify(dataclasses.asdict(self.constants))
+        self.pool = ProcessPoolExecutor(
+            max_workers=num_workers, initializer=init_validation_worker, initargs=(self.constants_json,)
+        )
+        self.batch_sizer = BatchSizer(num_workers)
+        self.worker_records = WorkerBlockRecords()
         log.info(f"Started {num_workers} processes for block validation")
 
-        self.constants = consensus_constants
         self.coin_store = coin_store
         self.block_store = block_store
-        self.constants_json = recurse_jsonify(dataclasses.asdict(self.constants))
         self._shut_down = False
         await self._load_chain_from_store()
         self._seen_compact_proofs = set()
@@ -266,6 +281,9 @@ class Blockchain(BlockchainInterface):
 
                 # Then update the memory cache. It is important that this task is not cancelled and does not throw
                 self.add_block_record(block_record)
+                if fork_height is not None:
+                    # Drops the blocks of the old peak above the fork point, they are replaced by records
+                    self.__height_to_hash.truncate(fork_height + 1)
                 for fetched_block_record in records:
                     self.__height_to_hash[fetched_block_record.height] = fetched_block_record.header_hash
                     if fetched_block_record.sub_epoch_summary_included is not None:
@@ -307,7 +325,9 @@ class Blockchain(BlockchainInterface):
                 else:
                     tx_removals, tx_additions = [], []
                 await self.coin_store.new_block(block, tx_additions, tx_removals)
+                await self.block_store.add_header_blocks([get_block_header(block, tx_additions, tx_removals)])
                 await self.block_store.set_peak(block_record.header_hash)
+                await self.block_store.set_main_chain(-1, [block_record])
                 return uint32(0), uint32(0), [block_record]
             return None, None, []
 
@@ -321,6 +341,8 @@ class Blockchain(BlockchainInterface):
                 fork_height = fork_point_with_peak
             else:
                 fork_height = find_fork_point_in_chain(self, block_record, peak)
+            # The fork point passed in can be above the peak, the blocks above the peak are not in the chain
+            fork_height = min(fork_height, peak.height)
 
             if block_record.prev_hash != peak.header_hash:
                 await self.coin_store.rollback_to_block(fork_height)
@@ -349,6 +371,9 @@ class Blockchain(BlockchainInterface):
                 curr = fetched_block_record.prev_hash
 
             records_to_add = []
+            # The header blocks are stored while the additions and removals are known, so that they are not rebuilt
+            # for every wallet which requests them
+            header_blocks: List[HeaderBlock] = []
             for fetched_full_block, fetched_block_record in reversed(blocks_to_add):
                 records_to_add.append(fetched_block_record)
                 if fetched_block_record.is_transaction_block:
@@ -359,9 +384,14 @@ class Blockchain(BlockchainInterface):
                     else:
                         tx_removals, tx_additions = await self.get_tx_removals_and_additions(fetched_full_block, None)
                     await self.coin_store.new_block(fetched_full_block, tx_additions, tx_removals)
+                else:
+                    tx_removals, tx_additions = [], []
+                header_blocks.append(get_block_header(fetched_full_block, tx_additions, tx_removals))
+            await self.block_store.add_header_blocks(header_blocks)
 
             # Changes the peak to be the new peak
             await self.block_store.set_peak(block_record.header_hash)
+            await self.block_store.set_main_chain(fork_height, records_to_add)
             return uint32(max(fork_height, 0)), block_record.height, records_to_add
 
         # This is not a heavier block than the heaviest we have seen, so we don't change the coin set
@@ -547,20 +577,49 @@ class Blockchain(BlockchainInterface):
         self,
         blocks: List[FullBlock],
         npc_results: Dict[uint32, NPCResult],
-        batch_size: int = 4,
+        batch_size: Optional[int] = None,
         wp_summaries: Optional[List[SubEpochSummary]] = None,
+        pending_blocks: Optional[List[FullBlock]] = None,
+        pending_results: Optional[List[PreValidationResult]] = None,
     ) -> Optional[List[PreValidationResult]]:
+        """
+        pending_blocks are pre-validated blocks which are still being added to the chain, with their
+        pending_results. blocks may build on them, which lets the pool validate the next batch of a sync while the
+        current one is added.
+        """
+        block_records: BlockchainInterface = self
+        get_block_generator = self.get_block_generator
+        if pending_blocks is not None and len(pending_blocks) > 0:
+            assert pending_results is not None and len(pending_results) == len(pending_blocks)
+            overlay = OverlayBlockCache(self)
+            for block, result in zip(pending_blocks, pending_results):
+                if not overlay.contains_block(block.header_hash):
+                    assert result.required_iters is not None
+                    overlay.add_block_record(
+                        block_to_block_record(self.constants, overlay, result.required_iters, block, None)
+                    )
+            block_records = overlay
+            pending_blocks_dict = {block.header_hash: block for block in pending_blocks}
+
+            async def get_block_generator(
+                block: Union[FullBlock, UnfinishedBlock], additional_blocks=None
+            ) -> Optional[BlockGenerator]:
+                # The generators referenced by blocks may be in the pending blocks, which are not in the store yet
+                return await self.get_block_generator(block, {**pending_blocks_dict, **(additional_blocks or {})})
+
         return await pre_validate_blocks_multiprocessing(
             self.constants,
             self.constants_json,
-            self,
+            block_records,
             blocks,
             self.pool,
             True,
             npc_results,
-            self.get_block_generator,
+            get_block_generator,
             batch_size,
             wp_summaries,
+            self.batch_sizer,
+            self.worker_records,
         )
 
     def contains_block(self, header_hash: bytes32) -> bool:
@@ -617,16 +676,19 @@ class Blockchain(BlockchainInterface):
         """
         if height < 0:
             return None
+        removed: List[BlockRecord] = []
         blocks_to_remove = self.__heights_in_cache.get(uint32(height), None)
         while blocks_to_remove is not None and height >= 0:
             for header_hash in blocks_to_remove:
-                del self.__block_records[header_hash]  # remove from blocks
+                removed.append(self.__block_records.pop(header_hash))  # remove from blocks
             del self.__heights_in_cache[uint32(height)]  # remove height from heights in cache
 
             if height == 0:
                 break
             height = height - 1
             blocks_to_remove = self.__heights_in_cache.get(uint32(height), None)
+        # The most recent ones are the most likely to be needed again, by a reorg
+        self.block_store.cache_block_records(list(reversed(removed)))
 
     def clean_block_records(self):
         """
@@ -656,16 +718,26 @@ class Blockchain(BlockchainInterface):
                 header_hash: bytes32 = self.height_to_hash(uint32(height))
                 hashes.append(header_hash)
 
+        header_blocks: Dict[bytes32, HeaderBlock] = {}
+        if tx_filter:
+            # Blocks added by older versions have no stored header block, these are built below
+            stored: Dict[bytes32, bytes] = await self.block_store.get_header_blocks_bytes(hashes)
+            for header_hash, header_bytes in stored.items():
+                header_blocks[header_hash] = HeaderBlock.from_bytes(header_bytes)
+                hashes.remove(header_hash)
+
         blocks: List[FullBlock] = []
         for hash in hashes.copy():
             block = self.block_store.block_cache.get(hash)
             if block is not None:
                 blocks.append(block)
                 hashes.remove(hash)
-        blocks_on_disk: List[FullBlock] = await self.block_store.get_blocks_by_hash(hashes)
+        blocks_on_disk: List[FullBlock] = await self.block_store.get_blocks_by_hash(hashes, include_generator=False)
         blocks.extend(blocks_on_disk)
-        header_blocks: Dict[bytes32, HeaderBlock] = {}
 
+        for header_block in header_blocks.values():
+            if self.height_to_hash(header_block.height) != header_block.header_hash:
+                raise ValueError(f"Block at {header_block.header_hash} is no longer in the blockchain (it's in a fork)")
         for block in blocks:
             if self.height_to_hash(block.height) != block.header_hash:
                 raise ValueError(f"Block at {block.header_hash} is no longer in the blockchain (it's in a fork)")
@@ -695,22 +767,23 @@ class Blockchain(BlockchainInterface):
 
     async def get_block_records_at(self, heights: List[uint32], batch_size=900) -> List[BlockRecord]:
         """
-        gets block records by height (only blocks that are part of the chain)
+        gets block records by height (only blocks that are part of the chain). The records kept in memory are used
+        first, the others are read from the block store, in batches.
         """
-        records: List[BlockRecord] = []
-        hashes = []
+        hashes: List[bytes32] = [self.height_to_hash(height) for height in heights]
+        records: Dict[bytes32, BlockRecord] = {}
+        missing = []
         assert batch_size < 999  # sqlite in python 3.7 has a limit on 999 variables in queries
-        for height in heights:
-            hashes.append(self.height_to_hash(height))
-            if len(hashes) > batch_size:
-                res = await self.block_store.get_block_records_by_hash(hashes)
-                records.extend(res)
-                hashes = []
-
-        if len(hashes) > 0:
-            res = await self.block_store.get_block_records_by_hash(hashes)
-            records.extend(res)
-        return records
+        for header_hash in hashes:
+            block_record = self.__block_records.get(header_hash)
+            if block_record is not None:
+                records[header_hash] = block_record
+            else:
+                missing.append(header_hash)
+        for i in range(0, len(missing), batch_size):
+            for block_record in await self.block_store.get_block_records_by_hash(missing[i : i + batch_size]):
+                records[block_record.header_hash] = block_record
+        return [records[header_hash] for header_hash in hashes]
 
     async def get_block_record_from_db(self, header_hash: bytes32) -> Optional[BlockRecord]:
         if header_hash in self.__block_records:
@@ -771,66 +844,62 @@ class Blockchain(BlockchainInterface):
         if len(ref_list) == 0:
             return BlockGenerator(block.transactions_generator, [])
 
-        result: List[GeneratorArg] = []
+        # Header hashes of the referenced blocks which are read from the store, and referenced blocks which are not
+        # in the store, by height
+        ref_hashes: Dict[uint32, bytes32] = {}
+        ref_blocks: Dict[uint32, FullBlock] = {}
         previous_block_hash = block.prev_header_hash
         if (
             self.try_block_record(previous_block_hash)
             and self.height_to_hash(self.block_record(previous_block_hash).height) == previous_block_hash
         ):
             # We are not in a reorg, no need to look up alternate header hashes (we can get them from height_to_hash)
-            for ref_height in block.transactions_generator_ref_list:
-                header_hash = self.height_to_hash(ref_height)
-                ref_block = await self.get_full_block(header_hash)
-                assert ref_block is not None
-                if ref_block.transactions_generator is None:
-                    raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
-                result.append(GeneratorArg(ref_block.height, ref_block.transactions_generator))
+            for ref_height in ref_list:
+                ref_hashes[ref_height] = self.height_to_hash(ref_height)
         else:
             # First tries to find the blocks in additional_blocks
-            reorg_chain: Dict[uint32, FullBlock] = {}
             curr: Union[FullBlock, UnfinishedBlock] = block
-            additional_height_dict = {}
             while curr.prev_header_hash in additional_blocks:
                 prev: FullBlock = additional_blocks[curr.prev_header_hash]
-                additional_height_dict[prev.height] = prev
                 if isinstance(curr, FullBlock):
                     assert curr.height == prev.height + 1
-                reorg_chain[prev.height] = prev
+                ref_blocks[prev.height] = prev
                 curr = prev
 
+            fork_hashes: Dict[uint32, bytes32] = {}
             peak: Optional[BlockRecord] = self.get_peak()
             if self.contains_block(curr.prev_header_hash) and peak is not None:
-                # Then we look up blocks up to fork point one at a time, backtracking
-                previous_block_hash = curr.prev_header_hash
-                prev_block_record = await self.block_store.get_block_record(previous_block_hash)
-                prev_block = await self.block_store.get_full_block(previous_block_hash)
-                assert prev_block is not None
+                # Then we look up block records up to fork point one at a time, backtracking
+                prev_block_record = await self.get_block_record_from_db(curr.prev_header_hash)
                 assert prev_block_record is not None
                 fork = find_fork_point_in_chain(self, peak, prev_block_record)
-                curr_2: Optional[FullBlock] = prev_block
-                assert curr_2 is not None and isinstance(curr_2, FullBlock)
-                reorg_chain[curr_2.height] = curr_2
-                while curr_2.height > fork and curr_2.height > 0:
-                    curr_2 = await self.block_store.get_full_block(curr_2.prev_header_hash)
-                    assert curr_2 is not None
-                    reorg_chain[curr_2.height] = curr_2
-
-            for ref_height in block.transactions_generator_ref_list:
-                if ref_height in reorg_chain:
-                    ref_block = reorg_chain[ref_height]
-                    assert ref_block is not None
-                    if ref_block.transactions_generator is None:
-                        raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
-                    result.append(GeneratorArg(ref_block.height, ref_block.transactions_generator))
+                curr_record: Optional[BlockRecord] = prev_block_record
+                assert curr_record is not None
+                fork_hashes[curr_record.height] = curr_record.header_hash
+                while curr_record.height > fork and curr_record.height > 0:
+                    curr_record = await self.get_block_record_from_db(curr_record.prev_hash)
+                    assert curr_record is not None
+                    fork_hashes[curr_record.height] = curr_record.header_hash
+
+            for ref_height in ref_list:
+                if ref_height in ref_blocks:
+                    continue
+                if ref_height in fork_hashes:
+                    ref_hashes[ref_height] = fork_hashes[ref_height]
                 else:
-                    if ref_height in additional_height_dict:
-                        ref_block = additional_height_dict[ref_height]
-                    else:
-                        header_hash = self.height_to_hash(ref_height)
-                        ref_block = await self.get_full_block(header_hash)
-                    assert ref_block is not None
-                    if ref_block.transactions_generator is None:
-                        raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
-                    result.append(GeneratorArg(ref_block.height, ref_block.transactions_generator))
+                    ref_hashes[ref_height] = self.height_to_hash(ref_height)
+
+        # The generators of the blocks in the store are read at once
+        stored_generators = await self.block_store.get_generators_by_hash(list(ref_hashes.values()))
+        generators: Dict[uint32, Optional[SerializedProgram]] = dict(zip(ref_hashes.keys(), stored_generators))
+        result: List[GeneratorArg] = []
+        for ref_height in ref_list:
+            if ref_height in ref_blocks:
+                generator = ref_blocks[ref_height].transactions_generator
+            else:
+                generator = generators[ref_height]
+            if generator is None:
+                raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
+            result.append(GeneratorArg(ref_height, generator))
         assert len(result) == len(ref_list)
         return BlockGenerator(block.transactions_generator, result)
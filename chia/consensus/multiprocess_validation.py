@@ -1,9 +1,11 @@
 import asyncio
 import logging
+import math
+import time
 import traceback
 from concurrent.futures.process import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Sequence, Tuple, Union, Callable
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union, Callable
 
 from chia.consensus.block_header_validation import validate_finished_header_block
 from chia.consensus.block_record import BlockRecord
@@ -38,6 +40,58 @@ class PreValidationResult(Streamable):
     npc_result: Optional[NPCResult]  # Iff error is None and block is a transaction block
 
 
+class BatchSizer:
+    """
+    Picks how many blocks are sent to a validation worker at once. Blocks are spread over all the workers, but
+    every batch also sends the recent block records, so batches are kept large enough to take at least
+    min_batch_time to validate, based on the measured validation time per block.
+    """
+
+    def __init__(self, num_workers: int, min_batch_time: float = 0.1, smoothing: float = 0.2):
+        self.num_workers = num_workers
+        self.min_batch_time = min_batch_time
+        self.smoothing = smoothing
+        self.block_time: Optional[float] = None
+
+    def batch_size(self, num_blocks: int) -> int:
+        batch_size = math.ceil(num_blocks / self.num_workers)
+        if self.block_time is not None and self.block_time > 0:
+            batch_size = max(batch_size, math.ceil(self.min_batch_time / self.block_time))
+        return max(min(batch_size, num_blocks), 1)
+
+    def add_measurement(self, num_blocks: int, num_batches: int, elapsed: float) -> None:
+        if num_blocks == 0:
+            return None
+        # The batches are validated in parallel, by up to num_workers workers
+        block_time = elapsed * min(num_batches, self.num_workers) / num_blocks
+        if self.block_time is None:
+            self.block_time = block_time
+        else:
+            self.block_time += self.smoothing * (block_time - self.block_time)
+
+
+class WorkerBlockRecords:
+    """
+    Tracks the block records kept by the validation workers, which are started with init_validation_worker.
+    Every batch sends the header hashes of the records it needs, and only the records which were not part of the
+    previous call. A worker which misses some records (because it did not validate a batch of the previous call)
+    gets the batch again with all of them.
+    """
+
+    def __init__(self):
+        self.sent: Set[bytes32] = set()
+
+
+# State of a validation worker process, kept between the batches it validates
+_worker_constants: Optional[ConsensusConstants] = None
+_worker_block_records: Dict[bytes, BlockRecord] = {}
+
+
+def init_validation_worker(constants_dict: Dict) -> None:
+    global _worker_constants
+    _worker_constants = dataclass_from_dict(ConsensusConstants, constants_dict)
+
+
 def batch_pre_validate_blocks(
     constants_dict: Dict,
     blocks_pickled: Dict[bytes, bytes],
@@ -52,8 +106,76 @@ def batch_pre_validate_blocks(
     blocks = {}
     for k, v in blocks_pickled.items():
         blocks[k] = BlockRecord.from_bytes(v)
-    results: List[PreValidationResult] = []
     constants: ConsensusConstants = dataclass_from_dict(ConsensusConstants, constants_dict)
+    return _batch_pre_validate_blocks(
+        constants,
+        blocks,
+        full_blocks_pickled,
+        header_blocks_pickled,
+        prev_transaction_generators,
+        npc_results,
+        check_filter,
+        expected_difficulty,
+        expected_sub_slot_iters,
+    )
+
+
+def batch_pre_validate_blocks_in_worker(
+    block_hashes: List[bytes],
+    new_blocks_pickled: Dict[bytes, bytes],
+    full_blocks_pickled: Optional[List[bytes]],
+    header_blocks_pickled: Optional[List[bytes]],
+    prev_transaction_generators: List[Optional[bytes]],
+    npc_results: Dict[uint32, bytes],
+    check_filter: bool,
+    expected_difficulty: List[uint64],
+    expected_sub_slot_iters: List[uint64],
+) -> Optional[List[bytes]]:
+    """
+    Same as batch_pre_validate_blocks, with the constants and block records kept by the worker. block_hashes are
+    the records needed by the batch, and new_blocks_pickled the ones the worker might not have. Returns None if
+    the worker does not have all the records.
+    """
+    global _worker_block_records
+    assert _worker_constants is not None
+    for k, v in new_blocks_pickled.items():
+        if k not in _worker_block_records:
+            _worker_block_records[k] = BlockRecord.from_bytes(v)
+    blocks = {}
+    for k in block_hashes:
+        block_record = _worker_block_records.get(k)
+        if block_record is None:
+            return None
+        blocks[k] = block_record
+    if len(blocks) > 0:
+        # Only keeps the records which can still be needed by the next batches
+        min_height = min(block_record.height for block_record in blocks.values()) - _worker_constants.SUB_EPOCH_BLOCKS
+        _worker_block_records = {k: v for k, v in _worker_block_records.items() if v.height >= min_height}
+    return _batch_pre_validate_blocks(
+        _worker_constants,
+        blocks,
+        full_blocks_pickled,
+        header_blocks_pickled,
+        prev_transaction_generators,
+        npc_results,
+        check_filter,
+        expected_difficulty,
+        expected_sub_slot_iters,
+    )
+
+
+def _batch_pre_validate_blocks(
+    constants: ConsensusConstants,
+    blocks: Dict[bytes, BlockRecord],
+    full_blocks_pickled: Optional[List[bytes]],
+    header_blocks_pickled: Optional[List[bytes]],
+    prev_transaction_generators: List[Optional[bytes]],
+    npc_results: Dict[uint32, bytes],
+    check_filter: bool,
+    expected_difficulty: List[uint64],
+    expected_sub_slot_iters: List[uint64],
+) -> List[bytes]:
+    results: List[PreValidationResult] = []
     if full_blocks_pickled is not None and header_blocks_pickled is not None:
         assert ValueError("Only one should be passed here")
     if full_blocks_pickled is not None:
@@ -123,6 +245,27 @@ def batch_pre_validate_blocks(
     return [bytes(r) for r in results]
 
 
+async def _pre_validate_batch_in_worker(
+    pool: ProcessPoolExecutor,
+    block_records: Dict[bytes32, BlockRecord],
+    new_blocks_pickled: Dict[bytes, bytes],
+    *args,
+) -> List[bytes]:
+    loop = asyncio.get_running_loop()
+    block_hashes = [bytes(k) for k in block_records.keys()]
+    results = await loop.run_in_executor(
+        pool, batch_pre_validate_blocks_in_worker, block_hashes, new_blocks_pickled, *args
+    )
+    if results is None:
+        # The worker did not validate a batch of the previous call, so it misses some records
+        all_blocks_pickled = {bytes(k): bytes(v) for k, v in block_records.items()}
+        results = await loop.run_in_executor(
+            pool, batch_pre_validate_blocks_in_worker, block_hashes, all_blocks_pickled, *args
+        )
+        assert results is not None
+    return results
+
+
 async def pre_validate_blocks_multiprocessing(
     constants: ConsensusConstants,
     constants_json: Dict,
@@ -132,8 +275,10 @@ async def pre_validate_blocks_multiprocessing(
     check_filter: bool,
     npc_results: Dict[uint32, NPCResult],
     get_block_generator: Optional[Callable],
-    batch_size: int,
+    batch_size: Optional[int],
     wp_summaries: Optional[List[SubEpochSummary]] = None,
+    batch_sizer: Optional[BatchSizer] = None,
+    worker_records: Optional[WorkerBlockRecords] = None,
 ) -> Optional[List[PreValidationResult]]:
     """
     This method must be called under the blockchain lock
@@ -149,6 +294,9 @@ async def pre_validate_blocks_multiprocessing(
         blocks: list of full blocks to validate (must be connected to current chain)
         npc_results
         get_block_generator
+        batch_size: number of blocks validated by a worker at once, picked by batch_sizer if None
+        batch_sizer: picks the batch size, and measures the validation time
+        worker_records: the block records kept by the workers, if pool was started with init_validation_worker
     """
     prev_b: Optional[BlockRecord] = None
     # Collects all the recent blocks (up to the previous sub-epoch)
@@ -247,19 +395,24 @@ async def pre_validate_blocks_multiprocessing(
         if not block_record_was_present[i]:
             block_records.remove_block_record(block.header_hash)
 
-    recent_sb_compressed_pickled = {bytes(k): bytes(v) for k, v in recent_blocks_compressed.items()}
+    if worker_records is None:
+        recent_sb_compressed_pickled = {bytes(k): bytes(v) for k, v in recent_blocks_compressed.items()}
+    else:
+        new_blocks_pickled = {bytes(k): bytes(v) for k, v in recent_blocks.items() if k not in worker_records.sent}
+        worker_records.sent = set(recent_blocks.keys())
     npc_results_pickled = {}
     for k, v in npc_results.items():
         npc_results_pickled[k] = bytes(v)
+    if batch_size is None:
+        assert batch_sizer is not None
+        batch_size = batch_sizer.batch_size(len(blocks))
     futures = []
+    validation_start = time.monotonic()
     # Pool of workers to validate blocks concurrently
     for i in range(0, len(blocks), batch_size):
         end_i = min(i + batch_size, len(blocks))
         blocks_to_validate = blocks[i:end_i]
-        if any([len(block.finished_sub_slots) > 0 for block in blocks_to_validate]):
-            final_pickled = {bytes(k): bytes(v) for k, v in recent_blocks.items()}
-        else:
-            final_pickled = recent_sb_compressed_pickled
+        has_sub_slots = any([len(block.finished_sub_slots) > 0 for block in blocks_to_validate])
         b_pickled: Optional[List[bytes]] = None
         hb_pickled: Optional[List[bytes]] = None
         previous_generators: List[Optional[bytes]] = []
@@ -292,24 +445,45 @@ async def pre_validate_blocks_multiprocessing(
                     hb_pickled = []
                 hb_pickled.append(bytes(block))
 
-        futures.append(
-            asyncio.get_running_loop().run_in_executor(
-                pool,
-                batch_pre_validate_blocks,
-                constants_json,
-                final_pickled,
-                b_pickled,
-                hb_pickled,
-                previous_generators,
-                npc_results_pickled,
-                check_filter,
-                [diff_ssis[j][0] for j in range(i, end_i)],
-                [diff_ssis[j][1] for j in range(i, end_i)],
+        if worker_records is not None:
+            futures.append(
+                asyncio.create_task(
+                    _pre_validate_batch_in_worker(
+                        pool,
+                        recent_blocks if has_sub_slots else recent_blocks_compressed,
+                        new_blocks_pickled,
+                        b_pickled,
+                        hb_pickled,
+                        previous_generators,
+                        npc_results_pickled,
+                        check_filter,
+                        [diff_ssis[j][0] for j in range(i, end_i)],
+                        [diff_ssis[j][1] for j in range(i, end_i)],
+                    )
+                )
             )
-        )
+        else:
+            if has_sub_slots:
+                final_pickled = {bytes(k): bytes(v) for k, v in recent_blocks.items()}
+            else:
+                final_pickled = recent_sb_compressed_pickled
+            futures.append(
+                asyncio.get_running_loop().run_in_executor(
+                    pool,
+                    batch_pre_validate_blocks,
+                    constants_json,
+                    final_pickled,
+                    b_pickled,
+                    hb_pickled,
+                    previous_generators,
+                    npc_results_pickled,
+                    check_filter,
+                    [diff_ssis[j][0] for j in range(i, end_i)],
+                    [diff_ssis[j][1] for j in range(i, end_i)],
+                )
+            )
+    batch_results = await asyncio.gather(*futures)
+    if batch_sizer is not None:
+        batch_sizer.add_measurement(len(blocks), len(futures), time.monotonic() - validation_start)
     # Collect all results into one flat list
-    return [
-        PreValidationResult.from_bytes(result)
-        for batch_result in (await asyncio.gather(*futures))
-        for result in batch_result
-    ]
+    return [PreValidationResult.from_bytes(result) for batch_result in batch_results for result in batch_result]
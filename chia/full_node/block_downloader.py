@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from chia.protocols.full_node_protocol import RejectBlocks, RequestBlocks, RespondBlocks
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
+from chia.util.ints import uint32
+
+log = logging.getLogger(__name__)
+
+
+class BlockBatchDownloader:
+    """
+    Downloads the blocks of a long sync, from start_height to end_height, in batches of batch_size blocks (the last
+    block of a batch is also the first block of the next one, like in the requests of the sync loop).
+
+    Up to max_in_flight batches are requested at once, from the peers with the fewest pending requests, and
+    next_batch() returns them in order of height. Peers which time out or respond slowly are backed off for an
+    increasing time, and are closed after MAX_FAILURES failures in a row. Peers which reject a request, or send
+    the wrong blocks, are not used any more.
+    """
+
+    MAX_FAILURES = 3
+    MAX_BACKOFF = 60.0
+
+    def __init__(
+        self,
+        peers: List[WSChiaConnection],
+        start_height: int,
+        end_height: int,
+        batch_size: int,
+        max_in_flight: int,
+        timeout: int = 60,
+    ):
+        self.start_height = start_height
+        self.end_height = end_height
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._peers: Dict[bytes32, WSChiaConnection] = {}
+        self._pending: Dict[bytes32, int] = {}
+        self._failures: Dict[bytes32, int] = {}
+        self._backoff_until: Dict[bytes32, float] = {}
+        self._peers_changed = asyncio.Event()
+        # Reorder buffer, the tasks of the batches in order of height
+        self._batches: asyncio.Queue = asyncio.Queue(max(max_in_flight, 1))
+        self._scheduler: Optional[asyncio.Task] = None
+        self.set_peers(peers)
+
+    def set_peers(self, peers: List[WSChiaConnection]) -> None:
+        """
+        Replaces the peers the blocks are downloaded from. Requests in flight to removed peers are not cancelled.
+        """
+        self._peers = {peer.peer_node_id: peer for peer in peers}
+        self._peers_changed.set()
+
+    def get_peers(self) -> List[WSChiaConnection]:
+        return list(self._peers.values())
+
+    def start(self) -> None:
+        self._scheduler = asyncio.create_task(self._schedule_batches())
+
+    async def close(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+        while not self._batches.empty():
+            entry = self._batches.get_nowait()
+            if entry is not None:
+                entry[2].cancel()
+
+    async def next_batch(self) -> Optional[Tuple[int, int, Optional[Tuple[WSChiaConnection, List[FullBlock]]]]]:
+        """
+        Returns the next batch as (start height, end height, (peer, blocks)), with None instead of the peer and
+        blocks if no peer could send them, or None after the last batch.
+        """
+        entry = await self._batches.get()
+        if entry is None:
+            return None
+        start_height, end_height, task = entry
+        return start_height, end_height, await task
+
+    async def retry_batch(
+        self, start_height: int, end_height: int, exclude: Set[bytes32]
+    ) -> Optional[Tuple[WSChiaConnection, List[FullBlock]]]:
+        """
+        Downloads a batch again, from a peer which is not in exclude, for example because the first peer sent
+        invalid blocks.
+        """
+        return await self._fetch_batch(start_height, end_height, exclude)
+
+    async def _schedule_batches(self) -> None:
+        for start_height in range(self.start_height, self.end_height, self.batch_size):
+            end_height = min(self.end_height, start_height + self.batch_size)
+            task = asyncio.create_task(self._fetch_batch(start_height, end_height, set()))
+            try:
+                # Blocks while the reorder buffer is full, which limits the number of batches in flight
+                await self._batches.put((start_height, end_height, task))
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+        await self._batches.put(None)
+
+    async def _select_peer(self, exclude: Set[bytes32]) -> Optional[WSChiaConnection]:
+        while True:
+            for node_id, peer in list(self._peers.items()):
+                if peer.closed:
+                    self._peers.pop(node_id)
+            candidates = [peer for node_id, peer in self._peers.items() if node_id not in exclude]
+            if len(candidates) == 0:
+                return None
+            now = time.monotonic()
+            ready = [peer for peer in candidates if self._backoff_until.get(peer.peer_node_id, 0) <= now]
+            if len(ready) > 0:
+                return min(ready, key=lambda peer: self._pending.get(peer.peer_node_id, 0))
+            wait_time = min(self._backoff_until[peer.peer_node_id] for peer in candidates) - now
+            self._peers_changed.clear()
+            try:
+                await asyncio.wait_for(self._peers_changed.wait(), wait_time)
+            except asyncio.TimeoutError:
+                pass
+
+    def _remove_peer(self, peer: WSChiaConnection) -> None:
+        if self._peers.get(peer.peer_node_id) is peer:
+            self._peers.pop(peer.peer_node_id)
+
+    async def _back_off(self, peer: WSChiaConnection) -> None:
+        failures = self._failures.get(peer.peer_node_id, 0) + 1
+        self._failures[peer.peer_node_id] = failures
+        if failures >= self.MAX_FAILURES:
+            log.info(f"Closing peer {peer.get_peer_info()} after {failures} failed block requests")
+            self._remove_peer(peer)
+            await peer.close()
+            return None
+        self._backoff_until[peer.peer_node_id] = time.monotonic() + min(2.0 ** failures, self.MAX_BACKOFF)
+
+    async def _fetch_batch(
+        self, start_height: int, end_height: int, exclude: Set[bytes32]
+    ) -> Optional[Tuple[WSChiaConnection, List[FullBlock]]]:
+        request = RequestBlocks(uint32(start_height), uint32(end_height), True)
+        tried: Set[bytes32] = set(exclude)
+        while True:
+            peer = await self._select_peer(tried)
+            if peer is None:
+                return None
+            node_id = peer.peer_node_id
+            self._pending[node_id] = self._pending.get(node_id, 0) + 1
+            request_start = time.monotonic()
+            try:
+                response = await peer.request_blocks(request, timeout=self.timeout)
+            finally:
+                self._pending[node_id] -= 1
+            if response is None:
+                # Timed out or disconnected, another peer might be faster
+                await self._back_off(peer)
+                continue
+            if isinstance(response, RejectBlocks):
+                self._remove_peer(peer)
+                continue
+            if (
+                not isinstance(response, RespondBlocks)
+                or len(response.blocks) != end_height - start_height + 1
+                or response.blocks[0].height != start_height
+            ):
+                log.warning(f"Peer {peer.get_peer_info()} sent the wrong blocks for {start_height} to {end_height}")
+                tried.add(node_id)
+                self._remove_peer(peer)
+                continue
+            if time.monotonic() - request_start > self.timeout / 2:
+                # Keep the blocks, but prefer the other peers for a while
+                await self._back_off(peer)
+            else:
+                self._failures[node_id] = 0
+            return peer, response.blocks
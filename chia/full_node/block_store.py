@@ -1,28 +1,65 @@
+import dataclasses
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import aiosqlite
 
 from chia.consensus.block_record import BlockRecord
+from chia.types.blockchain_format.program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.types.full_block import FullBlock
+from chia.types.header_block import HeaderBlock
 from chia.types.weight_proof import SubEpochChallengeSegment, SubEpochSegments
 from chia.util.db_wrapper import DBWrapper
+from chia.util.height_map import HeightToHash
 from chia.util.ints import uint32
 from chia.util.lru_cache import LRUCache
+from chia.util.streamable import LazyStreamable
 
 log = logging.getLogger(__name__)
 
 
+def split_block_bytes(block: FullBlock) -> Tuple[bytes, Optional[bytes]]:
+    """
+    Returns the serialized block without its transactions generator, and the serialized generator.
+    """
+    block_bytes = bytes(block)
+    if block.transactions_generator is None:
+        return block_bytes, None
+    generator_bytes = bytes(block.transactions_generator)
+    offset = FullBlock.lazy_from_bytes(block_bytes).field_offset("transactions_generator")
+    # The generator is an optional, the flag byte is followed by the program
+    return block_bytes[:offset] + b"\x00" + block_bytes[offset + 1 + len(generator_bytes) :], generator_bytes
+
+
+def join_block_bytes(block_bytes: bytes, generator_bytes: Optional[bytes]) -> bytes:
+    """
+    Returns the serialized block, from the block without its transactions generator and the generator. Blocks
+    written by older versions have no separate generator.
+    """
+    if generator_bytes is None:
+        return block_bytes
+    offset = FullBlock.lazy_from_bytes(block_bytes).field_offset("transactions_generator")
+    return block_bytes[:offset] + b"\x01" + generator_bytes + block_bytes[offset + 1 :]
+
+
+def without_generator(block: FullBlock) -> FullBlock:
+    if block.transactions_generator is None:
+        return block
+    return dataclasses.replace(block, transactions_generator=None)
+
+
 class BlockStore:
     db: aiosqlite.Connection
     block_cache: LRUCache
     db_wrapper: DBWrapper
     ses_challenge_cache: LRUCache
+    block_record_cache: LRUCache
+    generator_cache: LRUCache
 
     @classmethod
-    async def create(cls, db_wrapper: DBWrapper):
+    async def create(cls, db_wrapper: DBWrapper, block_record_cache_size: int = 5000):
         self = cls()
 
         # All full blocks which have been added to the blockchain. Header_hash -> block
@@ -32,8 +69,19 @@ class BlockStore:
         await self.db.execute("pragma synchronous=2")
         await self.db.execute(
             "CREATE TABLE IF NOT EXISTS full_blocks(header_hash text PRIMARY KEY, height bigint,"
-            "  is_block tinyint, is_fully_compactified tinyint, block blob)"
+            "  is_block tinyint, is_fully_compactified tinyint, block blob, generator blob, stripped_block blob)"
         )
+        # The transactions generator is stored apart from the rest of the block, so that blocks can be read without
+        # it. The block without its generator goes in the stripped_block column and the block column is left NULL,
+        # so that older versions fail on these rows instead of reading blocks without their generator. Tables
+        # created by older versions get the new columns added, and their blocks have the generator in the block column
+        cursor = await self.db.execute("PRAGMA table_info(full_blocks)")
+        columns = [row[1] for row in await cursor.fetchall()]
+        await cursor.close()
+        if "generator" not in columns:
+            await self.db.execute("ALTER TABLE full_blocks ADD COLUMN generator blob")
+        if "stripped_block" not in columns:
+            await self.db.execute("ALTER TABLE full_blocks ADD COLUMN stripped_block blob")
 
         # Block records
         await self.db.execute(
@@ -42,6 +90,12 @@ class BlockStore:
             "block blob, sub_epoch_summary blob, is_peak tinyint, is_block tinyint)"
         )
 
+        # Header blocks, with their transactions filter, of the blocks which have been in the main chain. These are
+        # served to wallets without rebuilding them from the full blocks
+        await self.db.execute(
+            "CREATE TABLE IF NOT EXISTS header_blocks(header_hash text PRIMARY KEY, header_block blob)"
+        )
+
         # todo remove in v1.2
         await self.db.execute("DROP TABLE IF EXISTS sub_epoch_segments_v2")
 
@@ -50,6 +104,11 @@ class BlockStore:
             "CREATE TABLE IF NOT EXISTS sub_epoch_segments_v3(ses_block_hash text PRIMARY KEY, challenge_segments blob)"
         )
 
+        # Header hashes of the blocks in the current chain, by height, so the chain can be loaded without walking it
+        await self.db.execute(
+            "CREATE TABLE IF NOT EXISTS main_chain(height bigint PRIMARY KEY, header_hash blob, sub_epoch_summary blob)"
+        )
+
         # Height index so we can look up in order of height for sync purposes
         await self.db.execute("CREATE INDEX IF NOT EXISTS full_block_height on full_blocks(height)")
         await self.db.execute("CREATE INDEX IF NOT EXISTS is_block on full_blocks(is_block)")
@@ -64,18 +123,26 @@ class BlockStore:
         await self.db.commit()
         self.block_cache = LRUCache(1000)
         self.ses_challenge_cache = LRUCache(50)
+        # Block records read from the database, or no longer kept in memory by the blockchain
+        self.block_record_cache = LRUCache(block_record_cache_size)
+        # Transactions generators of blocks, which are referenced by the generators of later blocks
+        self.generator_cache = LRUCache(50)
         return self
 
     async def add_full_block(self, header_hash: bytes32, block: FullBlock, block_record: BlockRecord) -> None:
         self.block_cache.put(header_hash, block)
+        self.block_record_cache.put(header_hash, block_record)
+        block_bytes, generator_bytes = split_block_bytes(block)
         cursor_1 = await self.db.execute(
-            "INSERT OR REPLACE INTO full_blocks VALUES(?, ?, ?, ?, ?)",
+            "INSERT OR REPLACE INTO full_blocks(header_hash, height, is_block, is_fully_compactified, block, "
+            "stripped_block, generator) VALUES(?, ?, ?, ?, NULL, ?, ?)",
             (
                 header_hash.hex(),
                 block.height,
                 int(block.is_transaction_block()),
                 int(block.is_fully_compactified()),
-                bytes(block),
+                block_bytes,
+                generator_bytes,
             ),
         )
 
@@ -97,6 +164,53 @@ class BlockStore:
         )
         await cursor_2.close()
 
+    async def add_header_blocks(self, header_blocks: List[HeaderBlock]) -> None:
+        # We need to be in a sqlite transaction here, together with add_full_block
+        cursor = await self.db.executemany(
+            "INSERT OR REPLACE INTO header_blocks VALUES(?, ?)",
+            [(header_block.header_hash.hex(), bytes(header_block)) for header_block in header_blocks],
+        )
+        await cursor.close()
+
+    async def replace_header_block_proofs(self, block: FullBlock) -> None:
+        """
+        Rewrites the stored header block of a block whose proofs were replaced, keeping its transactions filter.
+        """
+        cursor_1 = await self.db.execute(
+            "SELECT header_block from header_blocks WHERE header_hash=?", (block.header_hash.hex(),)
+        )
+        row = await cursor_1.fetchone()
+        await cursor_1.close()
+        if row is None:
+            return None
+        header_block = dataclasses.replace(
+            HeaderBlock.from_bytes(row[0]),
+            finished_sub_slots=block.finished_sub_slots,
+            challenge_chain_sp_proof=block.challenge_chain_sp_proof,
+            challenge_chain_ip_proof=block.challenge_chain_ip_proof,
+            reward_chain_sp_proof=block.reward_chain_sp_proof,
+            reward_chain_ip_proof=block.reward_chain_ip_proof,
+            infused_challenge_chain_ip_proof=block.infused_challenge_chain_ip_proof,
+        )
+        await self.add_header_blocks([header_block])
+
+    async def get_header_blocks_bytes(self, header_hashes: List[bytes32]) -> Dict[bytes32, bytes]:
+        """
+        Returns the serialized header blocks which are stored, by header hash. Blocks which were added by older
+        versions, or were never in the main chain, have no stored header block.
+        """
+        if len(header_hashes) == 0:
+            return {}
+
+        header_hashes_db = tuple([hh.hex() for hh in header_hashes])
+        placeholders = "?," * (len(header_hashes_db) - 1)
+        formatted_str = f"SELECT header_hash, header_block from header_blocks WHERE header_hash in ({placeholders}?)"
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(formatted_str, header_hashes_db)
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return {bytes32(bytes.fromhex(row[0])): row[1] for row in rows}
+
     async def persist_sub_epoch_challenge_segments(
         self, ses_block_hash: bytes32, segments: List[SubEpochChallengeSegment]
     ) -> None:
@@ -115,11 +229,12 @@ class BlockStore:
         cached = self.ses_challenge_cache.get(ses_block_hash)
         if cached is not None:
             return cached
-        cursor = await self.db.execute(
-            "SELECT challenge_segments from sub_epoch_segments_v3 WHERE ses_block_hash=?", (ses_block_hash.hex(),)
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                "SELECT challenge_segments from sub_epoch_segments_v3 WHERE ses_block_hash=?", (ses_block_hash.hex(),)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is not None:
             challenge_segments = SubEpochSegments.from_bytes(row[0]).challenge_segments
             self.ses_challenge_cache.put(ses_block_hash, challenge_segments)
@@ -133,45 +248,91 @@ class BlockStore:
             # this is best effort. When rolling back, we may not have added the
             # block to the cache yet
             pass
+        self.block_record_cache.remove_many([header_hash])
+        self.generator_cache.remove_many([header_hash])
+
+    def cache_block_records(self, block_records: List[BlockRecord]) -> None:
+        """
+        Keeps block records which are already stored, for example the ones the blockchain no longer keeps in memory.
+        """
+        self.block_record_cache.put_many((block_record.header_hash, block_record) for block_record in block_records)
 
-    async def get_full_block(self, header_hash: bytes32) -> Optional[FullBlock]:
+    async def get_full_block(self, header_hash: bytes32, include_generator: bool = True) -> Optional[FullBlock]:
+        """
+        Returns the block, without its transactions generator if include_generator is False. Blocks without their
+        generator are not cached.
+        """
         cached = self.block_cache.get(header_hash)
         if cached is not None:
             log.debug(f"cache hit for block {header_hash.hex()}")
+            if not include_generator:
+                return without_generator(cached)
             return cached
         log.debug(f"cache miss for block {header_hash.hex()}")
-        cursor = await self.db.execute("SELECT block from full_blocks WHERE header_hash=?", (header_hash.hex(),))
-        row = await cursor.fetchone()
-        await cursor.close()
+        query = "SELECT COALESCE(stripped_block, block), generator from full_blocks WHERE header_hash=?"
+        if not include_generator:
+            query = "SELECT COALESCE(stripped_block, block) from full_blocks WHERE header_hash=?"
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(query, (header_hash.hex(),))
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is not None:
-            block = FullBlock.from_bytes(row[0])
+            if not include_generator:
+                return without_generator(FullBlock.from_bytes(row[0]))
+            block = FullBlock.from_bytes(join_block_bytes(row[0], row[1]))
             self.block_cache.put(header_hash, block)
             return block
         return None
 
+    async def get_full_block_lazy(self, header_hash: bytes32) -> Optional[Union[FullBlock, LazyStreamable]]:
+        """
+        Like get_full_block, but a block that is not cached is returned as a lazy view which only decodes the
+        fields that are read. Reading header fields such as height, header_hash or foliage_transaction_block
+        does not decode the sub slot proofs or the transactions generator. Lazy views are not cached.
+        """
+        cached = self.block_cache.get(header_hash)
+        if cached is not None:
+            log.debug(f"cache hit for block {header_hash.hex()}")
+            return cached
+        log.debug(f"cache miss for block {header_hash.hex()}")
+        block_bytes = await self.get_full_block_bytes(header_hash)
+        if block_bytes is not None:
+            return FullBlock.lazy_from_bytes(block_bytes)
+        return None
+
     async def get_full_block_bytes(self, header_hash: bytes32) -> Optional[bytes]:
         cached = self.block_cache.get(header_hash)
         if cached is not None:
             log.debug(f"cache hit for block {header_hash.hex()}")
             return bytes(cached)
         log.debug(f"cache miss for block {header_hash.hex()}")
-        cursor = await self.db.execute("SELECT block from full_blocks WHERE header_hash=?", (header_hash.hex(),))
-        row = await cursor.fetchone()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                "SELECT COALESCE(stripped_block, block), generator from full_blocks WHERE header_hash=?",
+                (header_hash.hex(),),
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is not None:
-            return row[0]
+            return join_block_bytes(row[0], row[1])
         return None
 
-    async def get_full_blocks_at(self, heights: List[uint32]) -> List[FullBlock]:
+    async def get_full_blocks_at(self, heights: List[uint32], include_generator: bool = True) -> List[FullBlock]:
         if len(heights) == 0:
             return []
 
         heights_db = tuple(heights)
-        formatted_str = f'SELECT block from full_blocks WHERE height in ({"?," * (len(heights_db) - 1)}?)'
-        cursor = await self.db.execute(formatted_str, heights_db)
-        rows = await cursor.fetchall()
-        await cursor.close()
-        return [FullBlock.from_bytes(row[0]) for row in rows]
+        columns = "COALESCE(stripped_block, block)"
+        if include_generator:
+            columns += ", generator"
+        formatted_str = f'SELECT {columns} from full_blocks WHERE height in ({"?," * (len(heights_db) - 1)}?)'
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(formatted_str, heights_db)
+            rows = await cursor.fetchall()
+            await cursor.close()
+        if not include_generator:
+            return [without_generator(FullBlock.from_bytes(row[0])) for row in rows]
+        return [FullBlock.from_bytes(join_block_bytes(row[0], row[1])) for row in rows]
 
     async def get_block_records_by_hash(self, header_hashes: List[bytes32]):
         """
@@ -181,15 +342,20 @@ class BlockStore:
         if len(header_hashes) == 0:
             return []
 
-        header_hashes_db = tuple([hh.hex() for hh in header_hashes])
-        formatted_str = f'SELECT block from block_records WHERE header_hash in ({"?," * (len(header_hashes_db) - 1)}?)'
-        cursor = await self.db.execute(formatted_str, header_hashes_db)
-        rows = await cursor.fetchall()
-        await cursor.close()
-        all_blocks: Dict[bytes32, BlockRecord] = {}
-        for row in rows:
-            block_rec: BlockRecord = BlockRecord.from_bytes(row[0])
-            all_blocks[block_rec.header_hash] = block_rec
+        all_blocks: Dict[bytes32, BlockRecord] = self.block_record_cache.get_many(header_hashes)
+        header_hashes_db = tuple([hh.hex() for hh in header_hashes if hh not in all_blocks])
+        if len(header_hashes_db) > 0:
+            formatted_str = (
+                f'SELECT block from block_records WHERE header_hash in ({"?," * (len(header_hashes_db) - 1)}?)'
+            )
+            async with self.db_wrapper.reader() as conn:
+                cursor = await conn.execute(formatted_str, header_hashes_db)
+                rows = await cursor.fetchall()
+                await cursor.close()
+            fetched: List[BlockRecord] = [BlockRecord.from_bytes(row[0]) for row in rows]
+            self.cache_block_records(fetched)
+            for block_rec in fetched:
+                all_blocks[block_rec.header_hash] = block_rec
         ret: List[BlockRecord] = []
         for hh in header_hashes:
             if hh not in all_blocks:
@@ -197,9 +363,12 @@ class BlockStore:
             ret.append(all_blocks[hh])
         return ret
 
-    async def get_blocks_by_hash(self, header_hashes: List[bytes32]) -> List[FullBlock]:
+    async def get_blocks_by_hash(
+        self, header_hashes: List[bytes32], include_generator: bool = True
+    ) -> List[FullBlock]:
         """
         Returns a list of Full Blocks blocks, ordered by the same order in which header_hashes are passed in.
+        The blocks have no transactions generator if include_generator is False.
         Throws an exception if the blocks are not present
         """
 
@@ -207,18 +376,25 @@ class BlockStore:
             return []
 
         header_hashes_db = tuple([hh.hex() for hh in header_hashes])
+        columns = "header_hash, COALESCE(stripped_block, block)"
+        if include_generator:
+            columns += ", generator"
         formatted_str = (
-            f'SELECT header_hash, block from full_blocks WHERE header_hash in ({"?," * (len(header_hashes_db) - 1)}?)'
+            f'SELECT {columns} from full_blocks WHERE header_hash in ({"?," * (len(header_hashes_db) - 1)}?)'
         )
-        cursor = await self.db.execute(formatted_str, header_hashes_db)
-        rows = await cursor.fetchall()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(formatted_str, header_hashes_db)
+            rows = await cursor.fetchall()
+            await cursor.close()
         all_blocks: Dict[bytes32, FullBlock] = {}
         for row in rows:
             header_hash = bytes.fromhex(row[0])
-            full_block: FullBlock = FullBlock.from_bytes(row[1])
+            if include_generator:
+                full_block: FullBlock = FullBlock.from_bytes(join_block_bytes(row[1], row[2]))
+                self.block_cache.put(header_hash, full_block)
+            else:
+                full_block = without_generator(FullBlock.from_bytes(row[1]))
             all_blocks[header_hash] = full_block
-            self.block_cache.put(header_hash, full_block)
         ret: List[FullBlock] = []
         for hh in header_hashes:
             if hh not in all_blocks:
@@ -226,15 +402,72 @@ class BlockStore:
             ret.append(all_blocks[hh])
         return ret
 
+    async def get_generators_by_hash(self, header_hashes: List[bytes32]) -> List[Optional[SerializedProgram]]:
+        """
+        Returns the transactions generators of the blocks, ordered by the same order in which header_hashes are
+        passed in, or None for blocks without a generator. The blocks which are not cached are read in one query,
+        and only their generator is decoded. Throws an exception if the blocks are not present
+        """
+        if len(header_hashes) == 0:
+            return []
+
+        generators: Dict[bytes32, Optional[SerializedProgram]] = self.generator_cache.get_many(header_hashes)
+        missing: List[bytes32] = []
+        for hh in header_hashes:
+            if hh in generators:
+                continue
+            cached_block = self.block_cache.get(hh)
+            if cached_block is not None:
+                generators[hh] = cached_block.transactions_generator
+            else:
+                missing.append(hh)
+
+        if len(missing) > 0:
+            header_hashes_db = tuple([hh.hex() for hh in set(missing)])
+            placeholders = "?," * (len(header_hashes_db) - 1)
+            # The blocks are only read if they might have their generator inline, like blocks of older versions
+            formatted_str = (
+                "SELECT header_hash, generator, CASE WHEN generator IS NULL AND stripped_block IS NULL THEN block END "
+                f"from full_blocks WHERE header_hash in ({placeholders}?)"
+            )
+            async with self.db_wrapper.reader() as conn:
+                cursor = await conn.execute(formatted_str, header_hashes_db)
+                rows = await cursor.fetchall()
+                await cursor.close()
+            for row in rows:
+                header_hash = bytes32(bytes.fromhex(row[0]))
+                if row[1] is not None:
+                    generators[header_hash] = SerializedProgram.from_bytes(row[1])
+                elif row[2] is not None:
+                    generators[header_hash] = FullBlock.lazy_from_bytes(row[2]).transactions_generator
+                else:
+                    generators[header_hash] = None
+
+        ret: List[Optional[SerializedProgram]] = []
+        for hh in header_hashes:
+            if hh not in generators:
+                raise ValueError(f"Header hash {hh} not in the blockchain")
+            generator = generators[hh]
+            if generator is not None:
+                self.generator_cache.put(hh, generator)
+            ret.append(generator)
+        return ret
+
     async def get_block_record(self, header_hash: bytes32) -> Optional[BlockRecord]:
-        cursor = await self.db.execute(
-            "SELECT block from block_records WHERE header_hash=?",
-            (header_hash.hex(),),
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
+        cached = self.block_record_cache.get(header_hash)
+        if cached is not None:
+            return cached
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                "SELECT block from block_records WHERE header_hash=?",
+                (header_hash.hex(),),
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is not None:
-            return BlockRecord.from_bytes(row[0])
+            block_record = BlockRecord.from_bytes(row[0])
+            self.block_record_cache.put(header_hash, block_record)
+            return block_record
         return None
 
     async def get_block_records_in_range(
@@ -249,9 +482,10 @@ class BlockStore:
 
         formatted_str = f"SELECT header_hash, block from block_records WHERE height >= {start} and height <= {stop}"
 
-        cursor = await self.db.execute(formatted_str)
-        rows = await cursor.fetchall()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(formatted_str)
+            rows = await cursor.fetchall()
+            await cursor.close()
         ret: Dict[bytes32, BlockRecord] = {}
         for row in rows:
             header_hash = bytes.fromhex(row[0])
@@ -267,38 +501,85 @@ class BlockStore:
         peak header hash.
         """
 
-        res = await self.db.execute("SELECT * from block_records WHERE is_peak = 1")
-        peak_row = await res.fetchone()
-        await res.close()
+        async with self.db_wrapper.reader() as conn:
+            res = await conn.execute("SELECT * from block_records WHERE is_peak = 1")
+            peak_row = await res.fetchone()
+            await res.close()
         if peak_row is None:
             return {}, None
 
         formatted_str = f"SELECT header_hash, block  from block_records WHERE height >= {peak_row[2] - blocks_n}"
-        cursor = await self.db.execute(formatted_str)
-        rows = await cursor.fetchall()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(formatted_str)
+            rows = await cursor.fetchall()
+            await cursor.close()
         ret: Dict[bytes32, BlockRecord] = {}
         for row in rows:
             header_hash = bytes.fromhex(row[0])
             ret[header_hash] = BlockRecord.from_bytes(row[1])
         return ret, bytes.fromhex(peak_row[0])
 
-    async def get_peak_height_dicts(self) -> Tuple[Dict[uint32, bytes32], Dict[uint32, SubEpochSummary]]:
+    async def get_peak_height_dicts(self) -> Tuple[HeightToHash, Dict[uint32, SubEpochSummary]]:
         """
-        Returns a dictionary with all blocks, as well as the header hash of the peak,
-        if present.
+        Returns the header hashes of all blocks in the current chain by height, and a dictionary with the sub epoch
+        summaries included in the current chain, by height.
+        These are read from the main_chain table. If the table does not match the peak, for example because it was
+        created by an older version, the chain is walked from the peak instead, and the table is rebuilt.
         """
 
-        res = await self.db.execute("SELECT * from block_records WHERE is_peak = 1")
-        row = await res.fetchone()
-        await res.close()
-        if row is None:
-            return {}, {}
+        height_to_hash = HeightToHash()
+        sub_epoch_summaries: Dict[uint32, SubEpochSummary] = {}
+        async with self.db_wrapper.reader() as conn:
+            res = await conn.execute("SELECT header_hash, height from block_records WHERE is_peak = 1")
+            peak_row = await res.fetchone()
+            await res.close()
+            if peak_row is None:
+                return height_to_hash, sub_epoch_summaries
+            # The rows are appended to the map as they are fetched, without holding all of them in memory
+            cursor = await conn.execute("SELECT height, header_hash, sub_epoch_summary from main_chain ORDER BY height")
+            dense = True
+            while dense:
+                rows = await cursor.fetchmany(10000)
+                if len(rows) == 0:
+                    break
+                for row in rows:
+                    if row[0] != len(height_to_hash):
+                        dense = False
+                        break
+                    height_to_hash.append(bytes32(row[1]))
+                    if row[2] is not None:
+                        sub_epoch_summaries[row[0]] = SubEpochSummary.from_bytes(row[2])
+            await cursor.close()
+
+        peak: bytes32 = bytes32(bytes.fromhex(peak_row[0]))
+        if dense and len(height_to_hash) == peak_row[1] + 1 and height_to_hash[peak_row[1]] == peak:
+            return height_to_hash, sub_epoch_summaries
+
+        log.info("Rebuilding the main chain index of the database")
+        height_to_hash, sub_epoch_summaries = await self._walk_peak_height_dicts(peak)
+        async with self.db_wrapper.lock:
+            cursor_1 = await self.db.execute("DELETE FROM main_chain")
+            await cursor_1.close()
+            cursor_2 = await self.db.executemany(
+                "INSERT INTO main_chain VALUES(?, ?, ?)",
+                (
+                    (
+                        height,
+                        height_to_hash[height],
+                        None if height not in sub_epoch_summaries else bytes(sub_epoch_summaries[height]),
+                    )
+                    for height in range(len(height_to_hash))
+                ),
+            )
+            await cursor_2.close()
+            await self.db.commit()
+        return height_to_hash, sub_epoch_summaries
 
-        peak: bytes32 = bytes.fromhex(row[0])
-        cursor = await self.db.execute("SELECT header_hash,prev_hash,height,sub_epoch_summary from block_records")
-        rows = await cursor.fetchall()
-        await cursor.close()
+    async def _walk_peak_height_dicts(self, peak: bytes32) -> Tuple[HeightToHash, Dict[uint32, SubEpochSummary]]:
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute("SELECT header_hash,prev_hash,height,sub_epoch_summary from block_records")
+            rows = await cursor.fetchall()
+            await cursor.close()
         hash_to_prev_hash: Dict[bytes32, bytes32] = {}
         hash_to_height: Dict[bytes32, uint32] = {}
         hash_to_summary: Dict[bytes32, SubEpochSummary] = {}
@@ -309,11 +590,12 @@ class BlockStore:
             if row[3] is not None:
                 hash_to_summary[bytes.fromhex(row[0])] = SubEpochSummary.from_bytes(row[3])
 
-        height_to_hash: Dict[uint32, bytes32] = {}
         sub_epoch_summaries: Dict[uint32, SubEpochSummary] = {}
 
         curr_header_hash = peak
         curr_height = hash_to_height[curr_header_hash]
+        # The chain is walked down from the peak, so the map is allocated up front and filled in
+        height_to_hash = HeightToHash(bytes(32 * (curr_height + 1)))
         while True:
             height_to_hash[curr_height] = curr_header_hash
             if curr_header_hash in hash_to_summary:
@@ -324,6 +606,29 @@ class BlockStore:
             curr_height = hash_to_height[curr_header_hash]
         return height_to_hash, sub_epoch_summaries
 
+    async def set_main_chain(self, fork_height: int, records: List[BlockRecord]) -> None:
+        """
+        Replaces the blocks above fork_height in the main_chain table with the given records, which go up to the
+        new peak. The records can start below fork_height + 1, if the fork point passed to the blockchain was too high.
+        """
+        if len(records) > 0:
+            fork_height = min(fork_height, records[0].height - 1)
+        # We need to be in a sqlite transaction here, together with set_peak
+        cursor_1 = await self.db.execute("DELETE FROM main_chain WHERE height>?", (fork_height,))
+        await cursor_1.close()
+        cursor_2 = await self.db.executemany(
+            "INSERT INTO main_chain VALUES(?, ?, ?)",
+            [
+                (
+                    record.height,
+                    record.header_hash,
+                    None if record.sub_epoch_summary_included is None else bytes(record.sub_epoch_summary_included),
+                )
+                for record in records
+            ],
+        )
+        await cursor_2.close()
+
     async def set_peak(self, header_hash: bytes32) -> None:
         # We need to be in a sqlite transaction here.
         # Note: we do not commit this to the database yet, as we need to also change the coin store
@@ -336,21 +641,23 @@ class BlockStore:
         await cursor_2.close()
 
     async def is_fully_compactified(self, header_hash: bytes32) -> Optional[bool]:
-        cursor = await self.db.execute(
-            "SELECT is_fully_compactified from full_blocks WHERE header_hash=?", (header_hash.hex(),)
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                "SELECT is_fully_compactified from full_blocks WHERE header_hash=?", (header_hash.hex(),)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is None:
             return None
         return bool(row[0])
 
     async def get_first_not_compactified(self, min_height: int) -> Optional[int]:
-        cursor = await self.db.execute(
-            "SELECT MIN(height) from full_blocks WHERE is_fully_compactified=0 AND height>=?", (min_height,)
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                "SELECT MIN(height) from full_blocks WHERE is_fully_compactified=0 AND height>=?", (min_height,)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is None:
             return None
         return int(row[0])
@@ -1,4 +1,6 @@
-from typing import List, Optional
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import aiosqlite
 
@@ -6,10 +8,138 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.coin_record import CoinRecord
 from chia.types.full_block import FullBlock
-from chia.util.db_wrapper import DBWrapper
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper
 from chia.util.ints import uint32, uint64
 from chia.util.lru_cache import LRUCache
 
+log = logging.getLogger(__name__)
+
+# Coin names, puzzle hashes and parent ids are stored as 32 byte blobs. Amounts are stored as 64 bit integers,
+# with the amounts from 2^63 up, which don't fit into a signed SQLite integer, wrapped around to negative values.
+COIN_RECORD_TABLE = (
+    "CREATE TABLE IF NOT EXISTS coin_record("
+    "coin_name blob PRIMARY KEY,"
+    " confirmed_index bigint,"
+    " spent_index bigint,"
+    " spent int,"
+    " coinbase int,"
+    " puzzle_hash blob,"
+    " coin_parent blob,"
+    " amount bigint,"
+    " timestamp bigint)"
+)
+
+# The indexes of older versions keep their names and follow the legacy table when it is renamed, so the indexes of
+# the binary table have their own names
+COIN_RECORD_INDEXES = [
+    # Useful for reorg lookups
+    "CREATE INDEX IF NOT EXISTS coin_record_confirmed_index on coin_record(confirmed_index)",
+    "CREATE INDEX IF NOT EXISTS coin_record_spent_index on coin_record(spent_index)",
+    "CREATE INDEX IF NOT EXISTS coin_record_spent on coin_record(spent)",
+    "CREATE INDEX IF NOT EXISTS coin_record_puzzle_hash on coin_record(puzzle_hash)",
+]
+
+
+def amount_to_db(amount: int) -> int:
+    return amount - 2 ** 64 if amount >= 2 ** 63 else amount
+
+
+def amount_from_db(amount: int) -> uint64:
+    return uint64(amount + 2 ** 64 if amount < 0 else amount)
+
+
+def row_to_coin_record(row: Tuple) -> CoinRecord:
+    if isinstance(row[0], str):
+        # A row of the legacy table
+        coin = Coin(bytes32.fromhex(row[6]), bytes32.fromhex(row[5]), uint64.from_bytes(row[7]))
+    else:
+        coin = Coin(bytes32(row[6]), bytes32(row[5]), amount_from_db(row[7]))
+    return CoinRecord(coin, row[1], row[2], row[3], row[4], row[8])
+
+
+async def start_coin_records_migration(db: aiosqlite.Connection) -> bool:
+    """
+    Moves a coin_record table with the legacy schema, which stores the hashes as hex text and the amount as bytes,
+    aside to coin_record_legacy and creates the binary table in its place. Returns whether there are legacy rows
+    left to migrate. A legacy table which was emptied by an earlier migration is dropped.
+    """
+    cursor = await db.execute("PRAGMA table_info(coin_record)")
+    columns = {row[1]: row[2] for row in await cursor.fetchall()}
+    await cursor.close()
+    if columns.get("coin_name", "").lower() == "text":
+        await db.execute("ALTER TABLE coin_record RENAME TO coin_record_legacy")
+        await db.execute(COIN_RECORD_TABLE)
+        await db.commit()
+
+    cursor = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='coin_record_legacy'")
+    legacy_exists = await cursor.fetchone() is not None
+    await cursor.close()
+    if not legacy_exists:
+        return False
+    cursor = await db.execute("SELECT rowid from coin_record_legacy LIMIT 1")
+    legacy_empty = await cursor.fetchone() is None
+    await cursor.close()
+    if legacy_empty:
+        await db.execute("DROP TABLE coin_record_legacy")
+        await db.commit()
+        return False
+    return True
+
+
+async def migrate_coin_records_batch(db: aiosqlite.Connection, batch_size: int) -> int:
+    """
+    Moves up to batch_size rows from coin_record_legacy to the binary table in one transaction, so a row is always
+    in exactly one of the tables. Returns the number of rows moved, which is 0 once the legacy table is empty.
+    """
+    cursor = await db.execute("SELECT rowid, * from coin_record_legacy ORDER BY rowid LIMIT ?", (batch_size,))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    if len(rows) == 0:
+        return 0
+    await db.executemany(
+        "INSERT OR REPLACE INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                bytes.fromhex(row[1]),
+                row[2],
+                row[3],
+                row[4],
+                row[5],
+                bytes.fromhex(row[6]),
+                bytes.fromhex(row[7]),
+                amount_to_db(uint64.from_bytes(row[8])),
+                row[9],
+            )
+            for row in rows
+        ],
+    )
+    await db.execute("DELETE FROM coin_record_legacy WHERE rowid<=?", (rows[-1][0],))
+    await db.commit()
+    return len(rows)
+
+
+async def migrate_coin_records(db: aiosqlite.Connection, batch_size: int = 10000) -> int:
+    """
+    Converts a coin_record table with the legacy schema to the current schema, with nothing else using the
+    database. The rows are moved over in batches of batch_size, each in its own transaction, so the migration can
+    be interrupted and picks up where it left off the next time it runs. Returns the number of rows converted,
+    which is 0 if there is nothing to migrate.
+    """
+    if not await start_coin_records_migration(db):
+        return 0
+    log.info("Migrating the coin_record table to the binary schema")
+    migrated = 0
+    while True:
+        moved = await migrate_coin_records_batch(db, batch_size)
+        if moved == 0:
+            break
+        migrated += moved
+        log.info(f"Migrated {migrated} coin records")
+
+    await db.execute("DROP TABLE coin_record_legacy")
+    await db.commit()
+    return migrated
+
 
 class CoinStore:
     """
@@ -21,9 +151,14 @@ class CoinStore:
     coin_record_cache: LRUCache
     cache_size: uint32
     db_wrapper: DBWrapper
+    # Whether coin_record_legacy still has rows, written by older versions, which are read along with coin_record
+    migrating: bool
+    migration_task: Optional[asyncio.Task]
 
     @classmethod
-    async def create(cls, db_wrapper: DBWrapper, cache_size: uint32 = uint32(60000)):
+    async def create(
+        cls, db_wrapper: DBWrapper, cache_size: uint32 = uint32(60000), migration_batch_size: int = 10000
+    ):
         self = cls()
 
         self.cache_size = cache_size
@@ -31,36 +166,59 @@ class CoinStore:
         self.coin_record_db = db_wrapper.db
         await self.coin_record_db.execute("pragma journal_mode=wal")
         await self.coin_record_db.execute("pragma synchronous=2")
-        await self.coin_record_db.execute(
-            (
-                "CREATE TABLE IF NOT EXISTS coin_record("
-                "coin_name text PRIMARY KEY,"
-                " confirmed_index bigint,"
-                " spent_index bigint,"
-                " spent int,"
-                " coinbase int,"
-                " puzzle_hash text,"
-                " coin_parent text,"
-                " amount blob,"
-                " timestamp bigint)"
-            )
-        )
-
-        # Useful for reorg lookups
-        await self.coin_record_db.execute(
-            "CREATE INDEX IF NOT EXISTS coin_confirmed_index on coin_record(confirmed_index)"
-        )
-
-        await self.coin_record_db.execute("CREATE INDEX IF NOT EXISTS coin_spent_index on coin_record(spent_index)")
-
-        await self.coin_record_db.execute("CREATE INDEX IF NOT EXISTS coin_spent on coin_record(spent)")
-
-        await self.coin_record_db.execute("CREATE INDEX IF NOT EXISTS coin_puzzle_hash on coin_record(puzzle_hash)")
+        self.migrating = await start_coin_records_migration(self.coin_record_db)
+        await self.coin_record_db.execute(COIN_RECORD_TABLE)
+        for index in COIN_RECORD_INDEXES:
+            await self.coin_record_db.execute(index)
 
         await self.coin_record_db.commit()
         self.coin_record_cache = LRUCache(cache_size)
+        self.migration_task = None
+        if self.migrating:
+            self.migration_task = asyncio.create_task(self._migrate(migration_batch_size))
         return self
 
+    def shut_down(self) -> None:
+        if self.migration_task is not None:
+            self.migration_task.cancel()
+
+    async def _migrate(self, batch_size: int) -> None:
+        """
+        Moves the legacy coin records to the binary table in the background, one batch per write transaction, so
+        the node keeps serving and processing blocks meanwhile. The emptied legacy table is dropped on the next
+        startup, since queries on the readers might still be using it.
+        """
+        log.info("Migrating the coin_record table to the binary schema in the background")
+        migrated = 0
+        while True:
+            async with self.db_wrapper.lock:
+                try:
+                    moved = await migrate_coin_records_batch(self.coin_record_db, batch_size)
+                except Exception as e:
+                    # The records which were not moved are still read from the legacy table, and moved on the
+                    # next startup
+                    await self.db_wrapper.rollback_transaction()
+                    log.error(f"Error while migrating the coin_record table: {e}")
+                    return None
+                if moved == 0:
+                    self.migrating = False
+                    break
+            migrated += moved
+            log.info(f"Migrated {migrated} coin records")
+        log.info("Finished migrating the coin_record table")
+
+    def _query(self, where: str, params: Sequence) -> Tuple[str, Tuple]:
+        """
+        Returns the query and parameters for the coin records matching where. While the migration runs, the rows
+        still in the legacy table, which stores the hashes as hex, are read in the same statement. A batch moves
+        its rows in one transaction, so each record is read exactly once.
+        """
+        query = f"SELECT * from coin_record WHERE {where}"
+        if not self.migrating:
+            return query, tuple(params)
+        legacy_params = tuple(p.hex() if isinstance(p, bytes) else p for p in params)
+        return f"{query} UNION ALL SELECT * from coin_record_legacy WHERE {where}", tuple(params) + legacy_params
+
     async def new_block(self, block: FullBlock, tx_additions: List[Coin], tx_removals: List[bytes32]):
         """
         Only called for blocks which are blocks (and thus have rewards and transactions)
@@ -68,17 +226,11 @@ class CoinStore:
         if block.is_transaction_block() is False:
             return None
         assert block.foliage_transaction_block is not None
+        timestamp = block.foliage_transaction_block.timestamp
 
-        for coin in tx_additions:
-            record: CoinRecord = CoinRecord(
-                coin,
-                block.height,
-                uint32(0),
-                False,
-                False,
-                block.foliage_transaction_block.timestamp,
-            )
-            await self._add_coin_record(record, False)
+        additions: List[CoinRecord] = [
+            CoinRecord(coin, block.height, uint32(0), False, False, timestamp) for coin in tx_additions
+        ]
 
         included_reward_coins = block.get_included_reward_coins()
         if block.height == 0:
@@ -87,19 +239,11 @@ class CoinStore:
             assert len(included_reward_coins) >= 2
 
         for coin in included_reward_coins:
-            reward_coin_r: CoinRecord = CoinRecord(
-                coin,
-                block.height,
-                uint32(0),
-                False,
-                True,
-                block.foliage_transaction_block.timestamp,
-            )
-            await self._add_coin_record(reward_coin_r, False)
+            additions.append(CoinRecord(coin, block.height, uint32(0), False, True, timestamp))
 
-        total_amount_spent: int = 0
-        for coin_name in tx_removals:
-            total_amount_spent += await self._set_spent(coin_name, block.height)
+        # The additions go in first, since coins can be created and spent in the same block
+        await self._add_coin_records(additions)
+        total_amount_spent: int = await self._set_spent(tx_removals, block.height)
 
         # Sanity check, already checked in block_body_validation
         assert sum([a.amount for a in tx_additions]) <= total_amount_spent
@@ -109,37 +253,64 @@ class CoinStore:
         cached = self.coin_record_cache.get(coin_name)
         if cached is not None:
             return cached
-        cursor = await self.coin_record_db.execute("SELECT * from coin_record WHERE coin_name=?", (coin_name.hex(),))
-        row = await cursor.fetchone()
-        await cursor.close()
+        generation = self.db_wrapper.lock.generation
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(*self._query("coin_name=?", (coin_name,)))
+            row = await cursor.fetchone()
+            await cursor.close()
         if row is not None:
-            coin = Coin(bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64.from_bytes(row[7]))
-            record = CoinRecord(coin, row[1], row[2], row[3], row[4], row[8])
-            self.coin_record_cache.put(record.coin.name(), record)
+            record = row_to_coin_record(row)
+            self._cache_fetched(generation, [record])
             return record
         return None
 
+    async def get_coin_records(self, coin_names: List[bytes32]) -> List[CoinRecord]:
+        """
+        Returns the CoinRecords of the given coins, leaving out the coins that don't exist. Coins in the cache are
+        served from memory, and all the others are fetched with as few queries as SQLite's variable limit allows.
+        """
+        records: Dict[bytes32, CoinRecord] = self.coin_record_cache.get_many(coin_names)
+        missing: List[bytes32] = [name for name in set(coin_names) if name not in records]
+        # The names are passed twice while the legacy table is read too
+        chunk_size = SQLITE_MAX_VARIABLE_NUMBER // 2 if self.migrating else SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i : i + chunk_size]
+            generation = self.db_wrapper.lock.generation
+            async with self.db_wrapper.reader() as conn:
+                cursor = await conn.execute(*self._query(f'coin_name in ({"?," * (len(chunk) - 1)}?)', chunk))
+                rows = await cursor.fetchall()
+                await cursor.close()
+            fetched = [row_to_coin_record(row) for row in rows]
+            self._cache_fetched(generation, fetched)
+            records.update((record.name, record) for record in fetched)
+        return list(records.values())
+
+    def _cache_fetched(self, generation: int, records: List[CoinRecord]) -> None:
+        """
+        Caches records read from the database, unless a write held the lock at some point while they were read.
+        Readers only see committed data, so they could otherwise cache records which the write changes, and the
+        writer only keeps the cache up to date with its own changes.
+        """
+        if self.db_wrapper.lock.unchanged_since(generation):
+            self.coin_record_cache.put_many((record.name, record) for record in records)
+
     async def get_coins_added_at_height(self, height: uint32) -> List[CoinRecord]:
-        cursor = await self.coin_record_db.execute("SELECT * from coin_record WHERE confirmed_index=?", (height,))
-        rows = await cursor.fetchall()
-        await cursor.close()
-        coins = []
-        for row in rows:
-            coin = Coin(bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64.from_bytes(row[7]))
-            coins.append(CoinRecord(coin, row[1], row[2], row[3], row[4], row[8]))
-        return coins
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(*self._query("confirmed_index=?", (height,)))
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [row_to_coin_record(row) for row in rows]
 
     async def get_coins_removed_at_height(self, height: uint32) -> List[CoinRecord]:
-        cursor = await self.coin_record_db.execute("SELECT * from coin_record WHERE spent_index=?", (height,))
-        rows = await cursor.fetchall()
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(*self._query("spent_index=?", (height,)))
+            rows = await cursor.fetchall()
+            await cursor.close()
         coins = []
         for row in rows:
             spent: bool = bool(row[3])
             if spent:
-                coin = Coin(bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64.from_bytes(row[7]))
-                coin_record = CoinRecord(coin, row[1], row[2], spent, row[4], row[8])
-                coins.append(coin_record)
+                coins.append(row_to_coin_record(row))
         return coins
 
     # Checks DB and DiffStores for CoinRecords with puzzle_hash and returns them
@@ -152,17 +323,18 @@ class CoinStore:
     ) -> List[CoinRecord]:
 
         coins = set()
-        cursor = await self.coin_record_db.execute(
-            f"SELECT * from coin_record WHERE puzzle_hash=? AND confirmed_index>=? AND confirmed_index<? "
-            f"{'' if include_spent_coins else 'AND spent=0'}",
-            (puzzle_hash.hex(), start_height, end_height),
-        )
-        rows = await cursor.fetchall()
-
-        await cursor.close()
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                *self._query(
+                    f"puzzle_hash=? AND confirmed_index>=? AND confirmed_index<? "
+                    f"{'' if include_spent_coins else 'AND spent=0'}",
+                    (puzzle_hash, start_height, end_height),
+                )
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
         for row in rows:
-            coin = Coin(bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64.from_bytes(row[7]))
-            coins.add(CoinRecord(coin, row[1], row[2], row[3], row[4], row[8]))
+            coins.add(row_to_coin_record(row))
         return list(coins)
 
     async def get_coin_records_by_puzzle_hashes(
@@ -176,20 +348,20 @@ class CoinStore:
             return []
 
         coins = set()
-        puzzle_hashes_db = tuple([ph.hex() for ph in puzzle_hashes])
-        cursor = await self.coin_record_db.execute(
-            f'SELECT * from coin_record WHERE puzzle_hash in ({"?," * (len(puzzle_hashes_db) - 1)}?) '
-            f"AND confirmed_index>=? AND confirmed_index<? "
-            f"{'' if include_spent_coins else 'AND spent=0'}",
-            puzzle_hashes_db + (start_height, end_height),
-        )
-
-        rows = await cursor.fetchall()
-
-        await cursor.close()
+        puzzle_hashes_db = tuple(puzzle_hashes)
+        async with self.db_wrapper.reader() as conn:
+            cursor = await conn.execute(
+                *self._query(
+                    f'puzzle_hash in ({"?," * (len(puzzle_hashes_db) - 1)}?) '
+                    f"AND confirmed_index>=? AND confirmed_index<? "
+                    f"{'' if include_spent_coins else 'AND spent=0'}",
+                    puzzle_hashes_db + (start_height, end_height),
+                )
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
         for row in rows:
-            coin = Coin(bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64.from_bytes(row[7]))
-            coins.add(CoinRecord(coin, row[1], row[2], row[3], row[4], row[8]))
+            coins.add(row_to_coin_record(row))
         return list(coins)
 
     async def rollback_to_block(self, block_index: int):
@@ -215,50 +387,75 @@ class CoinStore:
         for coin_name in delete_queue:
             self.coin_record_cache.remove(coin_name)
 
-        # Delete from storage
-        c1 = await self.coin_record_db.execute("DELETE FROM coin_record WHERE confirmed_index>?", (block_index,))
-        await c1.close()
-        c2 = await self.coin_record_db.execute(
-            "UPDATE coin_record SET spent_index = 0, spent = 0 WHERE spent_index>?",
-            (block_index,),
-        )
-        await c2.close()
-
-    # Store CoinRecord in DB and ram cache
-    async def _add_coin_record(self, record: CoinRecord, allow_replace: bool) -> None:
-        if self.coin_record_cache.get(record.coin.name()) is not None:
-            self.coin_record_cache.remove(record.coin.name())
+        # Delete from storage, and from the rows which are not migrated yet
+        tables = ["coin_record", "coin_record_legacy"] if self.migrating else ["coin_record"]
+        for table in tables:
+            c1 = await self.coin_record_db.execute(f"DELETE FROM {table} WHERE confirmed_index>?", (block_index,))
+            await c1.close()
+            c2 = await self.coin_record_db.execute(
+                f"UPDATE {table} SET spent_index = 0, spent = 0 WHERE spent_index>?",
+                (block_index,),
+            )
+            await c2.close()
 
-        cursor = await self.coin_record_db.execute(
-            f"INSERT {'OR REPLACE ' if allow_replace else ''}INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                record.coin.name().hex(),
-                record.confirmed_block_index,
-                record.spent_block_index,
-                int(record.spent),
-                int(record.coinbase),
-                str(record.coin.puzzle_hash.hex()),
-                str(record.coin.parent_coin_info.hex()),
-                bytes(record.coin.amount),
-                record.timestamp,
-            ),
+    # Store new CoinRecords in DB, and drop any stale copies from the ram cache
+    async def _add_coin_records(self, records: List[CoinRecord]) -> None:
+        if len(records) == 0:
+            return None
+        self.coin_record_cache.remove_many(record.coin.name() for record in records)
+
+        cursor = await self.coin_record_db.executemany(
+            "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    record.coin.name(),
+                    record.confirmed_block_index,
+                    record.spent_block_index,
+                    int(record.spent),
+                    int(record.coinbase),
+                    record.coin.puzzle_hash,
+                    record.coin.parent_coin_info,
+                    amount_to_db(record.coin.amount),
+                    record.timestamp,
+                )
+                for record in records
+            ],
         )
         await cursor.close()
 
-    # Update coin_record to be spent in DB
-    async def _set_spent(self, coin_name: bytes32, index: uint32) -> uint64:
-        current: Optional[CoinRecord] = await self.get_coin_record(coin_name)
-        if current is None:
-            raise ValueError(f"Cannot spend a coin that does not exist in db: {coin_name}")
-
-        assert not current.spent  # Redundant sanity check, already checked in block_body_validation
-        spent: CoinRecord = CoinRecord(
-            current.coin,
-            current.confirmed_block_index,
-            index,
-            True,
-            current.coinbase,
-            current.timestamp,
-        )  # type: ignore # noqa
-        await self._add_coin_record(spent, True)
-        return current.coin.amount
+    # Update coin_records to be spent in DB and drop them from the ram cache, returns the total amount spent
+    async def _set_spent(self, coin_names: List[bytes32], index: uint32) -> int:
+        if len(coin_names) == 0:
+            return 0
+        assert len(set(coin_names)) == len(coin_names)  # Redundant sanity check, no coin is spent twice
+
+        current: Dict[bytes32, CoinRecord] = {
+            record.name: record for record in await self.get_coin_records(coin_names)
+        }
+
+        total_amount_spent: int = 0
+        for coin_name in coin_names:
+            current_record: Optional[CoinRecord] = current.get(coin_name)
+            if current_record is None:
+                raise ValueError(f"Cannot spend a coin that does not exist in db: {coin_name}")
+            assert not current_record.spent  # Redundant sanity check, already checked in block_body_validation
+            total_amount_spent += current_record.coin.amount
+
+        # One variable is taken by the index
+        for i in range(0, len(coin_names), SQLITE_MAX_VARIABLE_NUMBER - 1):
+            chunk = coin_names[i : i + SQLITE_MAX_VARIABLE_NUMBER - 1]
+            cursor = await self.coin_record_db.execute(
+                f'UPDATE coin_record SET spent_index=?, spent=1 WHERE coin_name in ({"?," * (len(chunk) - 1)}?)',
+                [index, *chunk],
+            )
+            await cursor.close()
+            if self.migrating:
+                cursor = await self.coin_record_db.execute(
+                    "UPDATE coin_record_legacy SET spent_index=?, spent=1 "
+                    f'WHERE coin_name in ({"?," * (len(chunk) - 1)}?)',
+                    [index, *[name.hex() for name in chunk]],
+                )
+                await cursor.close()
+        # The records are only dropped from the cache, since the block's transaction might still be rolled back
+        self.coin_record_cache.remove_many(coin_names)
+        return total_amount_spent
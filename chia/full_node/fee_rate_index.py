@@ -0,0 +1,89 @@
+import bisect
+from typing import List, Tuple
+
+MIN_FEE_RATE = 2.0 ** -8
+BUCKETS_PER_DOUBLING = 4
+DOUBLINGS = 40
+# Lower bound of each bucket but the first
+BUCKET_BOUNDS: List[float] = [
+    MIN_FEE_RATE * 2.0 ** (i / BUCKETS_PER_DOUBLING) for i in range(BUCKETS_PER_DOUBLING * DOUBLINGS)
+]
+
+
+class FeeRateIndex:
+    """
+    The total cost of the mempool items in buckets of fee per cost, kept in a Fenwick tree. The cost of all the items
+    in the buckets below a fee rate, and the lowest bucket where that cost reaches an amount, are found in
+    O(log n) of the number of buckets.
+
+    The buckets are spaced logarithmically, BUCKETS_PER_DOUBLING for each doubling of the fee per cost above
+    MIN_FEE_RATE. Bucket 0 holds the fee rates below MIN_FEE_RATE, zero included, and the last bucket holds all the
+    rates above the highest bound.
+    """
+
+    NUM_BUCKETS = len(BUCKET_BOUNDS) + 1
+
+    def __init__(self):
+        # tree[i] is the total cost of the buckets (i - (i & -i), i], bucket b being at index b + 1
+        self.tree: List[int] = [0] * (self.NUM_BUCKETS + 1)
+
+    @classmethod
+    def bucket(cls, fee_per_cost: float) -> int:
+        return bisect.bisect_right(BUCKET_BOUNDS, fee_per_cost)
+
+    @classmethod
+    def bucket_range(cls, bucket: int) -> Tuple[float, float]:
+        """
+        Returns the fee rates of the bucket, from the first one included to the second one excluded.
+        """
+        low = 0.0 if bucket == 0 else BUCKET_BOUNDS[bucket - 1]
+        high = float("inf") if bucket == cls.NUM_BUCKETS - 1 else BUCKET_BOUNDS[bucket]
+        return low, high
+
+    def add(self, fee_per_cost: float, cost: int) -> None:
+        i = self.bucket(fee_per_cost) + 1
+        while i <= self.NUM_BUCKETS:
+            self.tree[i] += cost
+            i += i & -i
+
+    def remove(self, fee_per_cost: float, cost: int) -> None:
+        self.add(fee_per_cost, -cost)
+
+    def cost_below(self, bucket: int) -> int:
+        """
+        Returns the total cost of the buckets below bucket.
+        """
+        total = 0
+        i = bucket
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find_bucket(self, cost: int) -> int:
+        """
+        Returns the lowest bucket such that the total cost of it and the buckets below is at least cost, or
+        NUM_BUCKETS if the total cost of all buckets is lower.
+        """
+        position = 0
+        remaining = cost
+        step = 1 << (self.NUM_BUCKETS.bit_length() - 1)
+        while step > 0:
+            if position + step <= self.NUM_BUCKETS and self.tree[position + step] < remaining:
+                position += step
+                remaining -= self.tree[position]
+            step >>= 1
+        return position
+
+    def bucket_costs(self) -> List[Tuple[float, int]]:
+        """
+        Returns the lowest fee rate and the total cost of each bucket which is not empty, in increasing fee rate.
+        """
+        costs: List[Tuple[float, int]] = []
+        previous = 0
+        for bucket in range(self.NUM_BUCKETS):
+            total = self.cost_below(bucket + 1)
+            if total != previous:
+                costs.append((self.bucket_range(bucket)[0], total - previous))
+            previous = total
+        return costs
@@ -19,6 +19,7 @@ from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_dif
 from chia.consensus.make_sub_epoch_summary import next_sub_epoch_summary
 from chia.consensus.multiprocess_validation import PreValidationResult
 from chia.consensus.pot_iterations import calculate_sp_iters
+from chia.full_node.block_downloader import BlockBatchDownloader
 from chia.full_node.block_store import BlockStore
 from chia.full_node.bundle_tools import detect_potential_template_generator
 from chia.full_node.coin_store import CoinStore
@@ -120,13 +121,20 @@ class FullNode:
         # create the store (db) and full node instance
         self.connection = await aiosqlite.connect(self.db_path)
         self.db_wrapper = DBWrapper(self.connection)
-        self.block_store = await BlockStore.create(self.db_wrapper)
+        self.block_store = await BlockStore.create(self.db_wrapper, self.config.get("block_record_cache_size", 5000))
         self.sync_store = await SyncStore.create()
         self.coin_store = await CoinStore.create(self.db_wrapper)
+        # Queries from peers and RPC clients are served by these, so they don't wait for blocks being committed
+        await self.db_wrapper.open_readers(self.db_path, self.config.get("db_readers", 4))
         self.log.info("Initializing blockchain from disk")
         start_time = time.time()
         self.blockchain = await Blockchain.create(self.coin_store, self.block_store, self.constants)
-        self.mempool_manager = MempoolManager(self.coin_store, self.constants)
+        self.mempool_manager = MempoolManager(
+            self.coin_store,
+            self.constants,
+            self.config.get("mempool_validation_workers", 2),
+            self.config.get("mempool_validation_queue_size", 1000),
+        )
         self.weight_proof_handler = None
         self._init_weight_proof = asyncio.create_task(self.initialize_weight_proof())
 
@@ -562,6 +570,8 @@ class FullNode:
             self.blockchain.shut_down()
         if self.mempool_manager is not None:
             self.mempool_manager.shut_down()
+        if self.coin_store is not None:
+            self.coin_store.shut_down()
         if self.full_node_peers is not None:
             asyncio.create_task(self.full_node_peers.close())
         if self.uncompact_task is not None:
@@ -571,6 +581,9 @@ class FullNode:
         cancel_task_safe(self._sync_task, self.log)
         for task_id, task in list(self.full_node_store.tx_fetch_tasks.items()):
             cancel_task_safe(task, self.log)
+        if self.coin_store is not None and self.coin_store.migration_task is not None:
+            await asyncio.wait([self.coin_store.migration_task])
+        await self.db_wrapper.close_readers()
         await self.connection.close()
         if self._init_weight_proof is not None:
             await asyncio.wait([self._init_weight_proof])
@@ -742,101 +755,173 @@ class FullNode:
                             fork_point_height = our_peak_height
                         break
 
-        for i in range(fork_point_height, target_peak_sb_height, batch_size):
-            start_height = i
-            end_height = min(target_peak_sb_height, start_height + batch_size)
-            request = RequestBlocks(uint32(start_height), uint32(end_height), True)
-            self.log.info(f"Requesting blocks: {start_height} to {end_height}")
-            batch_added = False
-            to_remove = []
-            for peer in peers_with_peak:
-                if peer.closed:
-                    to_remove.append(peer)
-                    continue
-                response = await peer.request_blocks(request, timeout=60)
-                if response is None:
-                    await peer.close()
-                    to_remove.append(peer)
-                    continue
-                if isinstance(response, RejectBlocks):
-                    to_remove.append(peer)
-                    continue
-                elif isinstance(response, RespondBlocks):
-                    success, advanced_peak, _ = await self.receive_block_batch(
-                        response.blocks, peer, None if advanced_peak else uint32(fork_point_height), summaries
-                    )
-                    if success is False:
-                        await peer.close(600)
-                        continue
+        # Downloads the next batches from several peers while the current one is validated and added
+        downloader = BlockBatchDownloader(
+            peers_with_peak,
+            fork_point_height,
+            target_peak_sb_height,
+            batch_size,
+            self.config.get("sync_blocks_in_flight", 4),
+        )
+        downloader.start()
+        # While a batch is added to the chain, the next one is pre-validated on top of it in the process pool
+        add_task: Optional[asyncio.Task] = None
+        next_pre_validation: Optional[asyncio.Task] = None
+        try:
+            batch = await downloader.next_batch()
+            while batch is not None:
+                start_height, end_height, fetched = batch
+                self.log.info(f"Received blocks: {start_height} to {end_height}")
+                next_batch_fetched = False
+                batch_added = False
+                failed_peers: Set[bytes32] = set()
+                while fetched is not None:
+                    peer, blocks = fetched
+                    if next_pre_validation is not None:
+                        pre_validated = await next_pre_validation
+                        next_pre_validation = None
                     else:
-                        batch_added = True
-                        break
-
-            peak = self.blockchain.get_peak()
-            assert peak is not None
-            msg = make_msg(
-                ProtocolMessageTypes.new_peak_wallet,
-                wallet_protocol.NewPeakWallet(
-                    peak.header_hash,
-                    peak.height,
-                    peak.weight,
-                    uint32(max(peak.height - 1, uint32(0))),
-                ),
-            )
-            await self.server.send_to_all([msg], NodeType.WALLET)
-
-            for peer in to_remove:
-                peers_with_peak.remove(peer)
-
-            if self.sync_store.peers_changed.is_set():
-                peer_ids = self.sync_store.get_peers_that_have_peak([peak_hash])
-                peers_with_peak = [c for c in self.server.all_connections.values() if c.peer_node_id in peer_ids]
-                self.log.info(f"Number of peers we are syncing from: {len(peers_with_peak)}")
-                self.sync_store.peers_changed.clear()
-
-            if batch_added is False:
-                self.log.info(f"Failed to fetch blocks {start_height} to {end_height} from peers: {peers_with_peak}")
-                break
-            else:
+                        pre_validated = await self.pre_validate_block_batch(blocks, peer, summaries)
+                    if pre_validated is not None:
+                        add_task = asyncio.create_task(
+                            self.receive_block_batch(
+                                blocks,
+                                peer,
+                                None if advanced_peak else uint32(fork_point_height),
+                                summaries,
+                                pre_validated,
+                            )
+                        )
+                        if not next_batch_fetched:
+                            batch = await downloader.next_batch()
+                            next_batch_fetched = True
+                        if batch is not None and batch[2] is not None:
+                            next_peer, next_blocks = batch[2]
+                            next_pre_validation = asyncio.create_task(
+                                self.pre_validate_block_batch(next_blocks, next_peer, summaries, pre_validated)
+                            )
+                        success, advanced_peak, _ = await add_task
+                        add_task = None
+                        if success is True:
+                            batch_added = True
+                            break
+                        if next_pre_validation is not None:
+                            # It was done on top of invalid blocks
+                            next_pre_validation.cancel()
+                            next_pre_validation = None
+                    await peer.close(600)
+                    failed_peers.add(peer.peer_node_id)
+                    fetched = await downloader.retry_batch(start_height, end_height, failed_peers)
+
+                peak = self.blockchain.get_peak()
+                assert peak is not None
+                msg = make_msg(
+                    ProtocolMessageTypes.new_peak_wallet,
+                    wallet_protocol.NewPeakWallet(
+                        peak.header_hash,
+                        peak.height,
+                        peak.weight,
+                        uint32(max(peak.height - 1, uint32(0))),
+                    ),
+                )
+                await self.server.send_to_all([msg], NodeType.WALLET)
+
+                if self.sync_store.peers_changed.is_set():
+                    peer_ids = self.sync_store.get_peers_that_have_peak([peak_hash])
+                    peers_with_peak = [c for c in self.server.all_connections.values() if c.peer_node_id in peer_ids]
+                    downloader.set_peers(peers_with_peak)
+                    self.log.info(f"Number of peers we are syncing from: {len(peers_with_peak)}")
+                    self.sync_store.peers_changed.clear()
+
+                if batch_added is False:
+                    self.log.info(
+                        f"Failed to fetch blocks {start_height} to {end_height} from peers: {downloader.get_peers()}"
+                    )
+                    break
                 self.log.info(f"Added blocks {start_height} to {end_height}")
+                self.log.debug(f"Block record cache: {self.block_store.block_record_cache.stats()}")
                 self.blockchain.clean_block_record(
                     min(
                         end_height - self.constants.BLOCKS_CACHE_SIZE,
                         peak.height - self.constants.BLOCKS_CACHE_SIZE,
                     )
                 )
-
-    async def receive_block_batch(
+                if not next_batch_fetched:
+                    batch = await downloader.next_batch()
+        finally:
+            if next_pre_validation is not None:
+                next_pre_validation.cancel()
+            if add_task is not None:
+                # Blocks are only added under the blockchain lock
+                await asyncio.wait([add_task])
+            await downloader.close()
+
+    async def pre_validate_block_batch(
         self,
         all_blocks: List[FullBlock],
         peer: ws.WSChiaConnection,
-        fork_point: Optional[uint32],
         wp_summaries: Optional[List[SubEpochSummary]] = None,
-    ) -> Tuple[bool, bool, Optional[uint32]]:
-        advanced_peak = False
-        fork_height: Optional[uint32] = uint32(0)
+        pending: Optional[Tuple[List[FullBlock], List[PreValidationResult]]] = None,
+    ) -> Optional[Tuple[List[FullBlock], List[PreValidationResult]]]:
+        """
+        Pre-validates the blocks which are not in the chain yet, and returns them with their results, or None if
+        one of them is invalid. pending are pre-validated blocks which are still being added to the chain, that
+        all_blocks may build on.
+        """
+        pending_blocks: List[FullBlock] = []
+        pending_results: List[PreValidationResult] = []
+        if pending is not None:
+            pending_blocks, pending_results = pending
+        pending_hashes: Set[bytes32] = {block.header_hash for block in pending_blocks}
 
         blocks_to_validate: List[FullBlock] = []
         for i, block in enumerate(all_blocks):
-            if not self.blockchain.contains_block(block.header_hash):
+            if not self.blockchain.contains_block(block.header_hash) and block.header_hash not in pending_hashes:
                 blocks_to_validate = all_blocks[i:]
                 break
         if len(blocks_to_validate) == 0:
-            return True, False, fork_height
+            return [], []
 
         pre_validate_start = time.time()
         pre_validation_results: Optional[
             List[PreValidationResult]
-        ] = await self.blockchain.pre_validate_blocks_multiprocessing(blocks_to_validate, {}, wp_summaries=wp_summaries)
+        ] = await self.blockchain.pre_validate_blocks_multiprocessing(
+            blocks_to_validate,
+            {},
+            wp_summaries=wp_summaries,
+            pending_blocks=pending_blocks,
+            pending_results=pending_results,
+        )
         self.log.debug(f"Block pre-validation time: {time.time() - pre_validate_start}")
         if pre_validation_results is None:
-            return False, False, None
+            return None
         for i, block in enumerate(blocks_to_validate):
             if pre_validation_results[i].error is not None:
                 self.log.error(
                     f"Invalid block from peer: {peer.get_peer_info()} {Err(pre_validation_results[i].error)}"
                 )
-                return False, advanced_peak, fork_height
+                return None
+        return blocks_to_validate, pre_validation_results
+
+    async def receive_block_batch(
+        self,
+        all_blocks: List[FullBlock],
+        peer: ws.WSChiaConnection,
+        fork_point: Optional[uint32],
+        wp_summaries: Optional[List[SubEpochSummary]] = None,
+        pre_validated: Optional[Tuple[List[FullBlock], List[PreValidationResult]]] = None,
+    ) -> Tuple[bool, bool, Optional[uint32]]:
+        advanced_peak = False
+        fork_height: Optional[uint32] = uint32(0)
+
+        start_time = time.time()
+        if pre_validated is None:
+            pre_validated = await self.pre_validate_block_batch(all_blocks, peer, wp_summaries)
+            if pre_validated is None:
+                return False, False, None
+        blocks_to_validate, pre_validation_results = pre_validated
+        if len(blocks_to_validate) == 0:
+            return True, False, fork_height
 
         for i, block in enumerate(blocks_to_validate):
             assert pre_validation_results[i].required_iters is not None
@@ -856,7 +941,7 @@ class FullNode:
         if advanced_peak:
             self._state_changed("new_peak")
             self.log.debug(
-                f"Total time for {len(blocks_to_validate)} blocks: {time.time() - pre_validate_start}, "
+                f"Total time for {len(blocks_to_validate)} blocks: {time.time() - start_time}, "
                 f"advanced: {advanced_peak}"
             )
         return True, advanced_peak, fork_height
@@ -1638,15 +1723,23 @@ class FullNode:
             self.mempool_manager.remove_seen(spend_name)
         else:
             try:
-                cost_result = await self.mempool_manager.pre_validate_spendbundle(transaction)
+                pre_validation = await self.mempool_manager.pre_validate_spendbundle(
+                    transaction, spend_name, None if peer is None else peer.peer_node_id
+                )
             except Exception as e:
                 self.mempool_manager.remove_seen(spend_name)
                 raise e
+            if pre_validation is None:
+                self.mempool_manager.remove_seen(spend_name)
+                return MempoolInclusionStatus.FAILED, Err.MEMPOOL_VALIDATION_QUEUE_FULL
+            cost_result, program, tx_cost = pre_validation
             async with self.mempool_manager.lock:
                 if self.mempool_manager.get_spendbundle(spend_name) is not None:
                     self.mempool_manager.remove_seen(spend_name)
                     return MempoolInclusionStatus.FAILED, Err.ALREADY_INCLUDING_TRANSACTION
-                cost, status, error = await self.mempool_manager.add_spendbundle(transaction, cost_result, spend_name)
+                cost, status, error = await self.mempool_manager.add_spendbundle(
+                    transaction, cost_result, spend_name, program=program, cost=tx_cost
+                )
             if status == MempoolInclusionStatus.SUCCESS:
                 self.log.debug(
                     f"Added transaction to mempool: {spend_name} mempool size: "
@@ -1802,6 +1895,7 @@ class FullNode:
                 return
             async with self.db_wrapper.lock:
                 await self.block_store.add_full_block(new_block.header_hash, new_block, block_record)
+                await self.block_store.replace_header_block_proofs(new_block)
                 await self.block_store.db_wrapper.commit_transaction()
 
     async def respond_compact_proof_of_time(self, request: timelord_protocol.RespondCompactProofOfTime):
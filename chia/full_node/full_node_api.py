@@ -2,7 +2,7 @@ import asyncio
 import dataclasses
 import time
 from secrets import token_bytes
-from typing import Callable, Dict, List, Optional, Tuple, Set
+from typing import Callable, Dict, List, Optional, Tuple, Set, Union
 
 from blspy import AugSchemeMPL, G2Element
 from chiabip158 import PyBIP158
@@ -37,6 +37,7 @@ from chia.util.generator_tools import get_block_header
 from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64, uint128
 from chia.util.merkle_set import MerkleSet
+from chia.util.streamable import LazyStreamable
 
 
 class FullNodeAPI:
@@ -281,10 +282,10 @@ class FullNodeAPI:
             msg = make_msg(ProtocolMessageTypes.reject_block, reject)
             return msg
         header_hash = self.full_node.blockchain.height_to_hash(request.height)
-        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash)
+        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(
+            header_hash, include_generator=request.include_transaction_block
+        )
         if block is not None:
-            if not request.include_transaction_block and block.transactions_generator is not None:
-                block = dataclasses.replace(block, transactions_generator=None)
             return make_msg(ProtocolMessageTypes.respond_block, full_node_protocol.RespondBlock(block))
         reject = RejectBlock(request.height)
         msg = make_msg(ProtocolMessageTypes.reject_block, reject)
@@ -303,17 +304,19 @@ class FullNodeAPI:
                 return msg
 
         if not request.include_transaction_block:
-            blocks: List[FullBlock] = []
-            for i in range(request.start_height, request.end_height + 1):
-                block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(
-                    self.full_node.blockchain.height_to_hash(uint32(i))
+            header_hashes: List[bytes32] = [
+                self.full_node.blockchain.height_to_hash(uint32(i))
+                for i in range(request.start_height, request.end_height + 1)
+            ]
+            try:
+                # The generators are not read from the database
+                blocks: List[FullBlock] = await self.full_node.block_store.get_blocks_by_hash(
+                    header_hashes, include_generator=False
                 )
-                if block is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                    return msg
-                block = dataclasses.replace(block, transactions_generator=None)
-                blocks.append(block)
+            except ValueError:
+                reject = RejectBlocks(request.start_height, request.end_height)
+                msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
+                return msg
             msg = make_msg(
                 ProtocolMessageTypes.respond_blocks,
                 full_node_protocol.RespondBlocks(request.start_height, request.end_height, blocks),
@@ -1051,6 +1054,10 @@ class FullNodeAPI:
         if header_hash is None:
             msg = make_msg(ProtocolMessageTypes.reject_header_request, RejectHeaderRequest(request.height))
             return msg
+        stored: Dict[bytes32, bytes] = await self.full_node.block_store.get_header_blocks_bytes([header_hash])
+        if header_hash in stored:
+            # RespondBlockHeader only holds the header block, so the stored bytes are the message
+            return make_msg(ProtocolMessageTypes.respond_block_header, stored[header_hash])
         block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash)
         if block is not None:
             tx_removals, tx_additions = await self.full_node.blockchain.get_tx_removals_and_additions(block)
@@ -1064,7 +1071,9 @@ class FullNodeAPI:
 
     @api_request
     async def request_additions(self, request: wallet_protocol.RequestAdditions) -> Optional[Message]:
-        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(request.header_hash)
+        block: Optional[Union[FullBlock, LazyStreamable]] = await self.full_node.block_store.get_full_block_lazy(
+            request.header_hash
+        )
 
         # We lock so that the coin store does not get modified
         if (
@@ -1127,7 +1136,9 @@ class FullNodeAPI:
 
     @api_request
     async def request_removals(self, request: wallet_protocol.RequestRemovals) -> Optional[Message]:
-        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(request.header_hash)
+        block: Optional[Union[FullBlock, LazyStreamable]] = await self.full_node.block_store.get_full_block_lazy(
+            request.header_hash
+        )
 
         # We lock so that the coin store does not get modified
         if (
@@ -1251,20 +1262,30 @@ class FullNodeAPI:
                 return msg
             header_hashes.append(self.full_node.blockchain.height_to_hash(uint32(i)))
 
-        blocks: List[FullBlock] = await self.full_node.block_store.get_blocks_by_hash(header_hashes)
-        header_blocks = []
+        header_blocks_bytes: Dict[bytes32, bytes] = await self.full_node.block_store.get_header_blocks_bytes(
+            header_hashes
+        )
+        # Blocks added by older versions have no stored header block, so it is built from the block
+        missing: List[bytes32] = [hh for hh in header_hashes if hh not in header_blocks_bytes]
+        blocks: List[FullBlock] = await self.full_node.block_store.get_blocks_by_hash(
+            missing, include_generator=False
+        )
         for block in blocks:
             added_coins_records = await self.full_node.coin_store.get_coins_added_at_height(block.height)
             removed_coins_records = await self.full_node.coin_store.get_coins_removed_at_height(block.height)
             added_coins = [record.coin for record in added_coins_records if not record.coinbase]
             removal_names = [record.coin.name() for record in removed_coins_records]
             header_block = get_block_header(block, added_coins, removal_names)
-            header_blocks.append(header_block)
+            header_blocks_bytes[header_block.header_hash] = bytes(header_block)
 
-        msg = make_msg(
-            ProtocolMessageTypes.respond_header_blocks,
-            wallet_protocol.RespondHeaderBlocks(request.start_height, request.end_height, header_blocks),
+        respond_header_blocks_manually_streamed: bytes = (
+            bytes(uint32(request.start_height))
+            + bytes(uint32(request.end_height))
+            + len(header_hashes).to_bytes(4, "big", signed=False)
         )
+        for header_hash in header_hashes:
+            respond_header_blocks_manually_streamed += header_blocks_bytes[header_hash]
+        msg = make_msg(ProtocolMessageTypes.respond_header_blocks, respond_header_blocks_manually_streamed)
         return msg
 
     @api_request
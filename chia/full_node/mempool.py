@@ -2,6 +2,7 @@ from typing import Dict, List
 
 from sortedcontainers import SortedDict
 
+from chia.full_node.fee_rate_index import FeeRateIndex
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.mempool_item import MempoolItem
@@ -15,6 +16,8 @@ class Mempool:
         self.removals: Dict[bytes32, MempoolItem] = {}
         self.max_size_in_cost: int = max_size_in_cost
         self.total_mempool_cost: int = 0
+        # Cost of the items by fee per cost, to find the items to kick out without walking the cheaper ones
+        self.fee_rate_index: FeeRateIndex = FeeRateIndex()
 
     def get_min_fee_rate(self, cost: int) -> float:
         """
@@ -22,15 +25,18 @@ class Mempool:
         """
 
         if self.at_full_capacity(cost):
-            current_cost = self.total_mempool_cost
-
-            # Iterates through all spends in increasing fee per cost
-            for fee_per_cost, spends_with_fpc in self.sorted_spends.items():
-                for spend_name, item in spends_with_fpc.items():
-                    current_cost -= item.cost
-                    # Removing one at a time, until our transaction of size cost fits
-                    if current_cost + cost <= self.max_size_in_cost:
-                        return fee_per_cost
+            # Cost of the items to remove, in increasing fee per cost, until our transaction of size cost fits
+            cost_to_remove = self.total_mempool_cost + cost - self.max_size_in_cost
+            bucket = self.fee_rate_index.find_bucket(cost_to_remove)
+            if bucket < FeeRateIndex.NUM_BUCKETS:
+                removed_cost = self.fee_rate_index.cost_below(bucket)
+                low, high = FeeRateIndex.bucket_range(bucket)
+                # Iterates through the spends of the bucket in increasing fee per cost
+                for fee_per_cost in self.sorted_spends.irange(low, high, inclusive=(True, False)):
+                    for item in self.sorted_spends[fee_per_cost].values():
+                        removed_cost += item.cost
+                        if removed_cost >= cost_to_remove:
+                            return fee_per_cost
             raise ValueError(
                 f"Transaction with cost {cost} does not fit in mempool of max cost {self.max_size_in_cost}"
             )
@@ -41,8 +47,9 @@ class Mempool:
         """
         Removes an item from the mempool.
         """
-        removals: List[Coin] = item.spend_bundle.removals()
-        additions: List[Coin] = item.spend_bundle.additions()
+        # The additions and removals of the item were computed when it was added, running the puzzles again is slow
+        removals: List[Coin] = item.removals
+        additions: List[Coin] = item.additions
         for rem in removals:
             del self.removals[rem.name()]
         for add in additions:
@@ -52,6 +59,7 @@ class Mempool:
         dic = self.sorted_spends[item.fee_per_cost]
         if len(dic.values()) == 0:
             del self.sorted_spends[item.fee_per_cost]
+        self.fee_rate_index.remove(item.fee_per_cost, item.cost)
         self.total_mempool_cost -= item.cost
         assert self.total_mempool_cost >= 0
 
@@ -65,11 +73,19 @@ class Mempool:
         Adds an item to the mempool by kicking out transactions (if it doesn't fit), in order of increasing fee per cost
         """
 
-        while self.at_full_capacity(item.cost):
-            # Val is Dict[hash, MempoolItem]
-            fee_per_cost, val = self.sorted_spends.peekitem(index=0)
-            to_remove = list(val.values())[0]
-            self.remove_from_pool(to_remove)
+        if self.at_full_capacity(item.cost):
+            cost_to_remove = self.total_mempool_cost + item.cost - self.max_size_in_cost
+            to_remove: List[MempoolItem] = []
+            for spends_with_fpc in self.sorted_spends.values():
+                for spend in spends_with_fpc.values():
+                    to_remove.append(spend)
+                    cost_to_remove -= spend.cost
+                    if cost_to_remove <= 0:
+                        break
+                if cost_to_remove <= 0:
+                    break
+            for spend in to_remove:
+                self.remove_from_pool(spend)
 
         self.spends[item.name] = item
 
@@ -83,6 +99,7 @@ class Mempool:
             self.additions[add.name()] = item
         for key in removals_dic.keys():
             self.removals[key] = item
+        self.fee_rate_index.add(item.fee_per_cost, item.cost)
         self.total_mempool_cost += item.cost
 
     def at_full_capacity(self, cost: int) -> bool:
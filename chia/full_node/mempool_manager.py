@@ -4,8 +4,8 @@ import dataclasses
 import logging
 import time
 from concurrent.futures.process import ProcessPoolExecutor
-from typing import Dict, List, Optional, Set, Tuple
-from blspy import AugSchemeMPL, G1Element
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from blspy import G1Element
 from chiabip158 import PyBIP158
 
 from chia.consensus.block_record import BlockRecord
@@ -24,6 +24,7 @@ from chia.types.condition_with_args import ConditionWithArgs
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
 from chia.types.mempool_item import MempoolItem
 from chia.types.spend_bundle import SpendBundle
+from chia.util import cached_bls
 from chia.util.clvm import int_from_bytes
 from chia.util.condition_tools import (
     pkm_pairs_for_conditions_dict,
@@ -37,15 +38,33 @@ from chia.util.streamable import recurse_jsonify
 
 log = logging.getLogger(__name__)
 
+# Conditions which can fail on a new peak, for a spend which was valid on the previous one
+TIMELOCK_CONDITIONS: Set[ConditionOpcode] = {
+    ConditionOpcode.ASSERT_HEIGHT_ABSOLUTE,
+    ConditionOpcode.ASSERT_HEIGHT_RELATIVE,
+    ConditionOpcode.ASSERT_SECONDS_ABSOLUTE,
+    ConditionOpcode.ASSERT_SECONDS_RELATIVE,
+}
 
-def get_npc_multiprocess(spend_bundle_bytes: bytes, max_cost: int) -> bytes:
-    program = simple_solution_generator(SpendBundle.from_bytes(spend_bundle_bytes))
+
+def get_npc_and_cost_multiprocess(
+    spend_bundle_bytes: bytes, max_cost: int, cost_per_byte: int
+) -> Tuple[bytes, bytes, int]:
+    generator = simple_solution_generator(SpendBundle.from_bytes(spend_bundle_bytes))
     # npc contains names of the coins removed, puzzle_hashes and their spend conditions
-    return bytes(get_name_puzzle_conditions(program, max_cost, True))
+    npc_result = get_name_puzzle_conditions(generator, max_cost, True)
+    cost = calculate_cost_of_program(generator.program, npc_result, cost_per_byte)
+    return bytes(npc_result), bytes(generator.program), cost
 
 
 class MempoolManager:
-    def __init__(self, coin_store: CoinStore, consensus_constants: ConsensusConstants):
+    def __init__(
+        self,
+        coin_store: CoinStore,
+        consensus_constants: ConsensusConstants,
+        num_workers: int = 1,
+        max_pending_validations: int = 1000,
+    ):
         self.constants: ConsensusConstants = consensus_constants
         self.constants_json = recurse_jsonify(dataclasses.asdict(self.constants))
 
@@ -66,7 +85,16 @@ class MempoolManager:
         self.potential_cache_max_total_cost = int(self.constants.MAX_BLOCK_COST_CLVM * 5)
         self.potential_cache_cost: int = 0
         self.seen_cache_size = 10000
-        self.pool = ProcessPoolExecutor(max_workers=1)
+        self.pool = ProcessPoolExecutor(max_workers=num_workers)
+        self.num_workers = num_workers
+        # Spend bundles which are pre-validated or waiting for it, by name. Submitting a spend bundle again waits for
+        # the same result
+        self.max_pending_validations = max_pending_validations
+        self.pending_validations: Dict[bytes32, asyncio.Future] = {}
+        # Spend bundles waiting for a worker, by the peer which sent them (None for local ones). Peers take turns, so
+        # a peer sending many transactions does not delay the transactions of the others
+        self.validation_queues: Dict[Optional[bytes32], Deque[Tuple[bytes32, SpendBundle]]] = {}
+        self.running_validations = 0
 
         # The mempool will correspond to a certain peak
         self.peak: Optional[BlockRecord] = None
@@ -95,29 +123,30 @@ class MempoolManager:
         spend_bundles: List[SpendBundle] = []
         removals = []
         additions = []
-        broke_from_inner_loop = False
+        skipped = 0
+        max_cost = self.limit_factor * self.constants.MAX_BLOCK_COST_CLVM
+        start_time = time.time()
         log.info(f"Starting to make block, max cost: {self.constants.MAX_BLOCK_COST_CLVM}")
+        # Mempool items don't depend on each other: the coins they spend are in the blockchain or created in the same
+        # spend bundle, and the announcements they assert are made in the same spend bundle. So each item is taken as
+        # a whole, in decreasing fee per cost
         for dic in reversed(self.mempool.sorted_spends.values()):
-            if broke_from_inner_loop:
-                break
             for item in dic.values():
+                if item.cost + cost_sum > max_cost or item.fee + fee_sum > self.constants.MAX_COIN_AMOUNT:
+                    # Smaller items with a lower fee per cost can still fill the rest of the block
+                    skipped += 1
+                    continue
                 log.info(f"Cumulative cost: {cost_sum}, fee per cost: {item.fee / item.cost}")
-                if (
-                    item.cost + cost_sum <= self.limit_factor * self.constants.MAX_BLOCK_COST_CLVM
-                    and item.fee + fee_sum <= self.constants.MAX_COIN_AMOUNT
-                ):
-                    spend_bundles.append(item.spend_bundle)
-                    cost_sum += item.cost
-                    fee_sum += item.fee
-                    removals.extend(item.removals)
-                    additions.extend(item.additions)
-                else:
-                    broke_from_inner_loop = True
-                    break
+                spend_bundles.append(item.spend_bundle)
+                cost_sum += item.cost
+                fee_sum += item.fee
+                removals.extend(item.removals)
+                additions.extend(item.additions)
         if len(spend_bundles) > 0:
             log.info(
                 f"Cumulative cost of block (real cost should be less) {cost_sum}. Proportion "
-                f"full: {cost_sum / self.constants.MAX_BLOCK_COST_CLVM}"
+                f"full: {cost_sum / self.constants.MAX_BLOCK_COST_CLVM}, {len(spend_bundles)} items with fees "
+                f"{fee_sum}, {skipped} items did not fit. Took {time.time() - start_time} seconds"
             )
             agg = SpendBundle.aggregate(spend_bundles)
             assert set(agg.additions()) == set(additions)
@@ -208,21 +237,65 @@ class MempoolManager:
         log.info(f"Replacing conflicting tx in mempool. New tx fee: {fees}, old tx fees: {conflicting_fees}")
         return True
 
-    async def pre_validate_spendbundle(self, new_spend: SpendBundle) -> NPCResult:
+    async def pre_validate_spendbundle(
+        self, new_spend: SpendBundle, spend_name: bytes32, peer_id: Optional[bytes32] = None
+    ) -> Optional[Tuple[NPCResult, SerializedProgram, uint64]]:
         """
-        Errors are included within the cached_result.
-        This runs in another process so we don't block the main thread
+        Returns the result of running the spend bundle, its generator and its cost, or None if too many spend bundles
+        are waiting to be pre-validated. Errors are included within the NPCResult.
+        This runs in the worker processes so we don't block the main thread
         """
-        start_time = time.time()
-        cached_result_bytes = await asyncio.get_running_loop().run_in_executor(
-            self.pool,
-            get_npc_multiprocess,
-            bytes(new_spend),
-            int(self.limit_factor * self.constants.MAX_BLOCK_COST_CLVM),
-        )
-        end_time = time.time()
-        log.info(f"It took {end_time - start_time} to pre validate transaction")
-        return NPCResult.from_bytes(cached_result_bytes)
+        future = self.pending_validations.get(spend_name)
+        if future is None:
+            if len(self.pending_validations) >= self.max_pending_validations:
+                log.info(f"Too many transactions waiting for validation, dropping {spend_name}")
+                return None
+            future = asyncio.get_running_loop().create_future()
+            self.pending_validations[spend_name] = future
+            if peer_id not in self.validation_queues:
+                self.validation_queues[peer_id] = collections.deque()
+            self.validation_queues[peer_id].append((spend_name, new_spend))
+            self._start_validations()
+        # The validation goes on if this caller is cancelled, other callers might be waiting for it
+        return await asyncio.shield(future)
+
+    def _start_validations(self) -> None:
+        while self.running_validations < self.num_workers and len(self.validation_queues) > 0:
+            # The peer which has been waiting the longest goes first, and goes to the back of the line afterwards
+            peer_id = next(iter(self.validation_queues))
+            queue = self.validation_queues.pop(peer_id)
+            spend_name, new_spend = queue.popleft()
+            if len(queue) > 0:
+                self.validation_queues[peer_id] = queue
+            self.running_validations += 1
+            asyncio.create_task(self._run_validation(spend_name, new_spend))
+
+    async def _run_validation(self, spend_name: bytes32, new_spend: SpendBundle) -> None:
+        future = self.pending_validations[spend_name]
+        try:
+            start_time = time.time()
+            npc_result_bytes, program_bytes, cost = await asyncio.get_running_loop().run_in_executor(
+                self.pool,
+                get_npc_and_cost_multiprocess,
+                bytes(new_spend),
+                int(self.limit_factor * self.constants.MAX_BLOCK_COST_CLVM),
+                self.constants.COST_PER_BYTE,
+            )
+            log.info(f"It took {time.time() - start_time} to pre validate transaction")
+            future.set_result(
+                (NPCResult.from_bytes(npc_result_bytes), SerializedProgram.from_bytes(program_bytes), uint64(cost))
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Marks the exception as retrieved, in case nobody is waiting any more
+            future.exception()
+        finally:
+            self.pending_validations.pop(spend_name)
+            self.running_validations -= 1
+            self._start_validations()
 
     async def add_spendbundle(
         self,
@@ -231,6 +304,7 @@ class MempoolManager:
         spend_name: bytes32,
         validate_signature=True,
         program: Optional[SerializedProgram] = None,
+        cost: Optional[uint64] = None,
     ) -> Tuple[Optional[uint64], MempoolInclusionStatus, Optional[Err]]:
         """
         Tries to add spend bundle to the mempool
@@ -243,7 +317,8 @@ class MempoolManager:
         npc_list = npc_result.npc_list
         if program is None:
             program = simple_solution_generator(new_spend).program
-        cost = calculate_cost_of_program(program, npc_result, self.constants.COST_PER_BYTE)
+        if cost is None:
+            cost = calculate_cost_of_program(program, npc_result, self.constants.COST_PER_BYTE)
 
         log.debug(f"Cost: {cost}")
 
@@ -294,8 +369,14 @@ class MempoolManager:
         removal_record_dict: Dict[bytes32, CoinRecord] = {}
         removal_coin_dict: Dict[bytes32, Coin] = {}
         removal_amount = uint64(0)
+        removal_records_in_db: Dict[bytes32, CoinRecord] = {
+            record.name: record
+            for record in await self.coin_store.get_coin_records(
+                [name for name in removal_names if name not in additions_dict]
+            )
+        }
         for name in removal_names:
-            removal_record = await self.coin_store.get_coin_record(name)
+            removal_record = removal_records_in_db.get(name)
             if removal_record is None and name not in additions_dict:
                 return None, MempoolInclusionStatus.FAILED, Err.UNKNOWN_UNSPENT
             elif name in additions_dict:
@@ -424,7 +505,8 @@ class MempoolManager:
 
         if validate_signature:
             # Verify aggregated signature
-            if not AugSchemeMPL.aggregate_verify(pks, msgs, new_spend.aggregated_signature):
+            # The pairings are cached, so they are not computed again when the item is included in a block
+            if not cached_bls.aggregate_verify(pks, msgs, new_spend.aggregated_signature, True):
                 log.warning(f"Aggsig validation error {pks} {msgs} {new_spend}")
                 return None, MempoolInclusionStatus.FAILED, Err.BAD_AGGREGATE_SIGNATURE
         # Remove all conflicting Coins and SpendBundles
@@ -509,26 +591,18 @@ class MempoolManager:
 
         self.peak = new_peak
 
-        old_pool = self.mempool
         async with self.lock:
-            self.mempool = Mempool(self.mempool_max_total_cost)
-
-            for item in old_pool.spends.values():
-                _, result, _ = await self.add_spendbundle(
-                    item.spend_bundle, item.npc_result, item.spend_bundle_name, False, item.program
-                )
-                # If the spend bundle was confirmed or conflicting (can no longer be in mempool), it won't be
-                # successfully added to the new mempool. In this case, remove it from seen, so in the case of a reorg,
-                # it can be resubmitted
-                if result != MempoolInclusionStatus.SUCCESS:
-                    self.remove_seen(item.spend_bundle_name)
+            for item in await self.remove_invalid_items():
+                # If the spend bundle was confirmed or conflicting (can no longer be in mempool), remove it from seen,
+                # so in the case of a reorg, it can be resubmitted
+                self.remove_seen(item.spend_bundle_name)
 
             potential_txs_copy = self.potential_txs.copy()
             self.potential_txs = {}
             txs_added = []
             for item in potential_txs_copy.values():
                 cost, status, error = await self.add_spendbundle(
-                    item.spend_bundle, item.npc_result, item.spend_bundle_name, program=item.program
+                    item.spend_bundle, item.npc_result, item.spend_bundle_name, program=item.program, cost=item.cost
                 )
                 if status == MempoolInclusionStatus.SUCCESS:
                     txs_added.append((item.spend_bundle, item.npc_result, item.spend_bundle_name))
@@ -538,6 +612,79 @@ class MempoolManager:
         )
         return txs_added
 
+    async def remove_invalid_items(self) -> List[MempoolItem]:
+        """
+        Removes the items which can no longer be included on top of the peak, and returns them. These are the items
+        which spend coins that were spent, or that are no longer in the blockchain after a reorg, and the items whose
+        height or time conditions fail at the peak. The removals of all items are read at once, and the cost, fees and
+        signature of the remaining items are not validated again, since they do not depend on the peak.
+        """
+        assert self.peak is not None and self.peak.timestamp is not None
+        items: List[MempoolItem] = list(self.mempool.spends.values())
+        removal_names: List[bytes32] = []
+        for item in items:
+            additions_names = set(coin.name() for coin in item.additions)
+            removal_names.extend(coin.name() for coin in item.removals if coin.name() not in additions_names)
+        removal_records: Dict[bytes32, CoinRecord] = {
+            record.name: record for record in await self.coin_store.get_coin_records(removal_names)
+        }
+
+        chialisp_height = (
+            self.peak.prev_transaction_block_height if not self.peak.is_transaction_block else self.peak.height
+        )
+        removed: List[MempoolItem] = []
+        for item in items:
+            additions_dict: Dict[bytes32, Coin] = {coin.name(): coin for coin in item.additions}
+            records: Dict[bytes32, CoinRecord] = {}
+            error: Optional[Err] = None
+            for coin in item.removals:
+                name = coin.name()
+                if name in additions_dict:
+                    # Ephemeral coins are created in the same block, see add_spendbundle
+                    records[name] = CoinRecord(
+                        coin,
+                        uint32(self.peak.height + 1),
+                        uint32(0),
+                        False,
+                        False,
+                        uint64(self.peak.timestamp + 1),
+                    )
+                    continue
+                record = removal_records.get(name)
+                if record is None:
+                    error = Err.UNKNOWN_UNSPENT
+                    break
+                if record.spent:
+                    error = Err.DOUBLE_SPEND
+                    break
+                records[name] = record
+
+            if error is None and any(
+                opcode in TIMELOCK_CONDITIONS for npc in item.npc_result.npc_list for opcode in npc.condition_dict
+            ):
+                coin_announcements_in_spend = coin_announcements_names_for_npc(item.npc_result.npc_list)
+                puzzle_announcements_in_spend = puzzle_announcements_names_for_npc(item.npc_result.npc_list)
+                for npc in item.npc_result.npc_list:
+                    error = mempool_check_conditions_dict(
+                        records[npc.coin_name],
+                        coin_announcements_in_spend,
+                        puzzle_announcements_in_spend,
+                        npc.condition_dict,
+                        uint32(chialisp_height),
+                        self.peak.timestamp,
+                    )
+                    if error:
+                        break
+
+            if error is None:
+                continue
+            self.mempool.remove_from_pool(item)
+            removed.append(item)
+            if error is Err.ASSERT_HEIGHT_ABSOLUTE_FAILED or error is Err.ASSERT_HEIGHT_RELATIVE_FAILED:
+                # After a reorg to a lower height, the item can be valid again later
+                self.add_to_potential_tx_set(item)
+        return removed
+
     async def get_items_not_in_filter(self, mempool_filter: PyBIP158, limit: int = 100) -> List[MempoolItem]:
         items: List[MempoolItem] = []
         counter = 0
@@ -1,4 +1,4 @@
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from chia.consensus.block_record import BlockRecord
 from chia.consensus.pos_quality import UI_ACTUAL_SPACE_CONSTANT_FACTOR
@@ -11,6 +11,7 @@ from chia.types.spend_bundle import SpendBundle
 from chia.types.unfinished_header_block import UnfinishedHeaderBlock
 from chia.util.byte_types import hexstr_to_bytes
 from chia.util.ints import uint32, uint64, uint128
+from chia.util.streamable import LazyStreamable
 from chia.util.ws_message import WsRpcMessage, create_payload_dict
 
 
@@ -43,6 +44,7 @@ class FullNodeRpcApi:
             "/get_all_mempool_tx_ids": self.get_all_mempool_tx_ids,
             "/get_all_mempool_items": self.get_all_mempool_items,
             "/get_mempool_item_by_tx_id": self.get_mempool_item_by_tx_id,
+            "/get_mempool_fee_rates": self.get_mempool_fee_rates,
         }
 
     async def _state_changed(self, change: str) -> List[WsRpcMessage]:
@@ -84,6 +86,7 @@ class FullNodeRpcApi:
                     "sub_slot_iters": 0,
                     "space": 0,
                     "mempool_size": 0,
+                    "block_record_cache": self.service.block_store.block_record_cache.stats(),
                 },
             }
             return res
@@ -151,6 +154,7 @@ class FullNodeRpcApi:
                 "sub_slot_iters": sub_slot_iters,
                 "space": space["space"],
                 "mempool_size": mempool_size,
+                "block_record_cache": self.service.block_store.block_record_cache.stats(),
             },
         }
         self.cached_blockchain_state = dict(response["blockchain_state"])
@@ -398,7 +402,9 @@ class FullNodeRpcApi:
             raise ValueError("No header_hash in request")
         header_hash = hexstr_to_bytes(request["header_hash"])
 
-        block: Optional[FullBlock] = await self.service.block_store.get_full_block(header_hash)
+        block: Optional[Union[FullBlock, LazyStreamable]] = await self.service.block_store.get_full_block_lazy(
+            header_hash
+        )
         if block is None:
             raise ValueError(f"Block {header_hash.hex()} not found")
 
@@ -430,3 +436,21 @@ class FullNodeRpcApi:
             raise ValueError(f"Tx id 0x{tx_id.hex()} not in the mempool")
 
         return {"mempool_item": item}
+
+    async def get_mempool_fee_rates(self, request: Dict) -> Optional[Dict]:
+        """
+        Returns the fee per cost that a transaction of the given cost must exceed to enter the mempool, and the cost
+        of the mempool items by fee per cost, as the lowest fee per cost and the cost of each non empty bucket.
+        """
+        cost = int(request.get("cost", 0))
+        mempool = self.service.mempool_manager.mempool
+        buckets = [
+            {"min_fee_rate": min_fee_rate, "cost": bucket_cost}
+            for min_fee_rate, bucket_cost in mempool.fee_rate_index.bucket_costs()
+        ]
+        return {
+            "min_fee_rate": mempool.get_min_fee_rate(cost),
+            "mempool_cost": mempool.total_mempool_cost,
+            "mempool_max_cost": mempool.max_size_in_cost,
+            "fee_rate_buckets": buckets,
+        }
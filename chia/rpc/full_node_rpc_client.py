@@ -150,3 +150,6 @@ class FullNodeRpcClient(RpcClient):
             return response["mempool_item"]
         except Exception:
             return None
+
+    async def get_mempool_fee_rates(self, cost: int = 0) -> Dict:
+        return await self.fetch("get_mempool_fee_rates", {"cost": cost})
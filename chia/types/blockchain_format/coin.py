@@ -19,6 +19,9 @@ class Coin(Streamable):
     puzzle_hash: bytes32
     amount: uint64
 
+    # The name of a coin is looked up over and over in the mempool, validation and the wallet
+    CACHE_SERIALIZATION = True
+
     def get_hash(self) -> bytes32:
         # This does not use streamable format for hashing, the amount is
         # serialized using CLVM integer format.
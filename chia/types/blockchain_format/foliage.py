@@ -57,3 +57,6 @@ class Foliage(Streamable):
     foliage_block_data_signature: G2Element
     foliage_transaction_block_hash: Optional[bytes32]
     foliage_transaction_block_signature: Optional[G2Element]
+
+    # The hash is the header hash of the block
+    CACHE_SERIALIZATION = True
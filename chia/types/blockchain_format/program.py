@@ -139,6 +139,22 @@ def _serialize(node) -> bytes:
         return SExp.to(node).as_bin()
 
 
+def _serialized_length_of_view(view: memoryview) -> int:
+    """
+    Returns the length of the program serialized at the start of `view`. clvm_rs only accepts bytes, so rather
+    than copying everything that follows the program, prefixes of exponentially growing size are tried. The
+    serialization is prefix free, so the first prefix that can be parsed has the length of the program.
+    """
+    window = 1024
+    while True:
+        try:
+            return serialized_length(bytes(view[:window]))
+        except Exception:
+            if window >= len(view):
+                raise
+            window *= 2
+
+
 class SerializedProgram:
     """
     An opaque representation of a clvm program. It has a more limited interface than a full SExp
@@ -148,7 +164,9 @@ class SerializedProgram:
 
     @classmethod
     def parse(cls, f) -> "SerializedProgram":
-        length = serialized_length(f.getvalue()[f.tell() :])
+        # The length is found on a view of the stream's buffer, and only the program is copied. Programs are kept
+        # in caches and mempool items, so they don't keep a view which would pin the whole buffer in memory
+        length = _serialized_length_of_view(memoryview(f.getvalue())[f.tell() :])
         return SerializedProgram.from_bytes(f.read(length))
 
     def stream(self, f):
@@ -23,6 +23,9 @@ class SpendBundle(Streamable):
     coin_solutions: List[CoinSolution]
     aggregated_signature: G2Element
 
+    # The name of a spend bundle is looked up over and over in the mempool
+    CACHE_SERIALIZATION = True
+
     @classmethod
     def aggregate(cls, spend_bundles) -> "SpendBundle":
         coin_solutions: List[CoinSolution] = []
@@ -92,3 +92,50 @@ class BlockCache(BlockchainInterface):
         if segments is None:
             return None
         return segments.challenge_segments
+
+
+class OverlayBlockCache(BlockchainInterface):
+    """
+    Block records of blocks which are not added to the blockchain yet, on top of the blockchain. Blocks which
+    build on them can be pre-validated while they are still being added. The height lookups come from the
+    blockchain only, so the blocks of the overlay are handled like a fork.
+    """
+
+    def __init__(self, blockchain: BlockchainInterface, blocks: Optional[Dict[bytes32, BlockRecord]] = None):
+        if blocks is None:
+            blocks = {}
+        self._blockchain = blockchain
+        self._block_records = blocks
+
+    def get_peak_height(self) -> Optional[uint32]:
+        return self._blockchain.get_peak_height()
+
+    def block_record(self, header_hash: bytes32) -> BlockRecord:
+        block_record = self._block_records.get(header_hash)
+        if block_record is None:
+            return self._blockchain.block_record(header_hash)
+        return block_record
+
+    def height_to_block_record(self, height: uint32) -> BlockRecord:
+        return self._blockchain.height_to_block_record(height)
+
+    def get_ses_heights(self) -> List[uint32]:
+        return self._blockchain.get_ses_heights()
+
+    def get_ses(self, height: uint32) -> SubEpochSummary:
+        return self._blockchain.get_ses(height)
+
+    def height_to_hash(self, height: uint32) -> Optional[bytes32]:
+        return self._blockchain.height_to_hash(height)
+
+    def contains_block(self, header_hash: bytes32) -> bool:
+        return header_hash in self._block_records or self._blockchain.contains_block(header_hash)
+
+    def contains_height(self, height: uint32) -> bool:
+        return self._blockchain.contains_height(height)
+
+    def remove_block_record(self, header_hash: bytes32):
+        del self._block_records[header_hash]
+
+    def add_block_record(self, block: BlockRecord):
+        self._block_records[block.header_hash] = block
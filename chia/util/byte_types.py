@@ -28,7 +28,8 @@ def make_sized_bytes(size: int):
     def parse(cls, f: BinaryIO) -> Any:
         b = f.read(size)
         assert len(b) == size
-        return cls(b)
+        # the size was just checked, so skip __new__ and copy the read bytes straight into the instance
+        return bytes.__new__(cls, b)
 
     def stream(self, f):
         f.write(self)
@@ -0,0 +1,53 @@
+import functools
+from typing import List, Optional
+
+from blspy import AugSchemeMPL, G1Element, G2Element, GTElement
+
+from chia.util.hash import std_hash
+from chia.util.lru_cache import LRUCache
+
+# Pairings of (public key, message) pairs, by hash of the key and message. A pairing does not depend on the signature,
+# so the pairings the mempool computes are reused for the blocks made of mempool transactions
+LOCAL_CACHE: LRUCache = LRUCache(10000)
+
+
+def get_pairings(cache: LRUCache, pks: List[G1Element], msgs: List[bytes], force_cache: bool) -> List[GTElement]:
+    """
+    Returns the pairings of the public keys with their augmented messages, computing and caching the missing ones.
+    Unless force_cache is True, an empty list is returned if most pairings are missing, since computing them one by
+    one is slower than a plain aggregate verification, for example while syncing.
+    """
+    pairings: List[Optional[GTElement]] = []
+    missing_count: int = 0
+    for pk, msg in zip(pks, msgs):
+        pairing: Optional[GTElement] = cache.get(std_hash(bytes(pk) + msg))
+        if pairing is None:
+            missing_count += 1
+            if not force_cache and missing_count > len(pks) // 2:
+                return []
+        pairings.append(pairing)
+
+    for i, pairing in enumerate(pairings):
+        if pairing is None:
+            aug_msg: bytes = bytes(pks[i]) + msgs[i]
+            aug_hash: G2Element = AugSchemeMPL.g2_from_message(aug_msg)
+            pairing = pks[i].pair(aug_hash)
+            cache.put(std_hash(aug_msg), pairing)
+            pairings[i] = pairing
+
+    return pairings
+
+
+def aggregate_verify(
+    pks: List[G1Element], msgs: List[bytes], sig: G2Element, force_cache: bool = False, cache: LRUCache = LOCAL_CACHE
+) -> bool:
+    """
+    Like AugSchemeMPL.aggregate_verify, but reuses the pairings of (public key, message) pairs which were already
+    verified, so only the pairing of the signature is computed for them.
+    """
+    pairings: List[GTElement] = get_pairings(cache, pks, msgs, force_cache)
+    if len(pairings) == 0:
+        return AugSchemeMPL.aggregate_verify(pks, msgs, sig)
+
+    pairings_prod: GTElement = functools.reduce(GTElement.__mul__, pairings)
+    return pairings_prod == sig.pair(G1Element.generator())
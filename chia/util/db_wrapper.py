@@ -1,19 +1,97 @@
 import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
 
 import aiosqlite
 
+# SQLite builds older than 3.32 (like the one of python 3.7) limit the number of variables in a query to 999
+SQLITE_MAX_VARIABLE_NUMBER = 999
+
+
+class WriterLock(asyncio.Lock):
+    """
+    An asyncio.Lock which remembers the task holding it.
+
+    The generation is bumped whenever the lock is acquired or released, so it is even while the lock is free. A
+    reader which sees the same even generation before and after a query knows no write overlapped it.
+    """
+
+    owner: Optional[asyncio.Task] = None
+    generation: int = 0
+
+    async def acquire(self) -> bool:
+        await super().acquire()
+        self.owner = asyncio.current_task()
+        self.generation += 1
+        return True
+
+    def release(self) -> None:
+        self.owner = None
+        self.generation += 1
+        super().release()
+
+    def unchanged_since(self, generation: int) -> bool:
+        """
+        Returns whether the lock was free at `generation` and has not been acquired since.
+        """
+        return generation % 2 == 0 and generation == self.generation
+
 
 class DBWrapper:
     """
     This object handles HeaderBlocks and Blocks stored in DB used by wallet.
+
+    All writes go through the single connection `db`, in transactions guarded by `lock`. Queries can optionally be
+    served by a pool of read-only connections, see reader().
     """
 
     db: aiosqlite.Connection
-    lock: asyncio.Lock
+    lock: WriterLock
+    readers: List[aiosqlite.Connection]
 
     def __init__(self, connection: aiosqlite.Connection):
         self.db = connection
-        self.lock = asyncio.Lock()
+        self.lock = WriterLock()
+        self.readers = []
+        self._free_readers: Optional[asyncio.Queue] = None
+
+    async def open_readers(self, db_path: Path, count: int) -> None:
+        """
+        Opens `count` read-only connections to the database at db_path for reader(). The database must be in WAL
+        mode, so that the readers are not blocked while a block is being committed.
+        """
+        if count <= 0:
+            return None
+        if self._free_readers is None:
+            self._free_readers = asyncio.Queue()
+        for _ in range(count):
+            connection = await aiosqlite.connect(f"{Path(db_path).absolute().as_uri()}?mode=ro", uri=True)
+            self.readers.append(connection)
+            self._free_readers.put_nowait(connection)
+
+    async def close_readers(self) -> None:
+        for connection in self.readers:
+            await connection.close()
+        self.readers = []
+        self._free_readers = None
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Yields a connection to run queries on. Readers only see committed data, so the task holding the lock, which
+        might be in the middle of a transaction, always gets the writer connection. So does everyone if no readers
+        were opened.
+        """
+        free_readers = self._free_readers
+        if free_readers is None or self.lock.owner is asyncio.current_task():
+            yield self.db
+            return
+        connection = await free_readers.get()
+        try:
+            yield connection
+        finally:
+            free_readers.put_nowait(connection)
 
     async def begin_transaction(self):
         cursor = await self.db.execute("BEGIN TRANSACTION")
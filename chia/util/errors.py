@@ -150,6 +150,7 @@ class Err(Enum):
 
     INVALID_FEE_TOO_CLOSE_TO_ZERO = 123
     COIN_AMOUNT_NEGATIVE = 124
+    MEMPOOL_VALIDATION_QUEUE_FULL = 125
 
 
 class ValidationError(Exception):
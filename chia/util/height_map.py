@@ -0,0 +1,62 @@
+from typing import Dict
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.ints import uint32
+
+
+class HeightToHash:
+    """
+    The header hashes of a chain from genesis to its peak, stored back to back in a single bytearray, with the hash
+    of height h at offset 32 * h. Heights in a chain are dense, so this takes 32 bytes per block, instead of the
+    dict, int and bytes objects of a Dict[uint32, bytes32].
+    """
+
+    def __init__(self, hashes: bytes = b""):
+        assert len(hashes) % 32 == 0
+        self._hashes = bytearray(hashes)
+
+    @classmethod
+    def from_dict(cls, height_to_hash: Dict[uint32, bytes32]) -> "HeightToHash":
+        ret = cls()
+        for height in range(len(height_to_hash)):
+            ret.append(height_to_hash[uint32(height)])
+        return ret
+
+    def __len__(self) -> int:
+        return len(self._hashes) // 32
+
+    def __contains__(self, height: int) -> bool:
+        return 0 <= height < len(self)
+
+    def __getitem__(self, height: int) -> bytes32:
+        if height not in self:
+            raise KeyError(height)
+        return bytes32(self._hashes[height * 32 : (height + 1) * 32])
+
+    def __setitem__(self, height: int, header_hash: bytes32) -> None:
+        """
+        Sets the hash of a height in the chain, or of the height right after its peak.
+        """
+        assert len(header_hash) == 32
+        if height == len(self):
+            self._hashes += header_hash
+        elif height in self:
+            self._hashes[height * 32 : (height + 1) * 32] = header_hash
+        else:
+            raise KeyError(height)
+
+    def append(self, header_hash: bytes32) -> None:
+        self[len(self)] = header_hash
+
+    def truncate(self, length: int) -> None:
+        """
+        Drops the hashes of all heights from `length` on, for example the blocks above the fork point in a reorg.
+        """
+        del self._hashes[max(length, 0) * 32 :]
+
+    def view(self, start: int, stop: int) -> memoryview:
+        """
+        Returns a read only view of the hashes of heights start to stop (exclusive), 32 bytes each, without copying
+        them. The view must be released before the map is changed.
+        """
+        return memoryview(self._hashes)[start * 32 : stop * 32].toreadonly()
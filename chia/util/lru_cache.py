@@ -1,16 +1,21 @@
 from collections import OrderedDict
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 
 class LRUCache:
     def __init__(self, capacity: int):
         self.cache: OrderedDict = OrderedDict()
         self.capacity = capacity
+        # Number of keys found and not found by get() and get_many()
+        self.hits = 0
+        self.misses = 0
 
     def get(self, key: Any) -> Optional[Any]:
         if key not in self.cache:
+            self.misses += 1
             return None
         else:
+            self.hits += 1
             self.cache.move_to_end(key)
             return self.cache[key]
 
@@ -22,3 +27,34 @@ class LRUCache:
 
     def remove(self, key: Any) -> None:
         self.cache.pop(key)
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """
+        Returns the cached values of the keys that are in the cache, and marks them as recently used.
+        """
+        found: Dict[Any, Any] = {}
+        for key in keys:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                found[key] = self.cache[key]
+            else:
+                self.misses += 1
+        self.hits += len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[Any, Any]]) -> None:
+        for key, value in items:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self.cache), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def remove_many(self, keys: Iterable[Any]) -> None:
+        """
+        Removes the keys from the cache. Unlike remove(), keys that are not in the cache are ignored.
+        """
+        for key in keys:
+            self.cache.pop(key, None)
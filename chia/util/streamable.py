@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import dataclasses
+import inspect
 import io
 import pprint
 import sys
+import types
 from enum import Enum
 from typing import Any, BinaryIO, Dict, List, Tuple, Type, Callable, Optional, Iterator
 
@@ -16,6 +18,7 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.byte_types import hexstr_to_bytes
 from chia.util.hash import std_hash
 from chia.util.ints import int64, int512, uint32, uint64, uint128
+from chia.util.struct_stream import StructStream
 from chia.util.type_checking import is_type_List, is_type_SpecificOptional, is_type_Tuple, strictdataclass
 
 if sys.version_info < (3, 8):
@@ -126,6 +129,68 @@ def recurse_jsonify(d):
 
 
 PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS = {}
+STREAM_FUNCTIONS_FOR_STREAMABLE_CLASS = {}
+SKIP_FUNCTIONS_FOR_STREAMABLE_CLASS = {}
+TO_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS = {}
+FROM_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS = {}
+
+
+def bytes_to_json(item: Any) -> str:
+    return f"0x{bytes(item).hex()}"
+
+
+def optional_to_json(to_json_inner_type_f: Callable[[Any], Any], item: Any) -> Any:
+    if item is None:
+        return None
+    return to_json_inner_type_f(item)
+
+
+def list_to_json(to_json_inner_type_f: Callable[[Any], Any], item: Any) -> List[Any]:
+    return [to_json_inner_type_f(element) for element in item]
+
+
+def tuple_to_json(list_to_json_inner_type_f: List[Callable[[Any], Any]], item: Any) -> List[Any]:
+    return [to_json_f(element) for to_json_f, element in zip(list_to_json_inner_type_f, item)]
+
+
+def streamable_to_json(item: Any) -> Dict[str, Any]:
+    return {
+        f_name: to_json_f(getattr(item, f_name))
+        for f_name, to_json_f in TO_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS[type(item)]
+    }
+
+
+def optional_from_json(from_json_inner_type_f: Callable[[Any], Any], item: Any) -> Optional[Any]:
+    # Same as dataclass_from_dict, any falsy value is read as None
+    if not item:
+        return None
+    return from_json_inner_type_f(item)
+
+
+def list_from_json(from_json_inner_type_f: Callable[[Any], Any], item: Any) -> List[Any]:
+    if not isinstance(item, (list, tuple)):
+        raise ValueError(f"Wrong type {type(item)}, need a list.")
+    return [from_json_inner_type_f(element) for element in item]
+
+
+def tuple_from_json(list_from_json_inner_type_f: List[Callable[[Any], Any]], item: Any) -> Tuple[Any, ...]:
+    if len(item) != len(list_from_json_inner_type_f):
+        raise ValueError(f"Wrong number of elements in tuple, need {len(list_from_json_inner_type_f)}.")
+    return tuple(from_json_f(element) for from_json_f, element in zip(list_from_json_inner_type_f, item))
+
+
+def streamable_from_json(cls: Any, json_dict: Dict[str, Any]) -> Any:
+    from_json_functions = FROM_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS[cls]
+    if len(json_dict) != len(from_json_functions):
+        field_names = set(f_name for f_name, _ in from_json_functions)
+        for key in json_dict:
+            if key not in field_names:
+                raise KeyError(key)
+    # The values are all converted to the field types here, so skip the checks in __init__ like parse() does
+    obj = object.__new__(cls)
+    for f_name, from_json_f in from_json_functions:
+        object.__setattr__(obj, f_name, from_json_f(json_dict[f_name]))
+    return obj
 
 
 def streamable(cls: Any):
@@ -145,6 +210,15 @@ def streamable(cls: Any):
 
     Furthermore, a get_hash() member is added, which performs a serialization and a sha256.
 
+    The parse, stream and JSON conversion functions for every field are resolved once, here at decoration
+    time, so that parsing, streaming and converting an object to or from JSON never has to inspect the field
+    types again.
+
+    Classes which set CACHE_SERIALIZATION = True have their serialized bytes and their hash memoized on the
+    object the first time they are computed, and objects created with from_bytes() keep the bytes they were
+    parsed from. Only use this for classes whose objects are never mutated after construction, including
+    the contents of their list fields.
+
     This class is used for deterministic serialization and hashing, for consensus critical
     objects such as the block header.
 
@@ -158,18 +232,69 @@ def streamable(cls: Any):
     t = type(cls.__name__, (cls1, Streamable), {})
 
     parse_functions = []
+    stream_functions = []
+    skip_functions = []
+    to_json_functions = []
+    from_json_functions = []
     try:
         fields = cls1.__annotations__  # pylint: disable=no-member
     except Exception:
         fields = {}
 
-    for _, f_type in fields.items():
-        parse_functions.append(cls.function_to_parse_one_item(f_type))
-
-    PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = parse_functions
+    for f_name, f_type in fields.items():
+        parse_functions.append((f_name, cls.function_to_parse_one_item(f_type)))
+        stream_functions.append((f_name, cls.function_to_stream_one_item(f_type)))
+        skip_functions.append(cls.function_to_skip_one_item(f_type))
+        to_json_functions.append((f_name, cls.function_to_json_one_item(f_type)))
+        from_json_functions.append((f_name, cls.function_from_json_one_item(f_type)))
+
+    PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = tuple(parse_functions)
+    STREAM_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = tuple(stream_functions)
+    SKIP_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = tuple(skip_functions)
+    TO_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = tuple(to_json_functions)
+    FROM_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS[t] = tuple(from_json_functions)
+
+    if t.CACHE_SERIALIZATION:
+        memoize_bytes_and_hash(t)
     return t
 
 
+def memoize_bytes_and_hash(t: Type) -> None:
+    """
+    Wraps __bytes__, stream and get_hash of the class, so that the bytes and the hash of an object are stored
+    in its __dict__ the first time they are computed. Fields are compared by the dataclass __eq__, so the
+    cached values don't affect equality.
+    """
+    uncached_bytes = t.__bytes__
+    uncached_stream = t.stream
+    uncached_get_hash = t.get_hash
+
+    def __bytes__(self: Any) -> bytes:
+        cached = self.__dict__.get("_cached_bytes")
+        if cached is None:
+            cached = uncached_bytes(self)
+            object.__setattr__(self, "_cached_bytes", cached)
+        return cached
+
+    def stream(self: Any, f: BinaryIO) -> None:
+        cached = self.__dict__.get("_cached_bytes")
+        if cached is None:
+            uncached_stream(self, f)
+        else:
+            f.write(cached)
+
+    def get_hash(self: Any) -> bytes32:
+        cached = self.__dict__.get("_cached_hash")
+        if cached is None:
+            cached = uncached_get_hash(self)
+            object.__setattr__(self, "_cached_hash", cached)
+        return cached
+
+    t.__bytes__ = __bytes__
+    t.stream = stream
+    t.get_hash = get_hash
+
+
 def parse_bool(f: BinaryIO) -> bool:
     bool_byte = f.read(1)
     assert bool_byte is not None and len(bool_byte) == 1  # Checks for EOF
@@ -212,6 +337,12 @@ def parse_list(f: BinaryIO, parse_inner_type_f: Callable[[BinaryIO], Any]) -> Li
     return full_list
 
 
+def parse_struct_stream_list(f: BinaryIO, inner_type: Type[StructStream]) -> List[Any]:
+    list_size_bytes = f.read(4)
+    assert list_size_bytes is not None and len(list_size_bytes) == 4  # Checks for EOF
+    return inner_type.parse_list(f, int.from_bytes(list_size_bytes, "big"))
+
+
 def parse_tuple(f: BinaryIO, list_parse_inner_type_f: List[Callable[[BinaryIO], Any]]) -> Tuple[Any, ...]:
     full_list = []
     for parse_f in list_parse_inner_type_f:
@@ -234,7 +365,78 @@ def parse_str(f: BinaryIO) -> str:
     return bytes.decode(str_read_bytes, "utf-8")
 
 
+def stream_optional(stream_inner_type_func: Callable[[Any, BinaryIO], Any], item: Any, f: BinaryIO) -> None:
+    if item is None:
+        f.write(bytes([0]))
+    else:
+        f.write(bytes([1]))
+        stream_inner_type_func(item, f)
+
+
+def stream_bytes(item: Any, f: BinaryIO) -> None:
+    f.write(uint32(len(item)).to_bytes(4, "big"))
+    f.write(item)
+
+
+def stream_list(stream_inner_type_func: Callable[[Any, BinaryIO], Any], item: Any, f: BinaryIO) -> None:
+    assert is_type_List(type(item))
+    f.write(uint32(len(item)).to_bytes(4, "big"))
+    for element in item:
+        stream_inner_type_func(element, f)
+
+
+def stream_tuple(stream_inner_type_funcs: List[Callable[[Any, BinaryIO], Any]], item: Any, f: BinaryIO) -> None:
+    assert len(item) == len(stream_inner_type_funcs)
+    for i in range(len(item)):
+        stream_inner_type_funcs[i](item[i], f)
+
+
+def stream_str(item: Any, f: BinaryIO) -> None:
+    str_bytes = item.encode("utf-8")
+    f.write(uint32(len(str_bytes)).to_bytes(4, "big"))
+    f.write(str_bytes)
+
+
+def stream_bool(item: Any, f: BinaryIO) -> None:
+    f.write(int(item).to_bytes(1, "big"))
+
+
+def skip_optional(f: BinaryIO, skip_inner_type_f: Callable[[BinaryIO], Any]) -> None:
+    is_present_bytes = f.read(1)
+    assert is_present_bytes is not None and len(is_present_bytes) == 1  # Checks for EOF
+    if is_present_bytes == bytes([1]):
+        skip_inner_type_f(f)
+    elif is_present_bytes != bytes([0]):
+        raise ValueError("Optional must be 0 or 1")
+
+
+def skip_list(f: BinaryIO, skip_inner_type_f: Callable[[BinaryIO], Any]) -> None:
+    list_size_bytes = f.read(4)
+    assert list_size_bytes is not None and len(list_size_bytes) == 4  # Checks for EOF
+    for list_index in range(int.from_bytes(list_size_bytes, "big")):
+        skip_inner_type_f(f)
+
+
+def skip_fixed_size_list(f: BinaryIO, item_size: int) -> None:
+    list_size_bytes = f.read(4)
+    assert list_size_bytes is not None and len(list_size_bytes) == 4  # Checks for EOF
+    skip_fixed_size(f, item_size * int.from_bytes(list_size_bytes, "big"))
+
+
+def skip_all(f: BinaryIO, list_skip_inner_type_f: List[Callable[[BinaryIO], Any]]) -> None:
+    for skip_f in list_skip_inner_type_f:
+        skip_f(f)
+
+
+def skip_fixed_size(f: BinaryIO, bytes_to_skip: int) -> None:
+    bytes_read = f.read(bytes_to_skip)
+    assert bytes_read is not None and len(bytes_read) == bytes_to_skip  # Checks for EOF
+
+
 class Streamable:
+    # See the streamable decorator
+    CACHE_SERIALIZATION = False
+
     @classmethod
     def function_to_parse_one_item(cls: Type[cls.__name__], f_type: Type):  # type: ignore
         """
@@ -254,6 +456,8 @@ class Streamable:
             return parse_bytes
         if is_type_List(f_type):
             inner_type = get_args(f_type)[0]
+            if isinstance(inner_type, type) and issubclass(inner_type, StructStream):
+                return lambda f: parse_struct_stream_list(f, inner_type)
             parse_inner_type_f = cls.function_to_parse_one_item(inner_type)
             return lambda f: parse_list(f, parse_inner_type_f)
         if is_type_Tuple(f_type):
@@ -271,63 +475,132 @@ class Streamable:
     def parse(cls: Type[cls.__name__], f: BinaryIO) -> cls.__name__:  # type: ignore
         # Create the object without calling __init__() to avoid unnecessary post-init checks in strictdataclass
         obj: Streamable = object.__new__(cls)
-        fields: Iterator[str] = iter(getattr(cls, "__annotations__", {}))
-        values: Iterator = (parse_f(f) for parse_f in PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[cls])
-        for field, value in zip(fields, values):
-            object.__setattr__(obj, field, value)
-
-        # Use -1 as a sentinel value as it's not currently serializable
-        if next(fields, -1) != -1:
-            raise ValueError("Failed to parse incomplete Streamable object")
-        if next(values, -1) != -1:
-            raise ValueError("Failed to parse unknown data in Streamable object")
+        for f_name, parse_f in PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[cls]:
+            object.__setattr__(obj, f_name, parse_f(f))
         return obj
 
-    def stream_one_item(self, f_type: Type, item, f: BinaryIO) -> None:
+    @classmethod
+    def function_to_skip_one_item(cls: Type[cls.__name__], f_type: Type):  # type: ignore
+        """
+        This function returns a function taking one argument `f: BinaryIO` that moves the stream past one value
+        of the given type, without constructing the value where its size can be found from the data alone.
+        """
         inner_type: Type
         if is_type_SpecificOptional(f_type):
             inner_type = get_args(f_type)[0]
-            if item is None:
-                f.write(bytes([0]))
-            else:
-                f.write(bytes([1]))
-                self.stream_one_item(inner_type, item, f)
+            skip_inner_type_f = cls.function_to_skip_one_item(inner_type)
+            return lambda f: skip_optional(f, skip_inner_type_f)
+        if f_type in SKIP_FUNCTIONS_FOR_STREAMABLE_CLASS:
+            list_skip_inner_type_f = SKIP_FUNCTIONS_FOR_STREAMABLE_CLASS[f_type]
+            return lambda f: skip_all(f, list_skip_inner_type_f)
+        if is_type_List(f_type):
+            inner_type = get_args(f_type)[0]
+            if isinstance(inner_type, type) and issubclass(inner_type, StructStream):
+                item_size = inner_type.SIZE
+                return lambda f: skip_fixed_size_list(f, item_size)
+            skip_inner_type_f = cls.function_to_skip_one_item(inner_type)
+            return lambda f: skip_list(f, skip_inner_type_f)
+        if is_type_Tuple(f_type):
+            list_skip_inner_type_f = [cls.function_to_skip_one_item(_) for _ in get_args(f_type)]
+            return lambda f: skip_all(f, list_skip_inner_type_f)
+        if isinstance(f_type, type) and issubclass(f_type, StructStream):
+            bytes_to_skip = f_type.SIZE
+            return lambda f: skip_fixed_size(f, bytes_to_skip)
+        if hasattr(f_type, "from_bytes") and f_type.__name__ in size_hints:
+            bytes_to_skip = size_hints[f_type.__name__]
+            return lambda f: skip_fixed_size(f, bytes_to_skip)
+        # Everything else is cheap enough to parse, or needs parsing to know its size
+        return cls.function_to_parse_one_item(f_type)
+
+    @classmethod
+    def function_to_stream_one_item(cls: Type[cls.__name__], f_type: Type):  # type: ignore
+        """
+        This function returns a function taking two arguments `item: Any, f: BinaryIO` that streams
+        the given item, which must be of the given type.
+        """
+        inner_type: Type
+        if is_type_SpecificOptional(f_type):
+            inner_type = get_args(f_type)[0]
+            stream_inner_type_func = cls.function_to_stream_one_item(inner_type)
+            return lambda item, f: stream_optional(stream_inner_type_func, item, f)
         elif f_type == bytes:
-            f.write(uint32(len(item)).to_bytes(4, "big"))
-            f.write(item)
+            return stream_bytes
         elif hasattr(f_type, "stream"):
-            item.stream(f)
+            return lambda item, f: item.stream(f)
         elif hasattr(f_type, "__bytes__"):
-            f.write(bytes(item))
+            return lambda item, f: f.write(bytes(item))
         elif is_type_List(f_type):
-            assert is_type_List(type(item))
-            f.write(uint32(len(item)).to_bytes(4, "big"))
             inner_type = get_args(f_type)[0]
-            # wjb assert inner_type != get_args(List)[0]  # type: ignore
-            for element in item:
-                self.stream_one_item(inner_type, element, f)
+            stream_inner_type_func = cls.function_to_stream_one_item(inner_type)
+            return lambda item, f: stream_list(stream_inner_type_func, item, f)
         elif is_type_Tuple(f_type):
             inner_types = get_args(f_type)
-            assert len(item) == len(inner_types)
-            for i in range(len(item)):
-                self.stream_one_item(inner_types[i], item[i], f)
-
+            stream_inner_type_funcs = [cls.function_to_stream_one_item(_) for _ in inner_types]
+            return lambda item, f: stream_tuple(stream_inner_type_funcs, item, f)
         elif f_type is str:
-            str_bytes = item.encode("utf-8")
-            f.write(uint32(len(str_bytes)).to_bytes(4, "big"))
-            f.write(str_bytes)
+            return stream_str
         elif f_type is bool:
-            f.write(int(item).to_bytes(1, "big"))
+            return stream_bool
         else:
-            raise NotImplementedError(f"can't stream {item}, {f_type}")
+            raise NotImplementedError(f"can't stream {f_type}")
+
+    @classmethod
+    def function_to_json_one_item(cls: Type[cls.__name__], f_type: Type):  # type: ignore
+        """
+        This function returns a function taking one argument `item: Any` that converts the item, which must be
+        of the given type, into a JSON compatible value. The result is the same as recurse_jsonify(asdict()).
+        """
+        inner_type: Type
+        if is_type_SpecificOptional(f_type):
+            inner_type = get_args(f_type)[0]
+            to_json_inner_type_f = cls.function_to_json_one_item(inner_type)
+            return lambda item: optional_to_json(to_json_inner_type_f, item)
+        if f_type in TO_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS:
+            return streamable_to_json
+        if is_type_List(f_type):
+            inner_type = get_args(f_type)[0]
+            to_json_inner_type_f = cls.function_to_json_one_item(inner_type)
+            return lambda item: list_to_json(to_json_inner_type_f, item)
+        if is_type_Tuple(f_type):
+            list_to_json_inner_type_f = [cls.function_to_json_one_item(_) for _ in get_args(f_type)]
+            return lambda item: tuple_to_json(list_to_json_inner_type_f, item)
+        if f_type in unhashable_types or issubclass(f_type, bytes):
+            return bytes_to_json
+        if issubclass(f_type, Enum):
+            return lambda item: item.name
+        if f_type in big_ints:
+            return int
+        return lambda item: item
+
+    @classmethod
+    def function_from_json_one_item(cls: Type[cls.__name__], f_type: Type):  # type: ignore
+        """
+        This function returns a function taking one argument `item: Any`, a JSON value, and returning a value of
+        the given type. The result is the same as dataclass_from_dict().
+        """
+        inner_type: Type
+        if is_type_SpecificOptional(f_type):
+            inner_type = get_args(f_type)[0]
+            from_json_inner_type_f = cls.function_from_json_one_item(inner_type)
+            return lambda item: optional_from_json(from_json_inner_type_f, item)
+        if f_type in FROM_JSON_FUNCTIONS_FOR_STREAMABLE_CLASS:
+            return lambda item: streamable_from_json(f_type, item)
+        if is_type_List(f_type):
+            inner_type = get_args(f_type)[0]
+            from_json_inner_type_f = cls.function_from_json_one_item(inner_type)
+            return lambda item: list_from_json(from_json_inner_type_f, item)
+        if is_type_Tuple(f_type):
+            list_from_json_inner_type_f = [cls.function_from_json_one_item(_) for _ in get_args(f_type)]
+            return lambda item: tuple_from_json(list_from_json_inner_type_f, item)
+        if issubclass(f_type, bytes):
+            return lambda item: f_type(hexstr_to_bytes(item))
+        if f_type in unhashable_types:
+            return lambda item: f_type.from_bytes(hexstr_to_bytes(item))
+        return f_type
 
     def stream(self, f: BinaryIO) -> None:
-        try:
-            fields = self.__annotations__  # pylint: disable=no-member
-        except Exception:
-            fields = {}
-        for f_name, f_type in fields.items():
-            self.stream_one_item(f_type, getattr(self, f_name), f)
+        for f_name, stream_f in STREAM_FUNCTIONS_FOR_STREAMABLE_CLASS[type(self)]:
+            stream_f(getattr(self, f_name), f)
 
     def get_hash(self) -> bytes32:
         return bytes32(std_hash(bytes(self)))
@@ -337,6 +610,8 @@ class Streamable:
         f = io.BytesIO(blob)
         parsed = cls.parse(f)
         assert f.read() == b""
+        if cls.CACHE_SERIALIZATION:
+            object.__setattr__(parsed, "_cached_bytes", bytes(blob))
         return parsed
 
     def __bytes__(self: Any) -> bytes:
@@ -344,15 +619,83 @@ class Streamable:
         self.stream(f)
         return bytes(f.getvalue())
 
+    @classmethod
+    def lazy_from_bytes(cls: Any, blob: bytes) -> LazyStreamable:
+        return LazyStreamable(cls, blob)
+
     def __str__(self: Any) -> str:
-        return pp.pformat(recurse_jsonify(dataclasses.asdict(self)))
+        return pp.pformat(self.to_json_dict())
 
     def __repr__(self: Any) -> str:
-        return pp.pformat(recurse_jsonify(dataclasses.asdict(self)))
+        return pp.pformat(self.to_json_dict())
 
     def to_json_dict(self) -> Dict:
-        return recurse_jsonify(dataclasses.asdict(self))
+        return streamable_to_json(self)
 
     @classmethod
     def from_json_dict(cls: Any, json_dict: Dict) -> Any:
-        return dataclass_from_dict(cls, json_dict)
+        return streamable_from_json(cls, json_dict)
+
+
+class LazyStreamable:
+    """
+    A read only view of a serialized streamable object, which only decodes a field the first time it is
+    accessed. The offsets of the fields are recorded as the blob is scanned, and the scan only goes as far as
+    the field being accessed, skipping over the fields before it without decoding them. Reading the fields at
+    the start of an object, like the header fields of a FullBlock, therefore never touches the rest of it.
+
+    Properties and methods of the streamable class can be used on the view, as long as they only read fields.
+    The blob is only fully checked by get_full(), which decodes the whole object.
+    """
+
+    def __init__(self, cls: Any, blob: bytes):
+        self._cls = cls
+        self._blob = blob
+        self._f = io.BytesIO(blob)
+        # Start offset of every field scanned so far
+        self._offsets: List[int] = [0]
+        self._values: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        for index, (f_name, parse_f) in enumerate(PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[self._cls]):
+            if f_name == name:
+                break
+        else:
+            attr = inspect.getattr_static(self._cls, name)
+            if isinstance(attr, property):
+                return attr.fget(self)
+            if inspect.isfunction(attr):
+                return types.MethodType(attr, self)
+            return getattr(self._cls, name)
+
+        self._f.seek(self._scan_to(index))
+        value = parse_f(self._f)
+        if len(self._offsets) == index + 1:
+            self._offsets.append(self._f.tell())
+        self._values[name] = value
+        return value
+
+    def _scan_to(self, index: int) -> int:
+        skip_functions = SKIP_FUNCTIONS_FOR_STREAMABLE_CLASS[self._cls]
+        while len(self._offsets) <= index:
+            self._f.seek(self._offsets[-1])
+            skip_functions[len(self._offsets) - 1](self._f)
+            self._offsets.append(self._f.tell())
+        return self._offsets[index]
+
+    def field_offset(self, name: str) -> int:
+        """
+        Returns the offset of a field in the blob, without decoding the fields before it.
+        """
+        for index, (f_name, _) in enumerate(PARSE_FUNCTIONS_FOR_STREAMABLE_CLASS[self._cls]):
+            if f_name == name:
+                return self._scan_to(index)
+        raise AttributeError(f"{self._cls.__name__} has no field {name}")
+
+    def get_full(self) -> Any:
+        return self._cls.from_bytes(self._blob)
+
+    def __bytes__(self) -> bytes:
+        return self._blob
@@ -1,6 +1,6 @@
-import io
 import struct
-from typing import Any, BinaryIO
+from itertools import repeat
+from typing import Any, BinaryIO, List
 
 
 class StructStream(int):
@@ -8,39 +8,63 @@ class StructStream(int):
 
     """
     Create a class that can parse and stream itself based on a struct.pack template string.
+
+    The compiled struct, the size and the range of values of each subclass are computed once, when the
+    subclass is defined.
     """
 
+    STRUCT: struct.Struct
+    SIZE: int
+    MINIMUM: int
+    MAXIMUM: int
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.STRUCT = struct.Struct(cls.PACK)
+        cls.SIZE = cls.STRUCT.size
+        bits = cls.SIZE * 8
+        # Lower case format characters are signed
+        if cls.PACK[-1].islower():
+            cls.MINIMUM = -(2 ** (bits - 1))
+            cls.MAXIMUM = 2 ** (bits - 1) - 1
+        else:
+            cls.MINIMUM = 0
+            cls.MAXIMUM = 2 ** bits - 1
+
     def __new__(cls: Any, value: int):
         value = int(value)
-        try:
-            v1 = struct.unpack(cls.PACK, struct.pack(cls.PACK, value))[0]
-            if value != v1:
-                raise ValueError(f"Value {value} does not fit into {cls.__name__}")
-        except Exception:
-            bits = struct.calcsize(cls.PACK) * 8
+        if value < cls.MINIMUM or value > cls.MAXIMUM:
             raise ValueError(
-                f"Value {value} of size {value.bit_length()} does not fit into " f"{cls.__name__} of size {bits}"
+                f"Value {value} of size {value.bit_length()} does not fit into "
+                f"{cls.__name__} of size {cls.SIZE * 8}"
             )
         return int.__new__(cls, value)  # type: ignore
 
     @classmethod
     def parse(cls: Any, f: BinaryIO) -> Any:
-        bytes_to_read = struct.calcsize(cls.PACK)
+        read_bytes = f.read(cls.SIZE)
+        assert read_bytes is not None and len(read_bytes) == cls.SIZE
+        # Anything unpacked with the struct of the class is in range, so skip the checks in __new__
+        return int.__new__(cls, cls.STRUCT.unpack(read_bytes)[0])
+
+    @classmethod
+    def parse_list(cls: Any, f: BinaryIO, count: int) -> List[Any]:
+        """
+        Parses `count` consecutive values of this type with a single read and a single unpack.
+        """
+        bytes_to_read = cls.SIZE * count
         read_bytes = f.read(bytes_to_read)
         assert read_bytes is not None and len(read_bytes) == bytes_to_read
-        return cls(*struct.unpack(cls.PACK, read_bytes))
+        values = struct.unpack(f"{cls.PACK[0]}{count}{cls.PACK[1:]}", read_bytes)
+        return list(map(int.__new__, repeat(cls, count), values))
 
     def stream(self, f):
-        f.write(struct.pack(self.PACK, self))
+        f.write(self.STRUCT.pack(self))
 
     @classmethod
     def from_bytes(cls: Any, blob: bytes) -> Any:  # type: ignore
-        f = io.BytesIO(blob)
-        result = cls.parse(f)
-        assert f.read() == b""
-        return result
+        assert len(blob) == cls.SIZE
+        return int.__new__(cls, cls.STRUCT.unpack(blob)[0])
 
     def __bytes__(self: Any) -> bytes:
-        f = io.BytesIO()
-        self.stream(f)
-        return bytes(f.getvalue())
+        return self.STRUCT.pack(self)
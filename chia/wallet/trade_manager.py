@@ -415,8 +415,9 @@ class TradeManager:
                 chia_discrepancy, []
             )
             if chia_spend_bundle is not None:
-                for coinsol in coinsols:
-                    chia_spend_bundle.coin_solutions.append(coinsol)
+                chia_spend_bundle = SpendBundle(
+                    chia_spend_bundle.coin_solutions + coinsols, chia_spend_bundle.aggregated_signature
+                )
 
         zero_spend_list: List[SpendBundle] = []
         spend_bundle = None
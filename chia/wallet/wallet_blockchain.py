@@ -13,7 +13,13 @@ from chia.consensus.constants import ConsensusConstants
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
 from chia.consensus.find_fork_point import find_fork_point_in_chain
 from chia.consensus.full_block_to_block_record import block_to_block_record
-from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_blocks_multiprocessing
+from chia.consensus.multiprocess_validation import (
+    BatchSizer,
+    PreValidationResult,
+    WorkerBlockRecords,
+    init_validation_worker,
+    pre_validate_blocks_multiprocessing,
+)
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.types.header_block import HeaderBlock
@@ -64,6 +70,8 @@ class WalletBlockchain(BlockchainInterface):
     block_store: WalletBlockStore
     # Used to verify blocks in parallel
     pool: ProcessPoolExecutor
+    batch_sizer: BatchSizer
+    worker_records: WorkerBlockRecords
 
     coins_of_interest_received: Any
     reorg_rollback: Any
@@ -99,10 +107,14 @@ class WalletBlockchain(BlockchainInterface):
         if cpu_count > 61:
             cpu_count = 61  # Windows Server 2016 has an issue https://bugs.python.org/issue26903
         num_workers = max(cpu_count - 2, 1)
-        self.pool = ProcessPoolExecutor(max_workers=num_workers)
-        log.info(f"Started {num_workers} processes for block validation")
         self.constants = consensus_constants
         self.constants_json = recurse_jsonify(dataclasses.asdict(self.constants))
+        self.pool = ProcessPoolExecutor(
+            max_workers=num_workers, initializer=init_validation_worker, initargs=(self.constants_json,)
+        )
+        self.batch_sizer = BatchSizer(num_workers)
+        self.worker_records = WorkerBlockRecords()
+        log.info(f"Started {num_workers} processes for block validation")
         self.block_store = block_store
         self._shut_down = False
         self.coins_of_interest_received = coins_of_interest_received
@@ -343,10 +355,20 @@ class WalletBlockchain(BlockchainInterface):
         return get_next_sub_slot_iters_and_difficulty(self.constants, new_slot, curr, self)[0]
 
     async def pre_validate_blocks_multiprocessing(
-        self, blocks: List[HeaderBlock], batch_size: int = 4
+        self, blocks: List[HeaderBlock], batch_size: Optional[int] = None
     ) -> Optional[List[PreValidationResult]]:
         return await pre_validate_blocks_multiprocessing(
-            self.constants, self.constants_json, self, blocks, self.pool, True, {}, None, batch_size
+            self.constants,
+            self.constants_json,
+            self,
+            blocks,
+            self.pool,
+            True,
+            {},
+            None,
+            batch_size,
+            batch_sizer=self.batch_sizer,
+            worker_records=self.worker_records,
         )
 
     def contains_block(self, header_hash: bytes32) -> bool:
@@ -13,6 +13,11 @@ from clvm.casts import int_to_bytes
 from chia.consensus.block_rewards import calculate_base_farmer_reward
 from chia.consensus.blockchain import ReceiveBlockResult
 from chia.consensus.coinbase import create_farmer_coin
+from chia.consensus.multiprocess_validation import (
+    BatchSizer,
+    batch_pre_validate_blocks_in_worker,
+    init_validation_worker,
+)
 from chia.consensus.pot_iterations import is_overflow_block
 from chia.full_node.bundle_tools import detect_potential_template_generator
 from chia.types.blockchain_format.classgroup import ClassgroupElement
@@ -1561,6 +1566,51 @@ class TestPreValidation:
         assert res[0].error is None
         assert res[1].error is not None
 
+    def test_batch_sizer(self):
+        sizer = BatchSizer(4, min_batch_time=0.1)
+        # Without measurements the blocks are spread over all the workers
+        assert sizer.batch_size(1) == 1
+        assert sizer.batch_size(32) == 8
+
+        # 4 batches of 10 blocks in 0.1 seconds, so 0.01 seconds per block
+        sizer.add_measurement(40, 4, 0.1)
+        assert sizer.block_time == pytest.approx(0.01)
+        assert sizer.batch_size(32) == 10
+        assert sizer.batch_size(100) == 25
+        assert sizer.batch_size(5) == 5
+
+    @pytest.mark.asyncio
+    async def test_pre_validation_in_worker(self, empty_blockchain):
+        blocks = bt.get_consecutive_blocks(3)
+        res = await empty_blockchain.pre_validate_blocks_multiprocessing(blocks, {})
+        assert res is not None and all(result.error is None for result in res)
+        # The workers already have the block records of the first call
+        res_2 = await empty_blockchain.pre_validate_blocks_multiprocessing(blocks, {})
+        assert res_2 == res
+
+        init_validation_worker(empty_blockchain.constants_json)
+        missing = batch_pre_validate_blocks_in_worker(
+            [bytes(blocks[0].header_hash)], {}, [bytes(blocks[1])], None, [None], {}, True, [], []
+        )
+        assert missing is None
+
+    @pytest.mark.asyncio
+    async def test_pre_validation_on_pending_blocks(self, empty_blockchain, default_1000_blocks):
+        blocks = default_1000_blocks[:64]
+        pending_results = await empty_blockchain.pre_validate_blocks_multiprocessing(blocks[:32], {})
+        assert pending_results is not None
+        # The next blocks are pre-validated before the pending ones are added
+        res = await empty_blockchain.pre_validate_blocks_multiprocessing(
+            blocks[32:], {}, pending_blocks=blocks[:32], pending_results=pending_results
+        )
+        assert res is not None
+        assert all(result.error is None for result in res)
+        assert not empty_blockchain.contains_block(blocks[32].header_hash)
+
+        for block, result in zip(blocks, pending_results + res):
+            assert (await empty_blockchain.receive_block(block, result))[0] == ReceiveBlockResult.NEW_PEAK
+        assert res == await empty_blockchain.pre_validate_blocks_multiprocessing(blocks[32:], {})
+
     @pytest.mark.asyncio
     async def test_pre_validation(self, empty_blockchain, default_1000_blocks):
         blocks = default_1000_blocks[:100]
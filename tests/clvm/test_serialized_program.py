@@ -1,3 +1,5 @@
+import io
+import pickle
 from unittest import TestCase
 
 from chia.types.blockchain_format.program import Program, SerializedProgram, INFINITE_COST
@@ -25,3 +27,21 @@ class TestSerializedProgram(TestCase):
         print(s0, p0)
         # TODO: enable when clvm updated for minimal encoding of zero
         # self.assertEqual(bytes(p0), bytes(s0))
+
+    def test_parse_from_stream(self):
+        # larger than the first window used to find the serialized length
+        p = Program.to([b"\x01" * 3000, b"\x02" * 5000])
+        f = io.BytesIO(bytes(p) + b"\xff\x80")
+        sp = SerializedProgram.parse(f)
+        self.assertEqual(f.read(), b"\xff\x80")
+        self.assertEqual(bytes(sp), bytes(p))
+        self.assertEqual(sp, SerializedProgram.from_bytes(bytes(p)))
+
+        out = io.BytesIO()
+        SerializedProgram.parse(io.BytesIO(bytes(p))).stream(out)
+        self.assertEqual(out.getvalue(), bytes(p))
+
+        self.assertEqual(pickle.loads(pickle.dumps(SerializedProgram.parse(io.BytesIO(bytes(p))))), sp)
+
+        with self.assertRaises(Exception):
+            SerializedProgram.parse(io.BytesIO(bytes(p)[:-1]))
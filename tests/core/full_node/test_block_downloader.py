@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from chia.full_node.block_downloader import BlockBatchDownloader
+from chia.protocols.full_node_protocol import RejectBlocks, RespondBlocks
+from chia.util.hash import std_hash
+from chia.util.ints import uint32
+from tests.setup_nodes import bt
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    loop = asyncio.get_event_loop()
+    yield loop
+
+
+class FakePeer:
+    def __init__(self, name: bytes, blocks, delay: float = 0, timeouts: int = 0, reject: bool = False):
+        self.peer_node_id = std_hash(name)
+        self.blocks = blocks
+        self.delay = delay
+        self.timeouts = timeouts
+        self.reject = reject
+        self.closed = False
+        self.requests = []
+
+    def get_peer_info(self):
+        return self.peer_node_id
+
+    async def close(self, ban_time: int = 0):
+        self.closed = True
+
+    async def request_blocks(self, request, timeout: int):
+        self.requests.append((request.start_height, request.end_height))
+        await asyncio.sleep(self.delay)
+        if self.timeouts > 0:
+            self.timeouts -= 1
+            return None
+        if self.reject:
+            return RejectBlocks(request.start_height, request.end_height)
+        return RespondBlocks(
+            request.start_height,
+            request.end_height,
+            self.blocks[request.start_height : request.end_height + 1],
+        )
+
+
+async def download_all(downloader: BlockBatchDownloader):
+    batches = []
+    downloader.start()
+    try:
+        while True:
+            batch = await downloader.next_batch()
+            if batch is None:
+                break
+            batches.append(batch)
+    finally:
+        await downloader.close()
+    return batches
+
+
+class TestBlockBatchDownloader:
+    @pytest.mark.asyncio
+    async def test_batches_in_order(self):
+        blocks = bt.get_consecutive_blocks(20)
+        # The slow peer finishes its batches last, they are still returned in order
+        peers = [FakePeer(b"fast", blocks), FakePeer(b"slow", blocks, delay=0.1)]
+        downloader = BlockBatchDownloader(peers, 0, 19, 4, 3)
+        batches = await download_all(downloader)
+
+        assert [(start, end) for start, end, _ in batches] == [(0, 4), (4, 8), (8, 12), (12, 16), (16, 19)]
+        for start, end, fetched in batches:
+            assert fetched is not None
+            assert fetched[1] == blocks[start : end + 1]
+        assert len(peers[0].requests) > 0 and len(peers[1].requests) > 0
+
+    @pytest.mark.asyncio
+    async def test_bad_peers(self):
+        blocks = bt.get_consecutive_blocks(20)
+        rejecting = FakePeer(b"reject", blocks, reject=True)
+        wrong_blocks = FakePeer(b"wrong", blocks[1:])
+        timing_out = FakePeer(b"timeout", blocks, timeouts=10)
+        good = FakePeer(b"good", blocks, delay=0.01)
+        downloader = BlockBatchDownloader([rejecting, wrong_blocks, timing_out, good], 0, 19, 4, 2)
+        downloader.MAX_FAILURES = 2
+        batches = await download_all(downloader)
+
+        assert all(fetched is not None and fetched[0] is good for _, _, fetched in batches)
+        assert len(rejecting.requests) == 1
+        assert len(wrong_blocks.requests) == 1
+        assert timing_out.closed
+        assert downloader.get_peers() == [good]
+
+    @pytest.mark.asyncio
+    async def test_no_peers_left(self):
+        blocks = bt.get_consecutive_blocks(5)
+        peer = FakePeer(b"reject", blocks, reject=True)
+        downloader = BlockBatchDownloader([peer], 0, 4, 4, 2)
+        downloader.start()
+        try:
+            assert await downloader.next_batch() == (0, 4, None)
+        finally:
+            await downloader.close()
+
+        # A batch with invalid blocks is downloaded again from another peer
+        first, second = FakePeer(b"first", blocks), FakePeer(b"second", blocks)
+        downloader = BlockBatchDownloader([first, second], 0, 4, 4, 2)
+        fetched = await downloader.retry_batch(0, 4, {first.peer_node_id})
+        assert fetched is not None and fetched[0] is second
+        assert await downloader.retry_batch(0, 4, {first.peer_node_id, second.peer_node_id}) is None
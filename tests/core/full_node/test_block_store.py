@@ -1,4 +1,5 @@
 import asyncio
+import dataclasses
 import random
 import sqlite3
 from pathlib import Path
@@ -7,9 +8,13 @@ import aiosqlite
 import pytest
 
 from chia.consensus.blockchain import Blockchain
-from chia.full_node.block_store import BlockStore
+from chia.full_node.block_store import BlockStore, join_block_bytes, split_block_bytes
 from chia.full_node.coin_store import CoinStore
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
 from chia.util.db_wrapper import DBWrapper
+from chia.util.generator_tools import get_block_header
+from chia.util.ints import uint32
 from tests.setup_nodes import bt, test_constants
 
 
@@ -59,6 +64,18 @@ class TestBlockStore:
                 await store.set_peak(block_record.header_hash)
                 await store.set_peak(block_record.header_hash)
 
+            # Blocks which are not cached are returned as lazy views
+            for block in blocks:
+                store.rollback_cache_block(block.header_hash)
+                lazy_block = await store.get_full_block_lazy(block.header_hash)
+                assert lazy_block is not None
+                assert lazy_block.header_hash == block.header_hash
+                assert lazy_block.height == block.height
+                assert lazy_block.is_transaction_block() == block.is_transaction_block()
+                assert lazy_block.transactions_generator == block.transactions_generator
+                assert lazy_block.get_full() == block
+            assert await store.get_full_block_lazy(bytes32([0] * 32)) is None
+
             assert len(await store.get_full_blocks_at([1])) == 1
             assert len(await store.get_full_blocks_at([0])) == 1
             assert len(await store.get_full_blocks_at([100])) == 0
@@ -124,3 +141,231 @@ class TestBlockStore:
         await connection_2.close()
         db_filename.unlink()
         db_filename_2.unlink()
+
+    @pytest.mark.asyncio
+    async def test_main_chain_index(self):
+        blocks = bt.get_consecutive_blocks(10)
+        db_filename = Path("blockchain_test.db")
+
+        if db_filename.exists():
+            db_filename.unlink()
+
+        connection = await aiosqlite.connect(db_filename)
+        db_wrapper = DBWrapper(connection)
+        try:
+            coin_store = await CoinStore.create(db_wrapper)
+            store = await BlockStore.create(db_wrapper)
+            bc = await Blockchain.create(coin_store, store, test_constants)
+            height_to_hash, sub_epoch_summaries = await store.get_peak_height_dicts()
+            assert len(height_to_hash) == 0 and sub_epoch_summaries == {}
+
+            for block in blocks:
+                await bc.receive_block(block)
+            height_to_hash, _ = await store.get_peak_height_dicts()
+            assert bytes(height_to_hash.view(0, len(height_to_hash))) == b"".join(b.header_hash for b in blocks)
+
+            # A heavier fork replaces the blocks above the fork point
+            fork_blocks = bt.get_consecutive_blocks(8, blocks[:5], seed=b"fork")
+            for block in fork_blocks[5:]:
+                await bc.receive_block(block)
+            assert bc.get_peak().header_hash == fork_blocks[-1].header_hash
+            height_to_hash, _ = await store.get_peak_height_dicts()
+            chain = b"".join(block.header_hash for block in fork_blocks)
+            assert bytes(height_to_hash.view(0, len(height_to_hash))) == chain
+
+            # The records can start below the fork point, if the blockchain was given a fork point that is too high
+            await store.set_main_chain(
+                len(fork_blocks) - 2, [bc.block_record(block.header_hash) for block in fork_blocks[3:]]
+            )
+            await connection.commit()
+            height_to_hash, _ = await store.get_peak_height_dicts()
+            assert bytes(height_to_hash.view(0, len(height_to_hash))) == chain
+
+            # A database without the index, like one written by an older version, gets it rebuilt
+            cursor = await connection.execute("DELETE FROM main_chain")
+            await cursor.close()
+            await connection.commit()
+            height_to_hash, sub_epoch_summaries = await store.get_peak_height_dicts()
+            assert bytes(height_to_hash.view(0, len(height_to_hash))) == chain
+            assert sub_epoch_summaries == {}
+            cursor = await connection.execute("SELECT COUNT(*) FROM main_chain")
+            assert (await cursor.fetchone())[0] == len(fork_blocks)
+            await cursor.close()
+        finally:
+            await connection.close()
+            db_filename.unlink()
+
+    @pytest.mark.asyncio
+    async def test_block_record_cache(self):
+        blocks = bt.get_consecutive_blocks(10)
+        db_filename = Path("blockchain_test.db")
+
+        if db_filename.exists():
+            db_filename.unlink()
+
+        connection = await aiosqlite.connect(db_filename)
+        db_wrapper = DBWrapper(connection)
+        try:
+            coin_store = await CoinStore.create(db_wrapper)
+            store = await BlockStore.create(db_wrapper, block_record_cache_size=4)
+            bc = await Blockchain.create(coin_store, store, test_constants)
+            for block in blocks:
+                await bc.receive_block(block)
+            records = [bc.block_record(block.header_hash) for block in blocks]
+            assert list(store.block_record_cache.cache.values()) == records[-4:]
+
+            # Records which are not cached are read from the database in one query, and cached
+            hits, misses = store.block_record_cache.hits, store.block_record_cache.misses
+            assert await store.get_block_records_by_hash([r.header_hash for r in records[4:8]]) == records[4:8]
+            assert store.block_record_cache.hits == hits + 2
+            assert store.block_record_cache.misses == misses + 2
+            assert list(store.block_record_cache.cache.values()) == records[6:8] + records[4:6]
+            assert await store.get_block_record(records[0].header_hash) == records[0]
+            assert store.block_record_cache.get(records[0].header_hash) == records[0]
+
+            # Records dropped by the blockchain are kept by the store, the most recent ones last
+            bc.clean_block_record(5)
+            assert not bc.contains_block(records[5].header_hash)
+            assert list(store.block_record_cache.cache.values()) == records[2:6]
+            assert await bc.get_block_records_at([uint32(h) for h in range(10)]) == records
+
+            store.rollback_cache_block(records[5].header_hash)
+            assert store.block_record_cache.get(records[5].header_hash) is None
+        finally:
+            await connection.close()
+            db_filename.unlink()
+
+    @pytest.mark.asyncio
+    async def test_get_generators(self):
+        blocks = bt.get_consecutive_blocks(3)
+        wt = bt.get_pool_wallet_tool()
+        coin = list(blocks[-1].get_included_reward_coins())[0]
+        tx = wt.generate_signed_transaction(10, wt.get_new_puzzlehash(), coin)
+        blocks = bt.get_consecutive_blocks(
+            1, block_list_input=blocks, guarantee_transaction_block=True, transaction_data=tx
+        )
+        assert blocks[-1].transactions_generator is not None
+        db_filename = Path("blockchain_test.db")
+
+        if db_filename.exists():
+            db_filename.unlink()
+
+        connection = await aiosqlite.connect(db_filename)
+        db_wrapper = DBWrapper(connection)
+        try:
+            coin_store = await CoinStore.create(db_wrapper)
+            store = await BlockStore.create(db_wrapper)
+            bc = await Blockchain.create(coin_store, store, test_constants)
+            for block in blocks:
+                await bc.receive_block(block)
+
+            hashes = [block.header_hash for block in blocks]
+            expected = [block.transactions_generator for block in blocks]
+            assert await store.get_generators_by_hash(hashes) == expected
+            # Also read from the database
+            for block in blocks:
+                store.rollback_cache_block(block.header_hash)
+            assert await store.get_generators_by_hash(hashes + hashes[-1:]) == expected + expected[-1:]
+            assert store.generator_cache.get(hashes[-1]) == expected[-1]
+
+            with pytest.raises(ValueError):
+                await store.get_generators_by_hash([bytes32([0] * 32)])
+        finally:
+            await connection.close()
+            db_filename.unlink()
+
+    @pytest.mark.asyncio
+    async def test_blocks_without_generator(self):
+        blocks = bt.get_consecutive_blocks(3)
+        wt = bt.get_pool_wallet_tool()
+        coin = list(blocks[-1].get_included_reward_coins())[0]
+        tx = wt.generate_signed_transaction(10, wt.get_new_puzzlehash(), coin)
+        blocks = bt.get_consecutive_blocks(
+            1, block_list_input=blocks, guarantee_transaction_block=True, transaction_data=tx
+        )
+        block = blocks[-1]
+        assert block.transactions_generator is not None
+        block_bytes, generator_bytes = split_block_bytes(block)
+        assert FullBlock.from_bytes(block_bytes) == dataclasses.replace(block, transactions_generator=None)
+        assert join_block_bytes(block_bytes, generator_bytes) == bytes(block)
+        db_filename = Path("blockchain_test.db")
+
+        if db_filename.exists():
+            db_filename.unlink()
+
+        connection = await aiosqlite.connect(db_filename)
+        db_wrapper = DBWrapper(connection)
+        try:
+            coin_store = await CoinStore.create(db_wrapper)
+            store = await BlockStore.create(db_wrapper)
+            bc = await Blockchain.create(coin_store, store, test_constants)
+            for b in blocks:
+                await bc.receive_block(b)
+
+            store.rollback_cache_block(block.header_hash)
+            for _ in range(2):
+                # The first time from the database, then from the cache
+                stripped = await store.get_full_block(block.header_hash, include_generator=False)
+                assert stripped == dataclasses.replace(block, transactions_generator=None)
+                assert await store.get_blocks_by_hash([block.header_hash], include_generator=False) == [stripped]
+                assert await store.get_full_blocks_at([block.height], include_generator=False) == [stripped]
+                assert await store.get_full_block_bytes(block.header_hash) == bytes(block)
+                assert await store.get_full_block(block.header_hash) == block
+            store.rollback_cache_block(block.header_hash)
+            assert (await store.get_full_block_lazy(block.header_hash)).get_full() == block
+
+            # Blocks of older versions have their generator inline
+            cursor = await connection.execute(
+                "UPDATE full_blocks SET block=?, stripped_block=NULL, generator=NULL WHERE header_hash=?",
+                (bytes(block), block.header_hash.hex()),
+            )
+            await cursor.close()
+            await connection.commit()
+            store.rollback_cache_block(block.header_hash)
+            assert await store.get_full_block(block.header_hash, include_generator=False) == stripped
+            assert await store.get_generators_by_hash([block.header_hash]) == [block.transactions_generator]
+            assert await store.get_full_block(block.header_hash) == block
+        finally:
+            await connection.close()
+            db_filename.unlink()
+
+    @pytest.mark.asyncio
+    async def test_header_blocks(self):
+        blocks = bt.get_consecutive_blocks(3)
+        wt = bt.get_pool_wallet_tool()
+        coin = list(blocks[-1].get_included_reward_coins())[0]
+        tx = wt.generate_signed_transaction(10, wt.get_new_puzzlehash(), coin)
+        blocks = bt.get_consecutive_blocks(
+            2, block_list_input=blocks, guarantee_transaction_block=True, transaction_data=tx
+        )
+        db_filename = Path("blockchain_test.db")
+
+        if db_filename.exists():
+            db_filename.unlink()
+
+        connection = await aiosqlite.connect(db_filename)
+        db_wrapper = DBWrapper(connection)
+        try:
+            coin_store = await CoinStore.create(db_wrapper)
+            store = await BlockStore.create(db_wrapper)
+            bc = await Blockchain.create(coin_store, store, test_constants)
+            for block in blocks:
+                await bc.receive_block(block)
+
+            header_hashes = [block.header_hash for block in blocks]
+            stored = await store.get_header_blocks_bytes(header_hashes)
+            assert set(stored.keys()) == set(header_hashes)
+            for block in blocks:
+                tx_removals, tx_additions = await bc.get_tx_removals_and_additions(block)
+                assert stored[block.header_hash] == bytes(get_block_header(block, tx_additions, tx_removals))
+            from_stored = await bc.get_header_blocks_in_range(0, len(blocks) - 1)
+
+            # Blocks added by older versions have no stored header block, these are built from the full blocks
+            cursor = await connection.execute("DELETE FROM header_blocks")
+            await cursor.close()
+            await connection.commit()
+            assert await store.get_header_blocks_bytes(header_hashes) == {}
+            assert await bc.get_header_blocks_in_range(0, len(blocks) - 1) == from_stored
+        finally:
+            await connection.close()
+            db_filename.unlink()
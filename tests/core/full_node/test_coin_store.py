@@ -10,13 +10,14 @@ from chia.consensus.block_rewards import calculate_base_farmer_reward, calculate
 from chia.consensus.blockchain import Blockchain, ReceiveBlockResult
 from chia.consensus.coinbase import create_farmer_coin, create_pool_coin
 from chia.full_node.block_store import BlockStore
-from chia.full_node.coin_store import CoinStore
+from chia.full_node.coin_store import CoinStore, migrate_coin_records
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions
 from chia.types.blockchain_format.coin import Coin
 from chia.types.coin_record import CoinRecord
 from chia.types.full_block import FullBlock
 from chia.types.generator_types import BlockGenerator
 from chia.util.generator_tools import tx_removals_and_additions
+from chia.util.hash import std_hash
 from chia.util.ints import uint64, uint32
 from chia.util.wallet_tools import WalletTool
 from chia.util.db_wrapper import DBWrapper
@@ -159,9 +160,9 @@ class TestCoinStore:
                     records = [await coin_store.get_coin_record(coin.name()) for coin in coins]
 
                     for record in records:
-                        await coin_store._set_spent(record.coin.name(), block.height)
+                        await coin_store._set_spent([record.coin.name()], block.height)
                         with pytest.raises(AssertionError):
-                            await coin_store._set_spent(record.coin.name(), block.height)
+                            await coin_store._set_spent([record.coin.name()], block.height)
 
                     records = [await coin_store.get_coin_record(coin.name()) for coin in coins]
                     for record in records:
@@ -171,6 +172,62 @@ class TestCoinStore:
             await connection.close()
             Path("fndb_test.db").unlink()
 
+    @pytest.mark.asyncio
+    async def test_set_spent_rolled_back(self):
+        blocks = bt.get_consecutive_blocks(3, guarantee_transaction_block=True)
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        db_wrapper = DBWrapper(connection)
+        coin_store = await CoinStore.create(db_wrapper)
+        for block in blocks:
+            await coin_store.new_block(block, [], [])
+        await connection.commit()
+        names = [coin.name() for coin in blocks[-1].get_included_reward_coins()]
+        assert not any(record.spent for record in await coin_store.get_coin_records(names))
+
+        # A block that fails after spending the coins must not leave them spent in the cache
+        async with db_wrapper.lock:
+            await db_wrapper.begin_transaction()
+            await coin_store._set_spent(names, uint32(blocks[-1].height + 1))
+            await db_wrapper.rollback_transaction()
+        assert not any(record.spent for record in await coin_store.get_coin_records(names))
+
+        await connection.close()
+        db_path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_reader_during_block_transaction(self):
+        blocks = bt.get_consecutive_blocks(3, guarantee_transaction_block=True)
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        db_wrapper = DBWrapper(connection)
+        coin_store = await CoinStore.create(db_wrapper)
+        for block in blocks:
+            await coin_store.new_block(block, [], [])
+        await connection.commit()
+        await db_wrapper.open_readers(db_path, 1)
+        name = list(blocks[-1].get_included_reward_coins())[0].name()
+
+        async with db_wrapper.lock:
+            await db_wrapper.begin_transaction()
+            await coin_store._set_spent([name], uint32(blocks[-1].height + 1))
+            # Another task only sees the committed, unspent record, which must not be cached
+            record = await asyncio.create_task(coin_store.get_coin_record(name))
+            assert not record.spent
+            records = await asyncio.create_task(coin_store.get_coin_records([name]))
+            assert not records[0].spent
+            await db_wrapper.commit_transaction()
+        assert (await coin_store.get_coin_record(name)).spent
+        assert (await asyncio.create_task(coin_store.get_coin_record(name))).spent
+
+        await db_wrapper.close_readers()
+        await connection.close()
+        db_path.unlink()
+
     @pytest.mark.asyncio
     async def test_rollback(self):
         blocks = bt.get_consecutive_blocks(20)
@@ -193,7 +250,7 @@ class TestCoinStore:
                     ]
 
                     for record in records:
-                        await coin_store._set_spent(record.coin.name(), block.height)
+                        await coin_store._set_spent([record.coin.name()], block.height)
 
                     records: List[Optional[CoinRecord]] = [
                         await coin_store.get_coin_record(coin.name()) for coin in coins
@@ -323,3 +380,142 @@ class TestCoinStore:
             await connection.close()
             Path("blockchain_test.db").unlink()
             b.shut_down()
+
+    @pytest.mark.asyncio
+    async def test_migrate_legacy_schema(self):
+        blocks = bt.get_consecutive_blocks(10, guarantee_transaction_block=True)
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        await connection.execute(
+            "CREATE TABLE coin_record(coin_name text PRIMARY KEY, confirmed_index bigint, spent_index bigint,"
+            " spent int, coinbase int, puzzle_hash text, coin_parent text, amount blob, timestamp bigint)"
+        )
+        await connection.execute("CREATE INDEX coin_puzzle_hash on coin_record(puzzle_hash)")
+        records: List[CoinRecord] = []
+        for block in blocks:
+            for coin in block.get_included_reward_coins():
+                records.append(CoinRecord(coin, block.height, uint32(0), False, True, uint64(1000)))
+        # The largest amounts don't fit into a signed SQLite integer
+        big_coin = Coin(blocks[-1].header_hash, 32 * b"1", uint64(2 ** 64 - 1))
+        records.append(CoinRecord(big_coin, uint32(9), uint32(10), True, False, uint64(1000)))
+        for record in records:
+            await connection.execute(
+                "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.coin.name().hex(),
+                    record.confirmed_block_index,
+                    record.spent_block_index,
+                    int(record.spent),
+                    int(record.coinbase),
+                    record.coin.puzzle_hash.hex(),
+                    record.coin.parent_coin_info.hex(),
+                    bytes(record.coin.amount),
+                    record.timestamp,
+                ),
+            )
+        await connection.commit()
+
+        # The records are moved in the background, in small batches so that both tables are read meanwhile
+        db_wrapper = DBWrapper(connection)
+        coin_store = await CoinStore.create(db_wrapper, cache_size=uint32(0), migration_batch_size=3)
+        assert coin_store.migrating
+        for record in records:
+            assert await coin_store.get_coin_record(record.coin.name()) == record
+        assert len(await coin_store.get_coin_records([record.coin.name() for record in records])) == len(records)
+        assert await coin_store.get_coin_records_by_puzzle_hash(True, 32 * b"1") == [records[-1]]
+
+        # Records which are not migrated yet are spent and rolled back too
+        unspent = [record.coin.name() for record in records[:-1]]
+        async with db_wrapper.lock:
+            await coin_store._set_spent(unspent, uint32(11))
+            await db_wrapper.commit_transaction()
+        assert len(await coin_store.get_coins_removed_at_height(uint32(11))) == len(unspent)
+        async with db_wrapper.lock:
+            await coin_store.rollback_to_block(10)
+            await db_wrapper.commit_transaction()
+
+        await coin_store.migration_task
+        assert not coin_store.migrating
+        for record in records:
+            assert await coin_store.get_coin_record(record.coin.name()) == record
+        assert await coin_store.get_coin_records_by_puzzle_hash(True, 32 * b"1") == [records[-1]]
+        assert await coin_store.get_coins_removed_at_height(uint32(10)) == [records[-1]]
+
+        # The emptied legacy table is dropped on the next startup, along with the indexes of older versions
+        coin_store = await CoinStore.create(DBWrapper(connection), cache_size=uint32(0))
+        assert not coin_store.migrating
+        cursor = await connection.execute("SELECT name FROM sqlite_master WHERE name='coin_record_legacy'")
+        assert await cursor.fetchone() is None
+        await cursor.close()
+        cursor = await connection.execute("SELECT name FROM sqlite_master WHERE name='coin_puzzle_hash'")
+        assert await cursor.fetchone() is None
+        await cursor.close()
+        cursor = await connection.execute("SELECT tbl_name FROM sqlite_master WHERE name='coin_record_puzzle_hash'")
+        assert await cursor.fetchone() == ("coin_record",)
+        await cursor.close()
+
+        await connection.close()
+        db_path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_migrate_in_batches(self):
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        await connection.execute(
+            "CREATE TABLE coin_record(coin_name text PRIMARY KEY, confirmed_index bigint, spent_index bigint,"
+            " spent int, coinbase int, puzzle_hash text, coin_parent text, amount blob, timestamp bigint)"
+        )
+        coins = [Coin(32 * bytes([i]), 32 * b"2", uint64(i)) for i in range(25)]
+        await connection.executemany(
+            "INSERT INTO coin_record VALUES(?, 1, 0, 0, 0, ?, ?, ?, 1000)",
+            [
+                (coin.name().hex(), coin.puzzle_hash.hex(), coin.parent_coin_info.hex(), bytes(coin.amount))
+                for coin in coins
+            ],
+        )
+        await connection.commit()
+
+        assert await migrate_coin_records(connection, batch_size=10) == 25
+        assert await migrate_coin_records(connection, batch_size=10) == 0
+        cursor = await connection.execute("SELECT coin_name, amount from coin_record ORDER BY amount")
+        assert await cursor.fetchall() == [(coin.name(), coin.amount) for coin in coins]
+        await cursor.close()
+
+        await connection.close()
+        db_path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_get_coin_records(self):
+        blocks = bt.get_consecutive_blocks(10, guarantee_transaction_block=True)
+
+        for cache_size in [0, 10, 100000]:
+            db_path = Path("fndb_test.db")
+            if db_path.exists():
+                db_path.unlink()
+            connection = await aiosqlite.connect(db_path)
+            db_wrapper = DBWrapper(connection)
+            coin_store = await CoinStore.create(db_wrapper, cache_size=uint32(cache_size))
+
+            coins: List[Coin] = []
+            for block in blocks:
+                await coin_store.new_block(block, [], [])
+                coins.extend(block.get_included_reward_coins())
+            expected = {coin.name(): await coin_store.get_coin_record(coin.name()) for coin in coins}
+            assert len(expected) > 0 and None not in expected.values()
+
+            # More names than fit into one query, most of them unknown
+            unknown = [std_hash(i.to_bytes(4, "big")) for i in range(2000)]
+            names = unknown[:1000] + list(expected.keys()) + unknown[1000:]
+            records = await coin_store.get_coin_records(names)
+            assert {record.name: record for record in records} == expected
+            assert len(records) == len(expected)
+
+            assert await coin_store.get_coin_records([]) == []
+            assert await coin_store.get_coin_records(unknown[:3]) == []
+
+            await connection.close()
+            db_path.unlink()
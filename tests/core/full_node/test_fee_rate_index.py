@@ -0,0 +1,85 @@
+import random
+
+import pytest
+from blspy import G2Element
+
+from chia.consensus.cost_calculator import NPCResult
+from chia.full_node.fee_rate_index import FeeRateIndex
+from chia.full_node.mempool import Mempool
+from chia.types.blockchain_format.program import SerializedProgram
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.mempool_item import MempoolItem
+from chia.types.spend_bundle import SpendBundle
+from chia.util.ints import uint64
+
+
+def make_item(index: int, fee: int, cost: int) -> MempoolItem:
+    return MempoolItem(
+        SpendBundle([], G2Element()),
+        uint64(fee),
+        NPCResult(None, [], uint64(0)),
+        uint64(cost),
+        bytes32(index.to_bytes(32, "big")),
+        [],
+        [],
+        SerializedProgram.from_bytes(b"\x80"),
+    )
+
+
+def walk_min_fee_rate(mempool: Mempool, cost: int) -> float:
+    current_cost = mempool.total_mempool_cost
+    for fee_per_cost, spends_with_fpc in mempool.sorted_spends.items():
+        for item in spends_with_fpc.values():
+            current_cost -= item.cost
+            if current_cost + cost <= mempool.max_size_in_cost:
+                return fee_per_cost
+    raise ValueError("Does not fit")
+
+
+class TestFeeRateIndex:
+    def test_fee_rate_index(self):
+        rng = random.Random(1)
+        index = FeeRateIndex()
+        entries = []
+        for _ in range(1000):
+            fee_per_cost = rng.choice([0.0, rng.random(), rng.expovariate(0.01), 1e15])
+            cost = rng.randint(1, 1000)
+            entries.append((fee_per_cost, cost))
+            index.add(fee_per_cost, cost)
+        for _ in range(300):
+            fee_per_cost, cost = entries.pop(rng.randrange(len(entries)))
+            index.remove(fee_per_cost, cost)
+
+        bucket_costs = [0] * FeeRateIndex.NUM_BUCKETS
+        for fee_per_cost, cost in entries:
+            bucket = FeeRateIndex.bucket(fee_per_cost)
+            low, high = FeeRateIndex.bucket_range(bucket)
+            assert low <= fee_per_cost < high
+            bucket_costs[bucket] += cost
+        for bucket in range(FeeRateIndex.NUM_BUCKETS + 1):
+            assert index.cost_below(bucket) == sum(bucket_costs[:bucket])
+        total = sum(bucket_costs)
+        for cost in [1, total // 3, total - 1, total]:
+            bucket = index.find_bucket(cost)
+            assert sum(bucket_costs[: bucket + 1]) >= cost
+            assert sum(bucket_costs[:bucket]) < cost
+        assert index.find_bucket(total + 1) == FeeRateIndex.NUM_BUCKETS
+        assert [cost for _, cost in index.bucket_costs()] == [cost for cost in bucket_costs if cost > 0]
+
+    def test_mempool_min_fee_rate(self):
+        rng = random.Random(2)
+        mempool = Mempool(100000)
+        for i in range(500):
+            cost = rng.randint(100, 2000)
+            item = make_item(i, rng.choice([0, rng.randint(0, 10 * cost), rng.randint(0, 100000 * cost)]), cost)
+            if mempool.at_full_capacity(cost) and item.fee_per_cost <= mempool.get_min_fee_rate(cost):
+                continue
+            mempool.add_to_pool(item, [], {})
+            assert mempool.total_mempool_cost <= mempool.max_size_in_cost
+            assert mempool.total_mempool_cost == mempool.fee_rate_index.cost_below(FeeRateIndex.NUM_BUCKETS)
+            for new_cost in [1, 1000, 20000, mempool.max_size_in_cost]:
+                assert mempool.get_min_fee_rate(new_cost) == (
+                    walk_min_fee_rate(mempool, new_cost) if mempool.at_full_capacity(new_cost) else 0
+                )
+        with pytest.raises(ValueError):
+            mempool.get_min_fee_rate(mempool.max_size_in_cost + 1)
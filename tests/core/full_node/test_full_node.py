@@ -772,8 +772,12 @@ class TestFullNodeProtocol:
                 condition_dic=conditions_dict,
             )
             assert spend_bundle is not None
-            cost_result = await full_node_1.full_node.mempool_manager.pre_validate_spendbundle(spend_bundle)
-            log.info(f"Cost result: {cost_result.clvm_cost}")
+            pre_validation = await full_node_1.full_node.mempool_manager.pre_validate_spendbundle(
+                spend_bundle, spend_bundle.name()
+            )
+            assert pre_validation is not None
+            npc_result, _, _ = pre_validation
+            log.info(f"Cost result: {npc_result.clvm_cost}")
 
             new_transaction = fnp.NewTransaction(spend_bundle.get_hash(), uint64(100), uint64(100))
 
@@ -6,10 +6,12 @@ from typing import Dict, List, Optional
 import pytest
 
 from chia.full_node.mempool import Mempool
+from chia.full_node.mempool_manager import MempoolManager
 from chia.protocols import full_node_protocol
 from chia.simulator.simulator_protocol import FarmNewBlockProtocol
 from chia.types.announcement import Announcement
 from chia.types.blockchain_format.coin import Coin
+from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.coin_solution import CoinSolution
 from chia.types.condition_opcodes import ConditionOpcode
 from chia.types.condition_with_args import ConditionWithArgs
@@ -259,6 +261,137 @@ class TestMempoolManager:
         self.assert_sb_not_in_pool(full_node_1, sb12)
         self.assert_sb_not_in_pool(full_node_1, sb3)
 
+    @pytest.mark.asyncio
+    async def test_new_peak_removes_spent_items(self, two_nodes):
+        reward_ph = WALLET_A.get_new_puzzlehash()
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        blocks = await full_node_1.get_all_full_blocks()
+        start_height = blocks[-1].height
+        blocks = bt.get_consecutive_blocks(
+            3,
+            block_list_input=blocks,
+            guarantee_transaction_block=True,
+            farmer_reward_puzzle_hash=reward_ph,
+            pool_reward_puzzle_hash=reward_ph,
+        )
+        peer = await connect_and_get_peer(server_1, server_2)
+
+        for block in blocks:
+            await full_node_1.full_node.respond_block(full_node_protocol.RespondBlock(block))
+        await time_out_assert(60, node_height_at_least, True, full_node_1, start_height + 3)
+
+        coins = iter(blocks[-1].get_included_reward_coins())
+        coin1, coin2 = next(coins), next(coins)
+        sb1 = await self.gen_and_send_sb(full_node_1, peer, coin1)
+        sb2 = await self.gen_and_send_sb(full_node_1, peer, coin2)
+        self.assert_sb_in_pool(full_node_1, sb1)
+        self.assert_sb_in_pool(full_node_1, sb2)
+
+        blocks = bt.get_consecutive_blocks(
+            1,
+            block_list_input=blocks,
+            guarantee_transaction_block=True,
+            transaction_data=sb1,
+        )
+        await full_node_1.full_node.respond_block(full_node_protocol.RespondBlock(blocks[-1]))
+        await time_out_assert(60, node_height_at_least, True, full_node_1, start_height + 4)
+
+        # The included item is removed, the other one is kept without being added again
+        self.assert_sb_not_in_pool(full_node_1, sb1)
+        self.assert_sb_in_pool(full_node_1, sb2)
+        assert not full_node_1.full_node.mempool_manager.seen(sb1.name())
+        mempool = full_node_1.full_node.mempool_manager.mempool
+        assert coin1.name() not in mempool.removals
+        assert coin2.name() in mempool.removals
+
+    @pytest.mark.asyncio
+    async def test_pre_validation_queue(self, two_nodes):
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        blocks = await full_node_1.get_all_full_blocks()
+        coins = iter(blocks[-1].get_included_reward_coins())
+        sb1 = generate_test_spend_bundle(next(coins))
+        sb2 = generate_test_spend_bundle(next(coins))
+        mempool_manager = full_node_1.full_node.mempool_manager
+        peer_1, peer_2 = bytes32(b"1" * 32), bytes32(b"2" * 32)
+
+        # The same spend bundle from two peers is only run once
+        results = await asyncio.gather(
+            mempool_manager.pre_validate_spendbundle(sb1, sb1.name(), peer_1),
+            mempool_manager.pre_validate_spendbundle(sb1, sb1.name(), peer_2),
+            mempool_manager.pre_validate_spendbundle(sb2, sb2.name(), peer_1),
+        )
+        assert results[0] is results[1]
+        npc_result, program, cost = results[0]
+        assert npc_result.error is None
+        assert cost > 0
+        assert results[2][2] > 0
+        assert mempool_manager.pending_validations == {}
+        assert mempool_manager.validation_queues == {}
+
+        # Spend bundles are dropped when too many are waiting
+        max_pending_validations = mempool_manager.max_pending_validations
+        mempool_manager.max_pending_validations = 1
+        try:
+            results = await asyncio.gather(
+                mempool_manager.pre_validate_spendbundle(sb1, sb1.name(), peer_1),
+                mempool_manager.pre_validate_spendbundle(sb2, sb2.name(), peer_2),
+            )
+            assert results[0] is not None
+            assert results[1] is None
+        finally:
+            mempool_manager.max_pending_validations = max_pending_validations
+
+    @pytest.mark.asyncio
+    async def test_bundle_fills_block(self, two_nodes):
+        reward_ph = WALLET_A.get_new_puzzlehash()
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        blocks = await full_node_1.get_all_full_blocks()
+        start_height = blocks[-1].height
+        blocks = bt.get_consecutive_blocks(
+            3,
+            block_list_input=blocks,
+            guarantee_transaction_block=True,
+            farmer_reward_puzzle_hash=reward_ph,
+            pool_reward_puzzle_hash=reward_ph,
+        )
+        peer = await connect_and_get_peer(server_1, server_2)
+
+        for block in blocks:
+            await full_node_1.full_node.respond_block(full_node_protocol.RespondBlock(block))
+        await time_out_assert(60, node_height_at_least, True, full_node_1, start_height + 3)
+
+        coins = list(blocks[-1].get_included_reward_coins()) + list(blocks[-2].get_included_reward_coins())
+        # The highest fee per cost, a larger item with a lower fee per cost, and a small item without fees
+        sb_high = await self.gen_and_send_sb(full_node_1, peer, coins[0], fee=uint64(2000000))
+        sb_large = SpendBundle.aggregate(
+            [
+                generate_test_spend_bundle(coins[1], fee=uint64(1000000)),
+                generate_test_spend_bundle(coins[2], fee=uint64(1000000)),
+            ]
+        )
+        await self.send_sb(full_node_1, peer, sb_large)
+        sb_low = await self.gen_and_send_sb(full_node_1, peer, coins[3])
+        items = [
+            full_node_1.full_node.mempool_manager.get_mempool_item(sb.name()) for sb in (sb_high, sb_large, sb_low)
+        ]
+        assert all(item is not None for item in items)
+        assert items[0].fee_per_cost > items[1].fee_per_cost > items[2].fee_per_cost
+
+        # Only the highest fee and the small item fit, the small item is included after the large one is skipped
+        mempool_manager = MempoolManager(full_node_1.full_node.coin_store, full_node_1.full_node.constants)
+        try:
+            mempool_manager.peak = full_node_1.full_node.mempool_manager.peak
+            for item in items:
+                mempool_manager.mempool.add_to_pool(item, item.additions, {coin.name(): coin for coin in item.removals})
+            max_block_cost = full_node_1.full_node.constants.MAX_BLOCK_COST_CLVM
+            mempool_manager.limit_factor = (items[0].cost + items[2].cost + 0.5) / max_block_cost
+            result = await mempool_manager.create_bundle_from_mempool(mempool_manager.peak.header_hash)
+        finally:
+            mempool_manager.shut_down()
+        assert result is not None
+        bundle, additions, removals = result
+        assert set(removals) == set(items[0].removals + items[2].removals)
+
     async def condition_tester(
         self,
         two_nodes,
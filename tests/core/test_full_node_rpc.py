@@ -90,6 +90,7 @@ class TestRpc:
             assert len(await client.get_unfinished_block_headers()) > 0
             assert len(await client.get_all_block(0, 2)) == 2
             state = await client.get_blockchain_state()
+            assert state["block_record_cache"]["capacity"] > 0
 
             block = await client.get_block(state["peak"].header_hash)
             assert block == blocks[-1]
@@ -141,6 +142,10 @@ class TestRpc:
 
             assert len(await client.get_all_mempool_items()) == 1
             assert len(await client.get_all_mempool_tx_ids()) == 1
+            fee_rates = await client.get_mempool_fee_rates(1000)
+            assert fee_rates["min_fee_rate"] == 0
+            assert fee_rates["mempool_cost"] > 0
+            assert fee_rates["fee_rate_buckets"] == [{"min_fee_rate": 0, "cost": fee_rates["mempool_cost"]}]
             assert (
                 SpendBundle.from_json_dict(list((await client.get_all_mempool_items()).values())[0]["spend_bundle"])
                 == spend_bundle
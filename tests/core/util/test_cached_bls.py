@@ -0,0 +1,37 @@
+import unittest
+
+from blspy import AugSchemeMPL, G1Element
+
+from chia.util import cached_bls
+from chia.util.lru_cache import LRUCache
+
+
+class TestCachedBLS(unittest.TestCase):
+    def test_cached_bls(self):
+        n_keys = 10
+        seed = b"a" * 31
+        sks = [AugSchemeMPL.key_gen(seed + bytes([i])) for i in range(n_keys)]
+        pks = [sk.get_g1() for sk in sks]
+
+        msgs = [("msg-%d" % (i,)).encode() for i in range(n_keys)]
+        sigs = [AugSchemeMPL.sign(sk, msg) for sk, msg in zip(sks, msgs)]
+        agg_sig = AugSchemeMPL.aggregate(sigs)
+
+        cache = LRUCache(n_keys)
+        # Nothing is cached, so the plain verification is used and the cache is not filled
+        assert cached_bls.aggregate_verify(pks, msgs, agg_sig, cache=cache)
+        assert len(cache.cache) == 0
+
+        # The pairings of half of the pairs are computed and cached
+        assert cached_bls.aggregate_verify(pks[:5], msgs[:5], AugSchemeMPL.aggregate(sigs[:5]), True, cache)
+        assert len(cache.cache) == 5
+
+        # Half of the pairings are cached, the other half are computed
+        assert cached_bls.aggregate_verify(pks, msgs, agg_sig, cache=cache)
+        assert len(cache.cache) == n_keys
+        assert cached_bls.aggregate_verify(pks, msgs, agg_sig, cache=cache)
+
+        # Cached pairings don't make a wrong signature valid
+        assert not cached_bls.aggregate_verify(pks, msgs, AugSchemeMPL.aggregate(sigs[1:]), cache=cache)
+        assert not cached_bls.aggregate_verify(pks[1:], msgs[1:], agg_sig, cache=cache)
+        assert not cached_bls.aggregate_verify([G1Element()] + pks[1:], msgs, agg_sig, True, cache)
@@ -0,0 +1,75 @@
+import asyncio
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from chia.util.db_wrapper import DBWrapper
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    loop = asyncio.get_event_loop()
+    yield loop
+
+
+async def count_rows(db_wrapper: DBWrapper) -> int:
+    async with db_wrapper.reader() as conn:
+        cursor = await conn.execute("SELECT COUNT(*) from test")
+        row = await cursor.fetchone()
+        await cursor.close()
+    return row[0]
+
+
+class TestDBWrapper:
+    @pytest.mark.asyncio
+    async def test_readers(self):
+        db_path = Path("db_wrapper_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        db_wrapper = DBWrapper(connection)
+        await connection.execute("pragma journal_mode=wal")
+        await connection.execute("CREATE TABLE test(value int)")
+        await connection.commit()
+
+        # Without readers, queries run on the writer
+        async with db_wrapper.reader() as conn:
+            assert conn is connection
+
+        await db_wrapper.open_readers(db_path, 2)
+        assert len(db_wrapper.readers) == 2
+        async with db_wrapper.reader() as conn:
+            assert conn in db_wrapper.readers
+            with pytest.raises(aiosqlite.OperationalError):
+                await conn.execute("INSERT INTO test VALUES(1)")
+
+        generation = db_wrapper.lock.generation
+        assert db_wrapper.lock.unchanged_since(generation)
+        async with db_wrapper.lock:
+            assert not db_wrapper.lock.unchanged_since(generation)
+            assert not db_wrapper.lock.unchanged_since(db_wrapper.lock.generation)
+            await db_wrapper.begin_transaction()
+            await connection.execute("INSERT INTO test VALUES(1)")
+            # The writer sees its own transaction, everyone else only what is committed
+            assert await count_rows(db_wrapper) == 1
+            assert await asyncio.create_task(count_rows(db_wrapper)) == 0
+            await db_wrapper.commit_transaction()
+        assert await count_rows(db_wrapper) == 1
+        # A write happened since
+        assert not db_wrapper.lock.unchanged_since(generation)
+
+        # Once all the readers are taken, queries wait for one to be returned
+        async with db_wrapper.reader() as conn_1:
+            async with db_wrapper.reader() as conn_2:
+                assert conn_1 is not conn_2
+                waiting = asyncio.create_task(count_rows(db_wrapper))
+                await asyncio.sleep(0.1)
+                assert not waiting.done()
+        assert await waiting == 1
+
+        await db_wrapper.close_readers()
+        async with db_wrapper.reader() as conn:
+            assert conn is connection
+        await connection.close()
+        db_path.unlink()
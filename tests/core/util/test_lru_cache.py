@@ -52,3 +52,22 @@ class TestLRUCache(unittest.TestCase):
         assert len(cache.cache) == 5
         assert cache.get(b"0") is None
         assert cache.get(b"1") == 1
+
+    def test_lru_cache_batches(self):
+        cache = LRUCache(3)
+        cache.put_many([(b"0", 0), (b"1", 1), (b"2", 2), (b"3", 3)])
+        assert list(cache.cache.items()) == [(b"1", 1), (b"2", 2), (b"3", 3)]
+
+        # Found keys are marked as recently used
+        assert cache.get_many([b"0", b"1"]) == {b"1": 1}
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.stats() == {"size": 3, "capacity": 3, "hits": 1, "misses": 1}
+        cache.put_many([(b"4", 4)])
+        assert list(cache.cache.keys()) == [b"3", b"1", b"4"]
+
+        cache.remove_many([b"1", b"5"])
+        assert list(cache.cache.keys()) == [b"3", b"4"]
+
+        empty = LRUCache(0)
+        empty.put_many([(b"0", 0)])
+        assert len(empty.cache) == 0
@@ -1,3 +1,4 @@
+import dataclasses
 import unittest
 from dataclasses import dataclass
 from typing import List, Optional, Tuple
@@ -12,10 +13,12 @@ from chia.types.blockchain_format.program import Program
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.full_block import FullBlock
 from chia.types.weight_proof import SubEpochChallengeSegment
-from chia.util.ints import uint8, uint32
+from chia.util.hash import std_hash
+from chia.util.ints import uint8, uint32, uint64
 from chia.util.streamable import (
     Streamable,
     streamable,
+    recurse_jsonify,
     parse_bool,
     parse_optional,
     parse_bytes,
@@ -23,6 +26,12 @@ from chia.util.streamable import (
     parse_tuple,
     parse_size_hints,
     parse_str,
+    stream_bool,
+    stream_bytes,
+    stream_list,
+    stream_optional,
+    stream_str,
+    stream_tuple,
 )
 from tests.setup_nodes import bt, test_constants
 
@@ -72,6 +81,36 @@ class TestStreamable(unittest.TestCase):
         dict_block = block.to_json_dict()
         assert FullBlock.from_json_dict(dict_block) == block
 
+    def test_json_matches_asdict(self):
+        blocks = bt.get_consecutive_blocks(5, guarantee_transaction_block=True)
+        for block in blocks:
+            dict_block = block.to_json_dict()
+            assert dict_block == recurse_jsonify(dataclasses.asdict(block))
+            assert FullBlock.from_json_dict(dict_block) == block
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassJson(Streamable):
+            a: uint64
+            b: Tuple[uint32, str, bytes]
+            c: Optional[Program]
+
+        tc = TestClassJson(uint64(2 ** 64 - 1), (uint32(3), "hello", b"goodbye"), Program.to([1, 2]))
+        json_dict = tc.to_json_dict()
+        assert json_dict == recurse_jsonify(dataclasses.asdict(tc))
+        assert type(json_dict["a"]) is int
+        assert json_dict["b"] == [3, "hello", "0x" + b"goodbye".hex()]
+        assert TestClassJson.from_json_dict(json_dict) == tc
+
+        with raises(KeyError):
+            TestClassJson.from_json_dict({"a": 1, "b": [3, "hello", "0x00"]})
+        with raises(KeyError):
+            TestClassJson.from_json_dict({**json_dict, "d": 1})
+        with raises(ValueError):
+            TestClassJson.from_json_dict({**json_dict, "a": 2 ** 64})
+        with raises(ValueError):
+            TestClassJson.from_json_dict({**json_dict, "b": [3, "hello"]})
+
     def test_recursive_json(self):
         @dataclass(frozen=True)
         @streamable
@@ -343,6 +382,133 @@ class TestStreamable(unittest.TestCase):
         with raises(AssertionError):
             parse_str(io.BytesIO(b"\x00\x00\x02\x01" + b"a" * 512))
 
+    def test_stream_helpers(self):
+        f = io.BytesIO()
+        stream_bool(True, f)
+        stream_optional(stream_bool, None, f)
+        stream_optional(stream_bool, False, f)
+        stream_bytes(b"\xff", f)
+        stream_str("a", f)
+        stream_list(stream_bool, [True, False], f)
+        stream_tuple([stream_bool, stream_str], (False, ""), f)
+        assert f.getvalue() == (
+            b"\x01" + b"\x00" + b"\x01\x00" + b"\x00\x00\x00\x01\xff" + b"\x00\x00\x00\x01a"
+            b"\x00\x00\x00\x02\x01\x00" + b"\x00\x00\x00\x00\x00"
+        )
+
+        # lists must be lists, and tuples must have the right number of elements
+        with raises(AssertionError):
+            stream_list(stream_bool, (True,), io.BytesIO())
+
+        with raises(AssertionError):
+            stream_tuple([stream_bool, stream_bool], (True,), io.BytesIO())
+
+    def test_stream_parse_round_trip(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassInner(Streamable):
+            a: List[uint32]
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassOuter(Streamable):
+            a: Optional[TestClassInner]
+            b: List[Tuple[uint8, bytes32]]
+            c: bool
+            d: str
+
+        obj = TestClassOuter(TestClassInner([uint32(7)]), [(uint8(1), bytes32([3] * 32))], False, "x")
+        assert TestClassOuter.from_bytes(bytes(obj)) == obj
+        assert bytes(TestClassOuter.from_bytes(bytes(obj))) == bytes(obj)
+
+    def test_lazy_from_bytes(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassInner(Streamable):
+            a: List[uint32]
+            b: str
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassLazy(Streamable):
+            a: Optional[TestClassInner]
+            b: List[Tuple[uint8, bytes32]]
+            c: bool
+            d: uint32
+
+            @property
+            def double_d(self):
+                return self.d * 2
+
+            def get_d(self):
+                return self.d
+
+        obj = TestClassLazy(TestClassInner([uint32(1), uint32(2)], "x"), [(uint8(1), bytes32([3] * 32))], True, 9)
+        lazy = TestClassLazy.lazy_from_bytes(bytes(obj))
+
+        # Only the fields up to the one accessed are scanned
+        assert lazy.c is True
+        assert lazy._offsets == [0, 18, 55, 56]
+        assert lazy.d == 9
+        assert lazy.double_d == 18
+        assert lazy.get_d() == 9
+        assert lazy.a == obj.a
+        assert lazy.b == obj.b
+        assert lazy.get_hash() == obj.get_hash()
+        assert lazy.get_full() == obj
+        assert bytes(lazy) == bytes(obj)
+
+        with raises(AttributeError):
+            lazy.e
+
+        lazy = TestClassLazy.lazy_from_bytes(bytes(obj))
+        assert lazy.field_offset("c") == 55
+        assert lazy._offsets == [0, 18, 55]
+        with raises(AttributeError):
+            lazy.field_offset("e")
+
+        # Data past the accessed fields is only checked when decoding everything
+        lazy = TestClassLazy.lazy_from_bytes(bytes(obj)[:-1])
+        assert lazy.c is True
+        with raises(AssertionError):
+            lazy.d
+        with raises(AssertionError):
+            lazy.get_full()
+
+    def test_cache_serialization(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassCached(Streamable):
+            a: uint32
+            b: List[uint32]
+
+            CACHE_SERIALIZATION = True
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClassContainer(Streamable):
+            a: TestClassCached
+
+        obj = TestClassCached(uint32(1), [uint32(2)])
+        blob = bytes(obj)
+        assert bytes(obj) is blob
+        assert obj.get_hash() is obj.get_hash()
+        assert obj.get_hash() == std_hash(blob)
+
+        # Objects parsed from bytes keep them
+        parsed = TestClassCached.from_bytes(blob)
+        assert bytes(parsed) is blob
+        assert parsed == obj
+
+        # Cached bytes are used when streaming the object inside another one
+        container = TestClassContainer(parsed)
+        assert TestClassContainer.from_bytes(bytes(container)) == container
+
+        # Replacing a field creates a new object, with nothing cached
+        replaced = dataclasses.replace(obj, a=uint32(3))
+        assert replaced.get_hash() != obj.get_hash()
+        assert TestClassCached.from_bytes(bytes(replaced)).a == 3
+
 
 if __name__ == "__main__":
     unittest.main()
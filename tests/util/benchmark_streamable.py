@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Any, Callable, List
+
+from chia.consensus.block_record import BlockRecord
+from chia.types.full_block import FullBlock
+from chia.types.header_block import HeaderBlock
+from tests.core.full_node.ram_db import create_ram_blockchain
+from tests.setup_nodes import bt, test_constants
+
+
+def benchmark_round_trips(name: str, klass: Any, objects: List[Any], repeat: int) -> None:
+    blobs = [bytes(o) for o in objects]
+
+    def parse_all():
+        for blob in blobs:
+            klass.from_bytes(blob)
+
+    def stream_all():
+        for o in objects:
+            bytes(o)
+
+    json_dicts = [o.to_json_dict() for o in objects]
+
+    def from_json_all():
+        for json_dict in json_dicts:
+            klass.from_json_dict(json_dict)
+
+    def to_json_all():
+        for o in objects:
+            o.to_json_dict()
+
+    parse_time = time_repeated(parse_all, repeat)
+    stream_time = time_repeated(stream_all, repeat)
+    from_json_time = time_repeated(from_json_all, repeat)
+    to_json_time = time_repeated(to_json_all, repeat)
+    count = len(objects) * repeat
+    print(f"{name}: {len(objects)} objects, {sum(len(b) for b in blobs) // len(blobs)} bytes on average")
+    print(f"  from_bytes: {parse_time:.3f}s total, {parse_time * 1000000 / count:.1f}us per object")
+    print(f"  __bytes__:  {stream_time:.3f}s total, {stream_time * 1000000 / count:.1f}us per object")
+    print(f"  from_json_dict: {from_json_time:.3f}s total, {from_json_time * 1000000 / count:.1f}us per object")
+    print(f"  to_json_dict:   {to_json_time:.3f}s total, {to_json_time * 1000000 / count:.1f}us per object")
+
+
+def time_repeated(func: Callable[[], None], repeat: int) -> float:
+    start = time.time()
+    for _ in range(repeat):
+        func()
+    return time.time() - start
+
+
+async def main(num_blocks: int = 200, repeat: int = 20) -> None:
+    """
+    Measures serialization and JSON round trips of the objects that dominate block sync and BlockStore reads. Run
+    this on two revisions to compare the streamable implementations.
+    """
+    blocks: List[FullBlock] = bt.get_consecutive_blocks(num_blocks, guarantee_transaction_block=True)
+    connection, blockchain = await create_ram_blockchain(test_constants)
+    try:
+        for block in blocks:
+            _, error, _ = await blockchain.receive_block(block)
+            assert error is None
+        header_blocks: List[HeaderBlock] = list(
+            (await blockchain.get_header_blocks_in_range(0, num_blocks - 1, tx_filter=False)).values()
+        )
+        block_records: List[BlockRecord] = [blockchain.block_record(block.header_hash) for block in blocks]
+    finally:
+        await connection.close()
+        blockchain.shut_down()
+
+    benchmark_round_trips("FullBlock", FullBlock, blocks, repeat)
+    benchmark_round_trips("HeaderBlock", HeaderBlock, header_blocks, repeat)
+    benchmark_round_trips("BlockRecord", BlockRecord, block_records, repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
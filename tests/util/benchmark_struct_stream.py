@@ -0,0 +1,54 @@
+import io
+import random
+import time
+from typing import Any, Callable, List
+
+from chia.util.ints import int8, int16, int32, int64, uint8, uint16, uint32, uint64, uint128
+
+
+def time_per_call(func: Callable[[], Any], count: int) -> float:
+    start = time.time()
+    func()
+    return (time.time() - start) * 1000000000 / count
+
+
+def benchmark_type(klass: Any, count: int) -> None:
+    size = len(bytes(klass(0)))
+    values: List[int] = [random.randrange(0, 2 ** (size * 8 - 1)) for _ in range(count)]
+    ints: List[Any] = [klass(v) for v in values]
+    blob = b"".join(bytes(i) for i in ints)
+
+    def construct() -> None:
+        for v in values:
+            klass(v)
+
+    def parse() -> None:
+        f = io.BytesIO(blob)
+        for _ in range(count):
+            klass.parse(f)
+
+    def stream() -> None:
+        f = io.BytesIO()
+        for i in ints:
+            i.stream(f)
+
+    print(f"{klass.__name__}:")
+    print(f"  __new__:    {time_per_call(construct, count):.0f}ns per value")
+    print(f"  parse:      {time_per_call(parse, count):.0f}ns per value")
+    if hasattr(klass, "parse_list"):
+        parse_list_time = time_per_call(lambda: klass.parse_list(io.BytesIO(blob), count), count)
+        print(f"  parse_list: {parse_list_time:.0f}ns per value")
+    print(f"  stream:     {time_per_call(stream, count):.0f}ns per value")
+
+
+def main(count: int = 1000000) -> None:
+    """
+    Measures construction, parsing and streaming of the fixed width integer types. Run this on two
+    revisions to compare the implementations.
+    """
+    for klass in [int8, uint8, int16, uint16, int32, uint32, int64, uint64, uint128]:
+        benchmark_type(klass, count)
+
+
+if __name__ == "__main__":
+    main()
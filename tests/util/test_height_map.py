@@ -0,0 +1,53 @@
+import pytest
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.height_map import HeightToHash
+from chia.util.ints import uint32
+
+
+def gen_hash(height: int) -> bytes32:
+    return bytes32(height.to_bytes(32, "big"))
+
+
+class TestHeightToHash:
+    def test_append_and_get(self):
+        height_map = HeightToHash()
+        assert len(height_map) == 0
+        assert 0 not in height_map
+        for height in range(10):
+            height_map.append(gen_hash(height))
+        assert len(height_map) == 10
+        for height in range(10):
+            assert uint32(height) in height_map
+            assert height_map[uint32(height)] == gen_hash(height)
+        assert 10 not in height_map
+        assert -1 not in height_map
+        with pytest.raises(KeyError):
+            height_map[10]
+
+    def test_set(self):
+        height_map = HeightToHash.from_dict({uint32(height): gen_hash(height) for height in range(5)})
+        height_map[2] = gen_hash(20)
+        height_map[5] = gen_hash(5)
+        assert height_map[2] == gen_hash(20)
+        assert height_map[5] == gen_hash(5)
+        with pytest.raises(KeyError):
+            height_map[7] = gen_hash(7)
+
+    def test_truncate(self):
+        height_map = HeightToHash.from_dict({uint32(height): gen_hash(height) for height in range(10)})
+        height_map.truncate(4)
+        assert len(height_map) == 4
+        assert 4 not in height_map
+        assert height_map[3] == gen_hash(3)
+        height_map.truncate(0)
+        assert len(height_map) == 0
+
+    def test_view(self):
+        height_map = HeightToHash.from_dict({uint32(height): gen_hash(height) for height in range(10)})
+        view = height_map.view(2, 5)
+        assert view.readonly
+        assert bytes(view) == gen_hash(2) + gen_hash(3) + gen_hash(4)
+        view.release()
+        height_map.append(gen_hash(10))
+        assert len(height_map) == 11
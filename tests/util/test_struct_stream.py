@@ -106,3 +106,30 @@ class TestStructStream:
 
         roundtrip(int8(0x7F))
         roundtrip(int8(-0x80))
+
+    def test_parse_trusted(self):
+        # Parsed values skip the range check in __new__ but must still be of the right type
+        v = uint32.parse(io.BytesIO(bytes([0xFF] * 4)))
+        assert type(v) is uint32
+        assert v == 0xFFFFFFFF
+        v = int16.from_bytes(bytes([0x80, 0x00]))
+        assert type(v) is int16
+        assert v == -0x8000
+        assert bytes(v) == bytes([0x80, 0x00])
+
+        with pytest.raises(AssertionError):
+            uint64.parse(io.BytesIO(bytes(7)))
+        with pytest.raises(AssertionError):
+            uint64.from_bytes(bytes(9))
+
+    def test_parse_list(self):
+        values = [uint64(0), uint64(1), uint64(0xFFFFFFFFFFFFFFFF)]
+        f = io.BytesIO(b"".join(bytes(v) for v in values) + b"tail")
+        parsed = uint64.parse_list(f, len(values))
+        assert parsed == values
+        assert all(type(v) is uint64 for v in parsed)
+        assert f.read() == b"tail"
+
+        assert uint64.parse_list(io.BytesIO(b""), 0) == []
+        with pytest.raises(AssertionError):
+            uint64.parse_list(io.BytesIO(bytes(8 * 3 - 1)), 3)